@@ -0,0 +1,303 @@
+"""Двухуровневый кэш: LRU в памяти процесса поверх общего кэша.
+
+Чтение сначала идёт в L1 — небольшой LRU-словарь процесса с коротким
+сроком жизни записей, и только при промахе в общий кэш L2 (memcached,
+redis или любой другой backend из CACHES). Запись идёт в оба уровня.
+
+Чтобы процессы узнавали о чужих записях, каждое изменение ключа
+(set, delete, удачный add, incr) попадает в журнал в L2: счётчик
+``tiered:seq`` и кольцо из ``LOG_SIZE`` ячеек ``tiered:log:<n>`` с
+изменёнными ключами. Процесс сверяет счётчик не чаще раза в
+``INVALIDATION_CHECK_INTERVAL`` секунд и удаляет из своего L1 только
+ключи, изменённые другими. Если процесс отстал больше чем на кольцо
+или ячейку уже перезаписали (или ещё не записали), он очищает L1
+целиком: это редко и безопасно. Блокировки
+(``add``) и счётчики (``incr``) всегда работают напрямую с L2.
+
+Пример настройки::
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache_backends.TieredCache',
+            'OPTIONS': {'SHARED_CACHE': 'shared'},
+        },
+        'shared': {...},
+    }
+"""
+import pickle
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .metrics import CACHE_REQUESTS
+
+SEQUENCE_KEY = 'tiered:seq'
+LOG_KEY = 'tiered:log:{}'
+LOG_SIZE = 1000
+
+_local_caches = {}
+_local_caches_lock = threading.Lock()
+
+
+class LocalCache:
+    """LRU-словарь процесса, общий для всех потоков.
+
+    Помнит, до какого номера прочитан журнал изменений, и номера
+    собственных записей, которые при чтении журнала пропускаются.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.seq = None
+        self.own = set()
+        self.checked_at = None
+        self.sync_lock = threading.Lock()
+        self.stats = Counter()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + timeout)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats['l1_evictions'] += 1
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def invalidate(self, keys):
+        with self.lock:
+            for key in keys:
+                if self.entries.pop(key, None) is not None:
+                    self.stats['l1_invalidations'] += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def get_local_cache(name, max_entries):
+    with _local_caches_lock:
+        if name not in _local_caches:
+            _local_caches[name] = LocalCache(max_entries)
+        return _local_caches[name]
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = options.get('SHARED_CACHE', 'shared')
+        self.l1_timeout = options.get('L1_TIMEOUT', 5)
+        self.check_interval = options.get('INVALIDATION_CHECK_INTERVAL', 1)
+        self.local = get_local_cache(
+            location or self.shared_alias,
+            options.get('L1_MAX_ENTRIES', 1000)
+        )
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def l1_timeout_for(self, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            return self.l1_timeout
+        return min(timeout - time.time(), self.l1_timeout)
+
+    def sync(self):
+        """Удаляет из L1 ключи, изменённые другими процессами."""
+        local = self.local
+        now = time.monotonic()
+        if (
+            local.checked_at is not None
+            and now - local.checked_at < self.check_interval
+        ):
+            return
+        # Журнал читает один поток процесса, остальные не ждут его.
+        if not local.sync_lock.acquire(blocking=False):
+            return
+        try:
+            local.checked_at = now
+            self.read_log()
+        finally:
+            local.sync_lock.release()
+
+    def read_log(self):
+        local = self.local
+        seq = self.shared.get(SEQUENCE_KEY, 0)
+        known, local.seq = local.seq, seq
+        if known is None:
+            local.own = {number for number in local.own if number > seq}
+            return
+        if seq == known:
+            return
+        if seq < known or seq - known > LOG_SIZE:
+            # Счётчик вытеснили или журнал успел обернуться.
+            local.clear()
+            local.stats['l1_invalidations'] += 1
+            return
+        numbers = [number for number in range(known + 1, seq + 1)
+                   if number not in local.own]
+        local.own.difference_update(range(known + 1, seq + 1))
+        found = self.shared.get_many(
+            [LOG_KEY.format(number % LOG_SIZE) for number in numbers]
+        )
+        keys = []
+        for number in numbers:
+            entry = found.get(LOG_KEY.format(number % LOG_SIZE))
+            if entry is None or entry[0] != number:
+                local.clear()
+                local.stats['l1_invalidations'] += 1
+                return
+            keys.extend(entry[1])
+        local.invalidate(keys)
+
+    def log_change(self, keys, version=None):
+        """Записывает изменённые ключи в журнал для других процессов."""
+        keys = [self.make_key(key, version) for key in keys]
+        if not keys:
+            return
+        self.shared.add(SEQUENCE_KEY, 0, timeout=None)
+        try:
+            number = self.shared.incr(SEQUENCE_KEY)
+        except ValueError:
+            # Счётчик вытеснили между add и incr: остальные процессы
+            # заметят это по его уменьшению.
+            return
+        self.local.own.add(number)
+        self.shared.set(
+            LOG_KEY.format(number % LOG_SIZE), (number, keys), timeout=None
+        )
+
+    def remember(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        l1_timeout = self.l1_timeout_for(timeout)
+        if l1_timeout > 0:
+            # Первая запись в L1 задаёт место в журнале, с которого
+            # процесс следит за чужими изменениями.
+            self.sync()
+            self.local.set(
+                self.make_key(key, version),
+                pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                l1_timeout,
+            )
+
+    def count(self, stat, amount=1):
+        if amount:
+            self.local.stats[stat] += amount
+            layer, result = stat.split('_')
+            CACHE_REQUESTS.inc(amount, layer=layer, result=result)
+
+    def get(self, key, default=None, version=None):
+        self.sync()
+        pickled = self.local.get(self.make_key(key, version))
+        if pickled is not None:
+            self.count('l1_hits')
+            return pickle.loads(pickled)
+        self.count('l1_misses')
+        sentinel = object()
+        value = self.shared.get(key, sentinel, version=version)
+        if value is sentinel:
+            self.count('l2_misses')
+            return default
+        self.count('l2_hits')
+        self.remember(key, value, version=version)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        self.sync()
+        found = {}
+        missing = []
+        for key in keys:
+            pickled = self.local.get(self.make_key(key, version))
+            if pickled is None:
+                missing.append(key)
+            else:
+                found[key] = pickle.loads(pickled)
+        self.count('l1_hits', len(found))
+        self.count('l1_misses', len(missing))
+        if missing:
+            shared_found = self.shared.get_many(missing, version=version)
+            self.count('l2_hits', len(shared_found))
+            self.count('l2_misses', len(missing) - len(shared_found))
+            for key, value in shared_found.items():
+                self.remember(key, value, version=version)
+            found.update(shared_found)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout=timeout, version=version)
+        self.log_change([key], version)
+        self.remember(key, value, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout=timeout, version=version)
+        self.log_change(data, version)
+        for key, value in data.items():
+            if key not in failed:
+                self.remember(key, value, timeout, version)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.local.delete(self.make_key(key, version))
+        added = self.shared.add(key, value, timeout=timeout, version=version)
+        if added:
+            self.log_change([key], version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self.local.delete(self.make_key(key, version))
+        return self.shared.touch(key, timeout=timeout, version=version)
+
+    def delete(self, key, version=None):
+        self.local.delete(self.make_key(key, version))
+        self.shared.delete(key, version=version)
+        self.log_change([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        for key in keys:
+            self.local.delete(self.make_key(key, version))
+        self.shared.delete_many(keys, version=version)
+        self.log_change(keys, version)
+
+    def incr(self, key, delta=1, version=None):
+        self.local.delete(self.make_key(key, version))
+        value = self.shared.incr(key, delta, version=version)
+        self.log_change([key], version)
+        return value
+
+    def has_key(self, key, version=None):
+        self.sync()
+        if self.local.get(self.make_key(key, version)) is not None:
+            return True
+        return self.shared.has_key(key, version=version)
+
+    def clear(self):
+        self.shared.clear()
+        self.local.clear()
+
+    def stats(self):
+        """Счётчики попаданий и промахов L1 и L2 этого процесса."""
+        stats = dict(self.local.stats)
+        stats['l1_size'] = len(self.local.entries)
+        return stats
@@ -0,0 +1,91 @@
+"""Чтение с реплик, запись в основную базу.
+
+ReplicaRouter отправляет запись в ``default``, а чтение — в одну из
+реплик DATABASE_REPLICAS, выбранную на весь запрос, чтобы страница
+не собиралась из реплик с разным отставанием. После первой записи
+поток до конца запроса читает из основной базы: чтение внутри
+транзакции и сигналы видят только что записанное.
+
+ReplicaStickinessMiddleware продлевает это на следующие запросы того же
+браузера: ответ на запрос с записью ставит cookie на
+REPLICA_STICKY_SECONDS, и пока она жива, чтение идёт из основной базы,
+а кэш страниц пропускается. Поэтому после редиректа на профиль новый
+пост виден, даже если реплика ещё не догнала основную базу. Срок должен
+быть больше отставания реплик. Чужие запросы в это время читают
+реплику, и страницу, собранную с реплики меньше чем через
+REPLICA_STICKY_SECONDS после сброса её меток, кэш страниц не сохраняет
+(``page_cache.is_lagging``).
+"""
+import random
+import sqlite3
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+_state = threading.local()
+
+
+def reset(pinned=False):
+    _state.pinned = pinned
+    _state.wrote = False
+    _state.replica = None
+
+
+def is_pinned():
+    return getattr(_state, 'pinned', False)
+
+
+def wrote():
+    return getattr(_state, 'wrote', False)
+
+
+def read_replica():
+    """Реплика, из которой читал текущий запрос, или None."""
+    return getattr(_state, 'replica', None)
+
+
+def choose_replica():
+    replica = getattr(_state, 'replica', None)
+    if replica is None:
+        replica = _state.replica = random.choice(settings.DATABASE_REPLICAS)
+    return replica
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if not settings.DATABASE_REPLICAS or is_pinned():
+            return DEFAULT_DB_ALIAS
+        return choose_replica()
+
+    def db_for_write(self, model, **hints):
+        _state.pinned = True
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики — копии основной базы, схему они получают вместе
+        # с данными.
+        return db not in settings.DATABASE_REPLICAS
+
+
+def copy_sqlite(source, target):
+    """Копирует базу SQLite в реплику через backup API.
+
+    Копия согласована даже при одновременной записи, а открытые
+    соединения к реплике видят новые данные без переподключения.
+    """
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
@@ -0,0 +1,81 @@
+"""Персональные фрагменты («дырки») в общей для всех оболочке страницы.
+
+Шаблон страницы выводит вместо персональной части маркер
+``{% fragment 'имя' аргументы %}``, поэтому отрисованная страница
+одинакова для всех пользователей и её можно хранить в кэше целиком.
+FragmentMiddleware перед отдачей ответа заменяет маркеры на фрагменты,
+отрисованные для текущего пользователя. Фрагменты с ``timeout``
+кэшируются отдельно для каждого пользователя; фрагменты с CSRF-токеном
+отрисовываются на каждый запрос. Тот же фрагмент можно получить
+отдельным запросом к ``core:fragment``.
+"""
+import hashlib
+import re
+from collections import namedtuple
+from urllib.parse import quote, unquote
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from .page_cache import get_versions
+
+MARKER_RE = re.compile(rb'<!--fragment ([\w-]+)((?: [^\s>]*)*)-->')
+
+Fragment = namedtuple('Fragment', ('func', 'timeout', 'keys'))
+
+FRAGMENTS = {}
+
+
+def register(name, timeout=None, keys=None):
+    """Регистрирует функцию ``func(request, *args)``, возвращающую HTML.
+
+    ``keys(request, *args)`` возвращает метки, при сбросе которых
+    сохранённый фрагмент перестаёт быть актуальным.
+    """
+    def decorator(func):
+        FRAGMENTS[name] = Fragment(func, timeout, keys)
+        return func
+    return decorator
+
+
+def marker(name, args):
+    quoted = ''.join(f' {quote(str(arg), safe="")}' for arg in args)
+    return f'<!--fragment {name}{quoted}-->'
+
+
+def fragment_cache_key(request, name, args, keys):
+    user = request.user.pk if request.user.is_authenticated else 'anon'
+    versions = get_versions(keys, create=True)
+    raw = f'{name}:{args}:{user}:{sorted(versions.items())}'
+    return f'fragment:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+def render_fragment(request, name, args=()):
+    fragment = FRAGMENTS.get(name)
+    if fragment is None:
+        return ''
+    if fragment.timeout is None:
+        return fragment.func(request, *args)
+    keys = fragment.keys(request, *args) if fragment.keys else ()
+    key = fragment_cache_key(request, name, args, keys)
+    html = cache.get(key)
+    if html is None:
+        html = fragment.func(request, *args)
+        cache.set(key, html, fragment.timeout)
+    return html
+
+
+def fill(request, content, charset='utf-8'):
+    """Заменяет маркеры в содержимом страницы отрисованными фрагментами."""
+    def replace(match):
+        args = [unquote(arg.decode()) for arg in match.group(2).split()]
+        html = render_fragment(request, match.group(1).decode(), args)
+        return html.encode(charset)
+    return MARKER_RE.sub(replace, content)
+
+
+@register('header', timeout=60 * 5)
+def header(request, view_name=''):
+    return render_to_string(
+        'includes/header_nav.html', {'view_name': view_name}, request
+    )
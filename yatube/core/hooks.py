@@ -0,0 +1,87 @@
+"""Общие точки перехвата в Django и sorl-thumbnail.
+
+Замеры (core.probes) и трассировка (core.tracing) подключаются к одним
+и тем же местам: view, рендеру шаблона, получению и созданию миниатюр.
+Методы подменяются один раз, в ``install()``, а каждая подмена входит
+в контекстные менеджеры, зарегистрированные для точки через
+``register()``. Так порядок установки и повторные вызовы не влияют
+на то, сколько раз обёрнут метод, а без зарегистрированных обработчиков
+точка стоит одной проверки списка.
+"""
+import functools
+import threading
+from collections import defaultdict
+from contextlib import ExitStack
+
+VIEW = 'view'
+TEMPLATE = 'template'
+THUMBNAIL = 'thumbnail'
+THUMBNAIL_CREATE = 'thumbnail_create'
+
+_hooks = defaultdict(list)
+_installed = False
+_install_lock = threading.Lock()
+
+
+def register(point, hook):
+    """Добавляет обработчик точки: hook(*подробности) -> контекст.
+
+    Подробности: для VIEW — функция view, для TEMPLATE — шаблон
+    django.template.base.Template, для THUMBNAIL — файл и геометрия,
+    для THUMBNAIL_CREATE — ничего. Повторная регистрация того же
+    обработчика ничего не делает.
+    """
+    with _install_lock:
+        if hook not in _hooks[point]:
+            _hooks[point].append(hook)
+
+
+def call(point, details, func, *args, **kwargs):
+    hooks = _hooks[point]
+    if not hooks:
+        return func(*args, **kwargs)
+    with ExitStack() as stack:
+        for hook in hooks:
+            stack.enter_context(hook(*details))
+        return func(*args, **kwargs)
+
+
+def install():
+    """Подменяет методы. Повторные вызовы ничего не делают."""
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        from django.core.handlers.base import BaseHandler
+        from django.template.base import Template
+        from sorl.thumbnail.base import ThumbnailBackend
+
+        make_view_atomic = BaseHandler.make_view_atomic
+        render = Template.render
+        get_thumbnail = ThumbnailBackend.get_thumbnail
+        create_thumbnail = ThumbnailBackend._create_thumbnail
+
+        def make_hooked_view(self, view):
+            wrapped = make_view_atomic(self, view)
+
+            @functools.wraps(wrapped)
+            def hooked_view(*args, **kwargs):
+                return call(VIEW, (view,), wrapped, *args, **kwargs)
+            return hooked_view
+
+        def hooked_render(self, context):
+            return call(TEMPLATE, (self,), render, self, context)
+
+        def hooked_thumbnail(self, file_, geometry_string, **options):
+            return call(THUMBNAIL, (file_, geometry_string), get_thumbnail,
+                        self, file_, geometry_string, **options)
+
+        def hooked_create(self, *args, **kwargs):
+            return call(THUMBNAIL_CREATE, (), create_thumbnail,
+                        self, *args, **kwargs)
+
+        BaseHandler.make_view_atomic = make_hooked_view
+        Template.render = hooked_render
+        ThumbnailBackend.get_thumbnail = hooked_thumbnail
+        ThumbnailBackend._create_thumbnail = hooked_create
+        _installed = True
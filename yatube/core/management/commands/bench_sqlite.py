@@ -0,0 +1,152 @@
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import stats
+from core.sqlite import apply_pragmas
+
+SCHEMA = (
+    'CREATE TABLE post (id INTEGER PRIMARY KEY, author_id INTEGER, '
+    'pub_date REAL, text TEXT)',
+    'CREATE INDEX post_pub_date ON post (pub_date)',
+    'CREATE INDEX post_author ON post (author_id)',
+)
+READ_QUERIES = (
+    'SELECT id, author_id, text FROM post ORDER BY pub_date DESC '
+    'LIMIT 10 OFFSET ?',
+    'SELECT count(*) FROM post WHERE author_id = ?',
+)
+INSERT = 'INSERT INTO post (author_id, pub_date, text) VALUES (?, ?, ?)'
+AUTHORS = 100
+TEXT = 'текст ' * 20
+
+
+class Mode:
+    """Как открываются соединения: на каждый запрос или одно на поток."""
+
+    def __init__(self, name, pragmas, persistent):
+        self.name = name
+        self.pragmas = pragmas
+        self.persistent = persistent
+
+    def connect(self, path):
+        db = sqlite3.connect(path, isolation_level=None,
+                             check_same_thread=False)
+        apply_pragmas(db.cursor(), self.pragmas)
+        return db
+
+
+class Worker(threading.Thread):
+
+    def __init__(self, mode, path, deadline, operation):
+        super().__init__()
+        self.mode = mode
+        self.path = path
+        self.deadline = deadline
+        self.operation = operation
+        self.latencies = []
+        self.errors = 0
+
+    def run(self):
+        rng = random.Random(self.name)
+        db = self.mode.connect(self.path) if self.mode.persistent else None
+        while time.monotonic() < self.deadline:
+            started = time.perf_counter()
+            current = db or self.mode.connect(self.path)
+            try:
+                self.operation(current, rng)
+            except sqlite3.OperationalError:
+                self.errors += 1
+                continue
+            finally:
+                if db is None:
+                    current.close()
+            self.latencies.append(time.perf_counter() - started)
+        if db is not None:
+            db.close()
+
+
+def read(db, rng):
+    db.execute(READ_QUERIES[0], (rng.randrange(100),)).fetchall()
+    db.execute(READ_QUERIES[1], (rng.randrange(AUTHORS),)).fetchall()
+
+
+def write(db, rng):
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        db.execute(INSERT, (rng.randrange(AUTHORS), time.time(), TEXT))
+    except sqlite3.Error:
+        db.execute('ROLLBACK')
+        raise
+    db.execute('COMMIT')
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает SQLite по умолчанию (журнал отката, соединение '
+            'на запрос) и с SQLITE_PRAGMAS и постоянными соединениями '
+            'при одновременных чтении и записи.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=1)
+        parser.add_argument('--seconds', type=float, default=3.0)
+
+    def prepare(self, path, mode, rows):
+        db = mode.connect(path)
+        for statement in SCHEMA:
+            db.execute(statement)
+        rng = random.Random(0)
+        db.execute('BEGIN')
+        db.executemany(INSERT, (
+            (rng.randrange(AUTHORS), rng.random() * 1e9, TEXT)
+            for _ in range(rows)
+        ))
+        db.execute('COMMIT')
+        db.close()
+
+    def handle(self, *args, **options):
+        modes = (
+            Mode('по умолчанию', {'journal_mode': 'delete'}, False),
+            Mode('SQLITE_PRAGMAS, соединение на запрос',
+                 settings.SQLITE_PRAGMAS, False),
+            Mode('SQLITE_PRAGMAS, постоянные соединения',
+                 settings.SQLITE_PRAGMAS, True),
+        )
+        directory = tempfile.mkdtemp()
+        try:
+            for number, mode in enumerate(modes):
+                path = os.path.join(directory, f'{number}.sqlite3')
+                self.prepare(path, mode, options['rows'])
+                self.run_mode(mode, path, options)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def run_mode(self, mode, path, options):
+        deadline = time.monotonic() + options['seconds']
+        readers = [Worker(mode, path, deadline, read)
+                   for _ in range(options['readers'])]
+        writers = [Worker(mode, path, deadline, write)
+                   for _ in range(options['writers'])]
+        for worker in readers + writers:
+            worker.start()
+        for worker in readers + writers:
+            worker.join()
+        self.stdout.write(self.style.MIGRATE_HEADING(mode.name))
+        for title, workers in (('чтение', readers), ('запись', writers)):
+            latencies = [latency * 1000 for worker in workers
+                         for latency in worker.latencies]
+            summary = stats.summary(latencies)
+            errors = sum(worker.errors for worker in workers)
+            self.stdout.write(
+                f'  {title}: {len(latencies) / options["seconds"]:8.0f} /с, '
+                f'p50 {summary["p50"]:6.2f} мс, p99 {summary["p99"]:7.2f} мс,'
+                f' ошибок блокировки {errors}'
+            )
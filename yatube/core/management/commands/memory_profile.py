@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import memory
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает снимки tracemalloc до и после N запросов к адресу '
+            'и показывает рост памяти по модулям posts/ и core/.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Адрес, например /posts/1/.')
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=1,
+                            help='Запросы до первого снимка.')
+        parser.add_argument('--limit', type=int, default=20,
+                            help='Сколько мест выделения показать.')
+        parser.add_argument('--user', help='Выполнять запросы от имени '
+                                           'пользователя.')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = get_user_model().objects.get(
+                    username=options['user']
+                )
+            except get_user_model().DoesNotExist:
+                raise CommandError(
+                    f'Пользователь {options["user"]} не найден'
+                )
+        result = memory.profile(
+            options['path'], options['requests'],
+            warmup=options['warmup'], user=user
+        )
+        for line in memory.report(result, options['limit']):
+            self.stdout.write(line)
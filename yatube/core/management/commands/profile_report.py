@@ -0,0 +1,57 @@
+import glob
+import io
+import os
+import pstats
+import statistics
+from collections import defaultdict
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.middleware import PROFILE_SUFFIX
+
+
+def parse_dump_name(path):
+    """Возвращает view и длительность запроса в мс из имени профиля."""
+    name = os.path.basename(path)[:-len(PROFILE_SUFFIX)]
+    view_name, _, _, duration = name.rsplit('__', 3)
+    return unquote(view_name), float(duration[:-len('ms')])
+
+
+class Command(BaseCommand):
+    help = 'Сводка профилей ProfilingMiddleware по view.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=settings.PROFILING_DUMP_DIR)
+        parser.add_argument('--view', help='Показать только этот view.')
+        parser.add_argument('--limit', type=int, default=15,
+                            help='Сколько функций выводить по каждому view.')
+        parser.add_argument('--sort', default='cumulative',
+                            help='Порядок сортировки pstats.')
+
+    def handle(self, *args, **options):
+        dumps = defaultdict(list)
+        pattern = os.path.join(options['dir'], f'*{PROFILE_SUFFIX}')
+        for path in glob.glob(pattern):
+            view_name, duration = parse_dump_name(path)
+            if options['view'] in (None, view_name):
+                dumps[view_name].append((path, duration))
+        if not dumps:
+            self.stdout.write('Профилей нет.')
+            return
+        by_total = sorted(
+            dumps.items(),
+            key=lambda item: -sum(duration for _, duration in item[1])
+        )
+        for view_name, items in by_total:
+            durations = [duration for _, duration in items]
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{view_name}: профилей {len(items)}, '
+                f'медиана {statistics.median(durations):.0f} мс, '
+                f'максимум {max(durations):.0f} мс'
+            ))
+            report = io.StringIO()
+            stats = pstats.Stats(*(path for path, _ in items), stream=report)
+            stats.sort_stats(options['sort']).print_stats(options['limit'])
+            self.stdout.write(report.getvalue())
@@ -0,0 +1,77 @@
+import glob
+import json
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.slow_queries import normalize
+
+FULL_SCAN_RE = re.compile(r'^SCAN (TABLE )?(\w+)(?!.*USING)|Seq Scan on (\w+)')
+TEMP_SORT_RE = re.compile(r'USE TEMP B-TREE FOR ([\w ]+)|^\s*Sort\b')
+MAX_SQL = 300
+
+
+def read_log(path):
+    """Записи журнала вместе с файлами после ротации (.1, .2, ...)."""
+    for name in sorted(glob.glob(f'{glob.escape(path)}*')):
+        with open(name, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def plan_problems(plan):
+    problems = set()
+    for line in plan:
+        scan = FULL_SCAN_RE.search(line)
+        if scan:
+            table = scan.group(2) or scan.group(3)
+            problems.add(f'полный просмотр {table}')
+        sort = TEMP_SORT_RE.search(line)
+        if sort:
+            what = (sort.group(1) or 'ORDER BY').strip()
+            problems.add(f'временное B-дерево для {what}')
+    return sorted(problems)
+
+
+class Command(BaseCommand):
+    help = ('Сводка журнала медленных запросов по форме запроса: '
+            'число, время, view и проблемы плана.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=settings.SLOW_QUERY_LOG)
+        parser.add_argument('--limit', type=int, default=20)
+
+    def handle(self, *args, **options):
+        shapes = defaultdict(lambda: {
+            'count': 0, 'total': 0, 'max': 0, 'views': set(), 'plan': [],
+        })
+        for record in read_log(options['log']):
+            shape = shapes[normalize(record['sql'])]
+            shape['count'] += 1
+            shape['total'] += record['duration_ms']
+            shape['max'] = max(shape['max'], record['duration_ms'])
+            shape['views'].add(record['view'])
+            shape['plan'] = record['plan'] or shape['plan']
+        if not shapes:
+            self.stdout.write('Медленных запросов нет.')
+            return
+        ordered = sorted(shapes.items(), key=lambda item: -item[1]['total'])
+        for sql, shape in ordered[:options['limit']]:
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{shape["count"]} раз, всего {shape["total"]:.1f} мс, '
+                f'максимум {shape["max"]:.1f} мс; '
+                f'view: {", ".join(sorted(shape["views"]))}'
+            ))
+            self.stdout.write(
+                sql if len(sql) <= MAX_SQL else sql[:MAX_SQL] + '…'
+            )
+            for line in shape['plan']:
+                self.stdout.write(f'  {line}')
+            for problem in plan_problems(shape['plan']):
+                self.stdout.write(self.style.WARNING(f'  ! {problem}'))
+            self.stdout.write('')
@@ -0,0 +1,69 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Выполняется в отдельном процессе: время запуска и первых запросов
+# можно честно измерить только в свежем интерпретаторе.
+CHILD = '''
+import json, sys, time
+started = time.perf_counter()
+import yatube.wsgi
+setup = time.perf_counter() - started
+from django.test import Client
+client = Client(REMOTE_ADDR='192.0.2.1')
+requests = []
+for url in sys.argv[1:]:
+    for attempt in ('first', 'second'):
+        started = time.perf_counter()
+        status = client.get(url).status_code
+        requests.append((url, attempt, status, time.perf_counter() - started))
+print(json.dumps({'setup': setup, 'requests': requests}))
+'''
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время запуска и первых запросов воркера '
+            'без прогрева и с прогревом (STARTUP_WARMUP).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='*',
+                            default=['/', '/auth/signup/'])
+        parser.add_argument('--runs', type=int, default=5,
+                            help='Сколько раз запускать каждый вариант.')
+
+    def run_child(self, urls, warmup):
+        env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE=os.environ['DJANGO_SETTINGS_MODULE'],
+            DJANGO_STARTUP_WARMUP='1' if warmup else '0',
+        )
+        output = subprocess.run(
+            [sys.executable, '-c', CHILD, *urls],
+            cwd=settings.BASE_DIR, env=env, check=True,
+            stdout=subprocess.PIPE,
+        ).stdout
+        return json.loads(output.decode().strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        urls = options['urls']
+        for warmup in (False, True):
+            runs = [self.run_child(urls, warmup)
+                    for _ in range(options['runs'])]
+            title = 'с прогревом' if warmup else 'без прогрева'
+            self.stdout.write(self.style.MIGRATE_HEADING(title))
+            setup = statistics.median(run['setup'] for run in runs)
+            self.stdout.write(f'  yatube.wsgi: {setup * 1000:8.1f} мс')
+            for index, (url, attempt, status, _) in enumerate(
+                runs[0]['requests']
+            ):
+                duration = statistics.median(
+                    run['requests'][index][3] for run in runs
+                )
+                self.stdout.write(
+                    f'  {attempt:6} {status} {duration * 1000:8.1f} мс  {url}'
+                )
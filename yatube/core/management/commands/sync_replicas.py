@@ -0,0 +1,40 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.db_router import copy_sqlite
+
+
+class Command(BaseCommand):
+    help = ('Обновляет реплики SQLite из DATABASE_REPLICAS копией '
+            'основной базы. С --interval повторяет копирование, '
+            'изображая репликацию с отставанием.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            help='Копировать каждые N секунд.')
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплик нет: задайте DJANGO_DB_REPLICAS')
+        source = connections[DEFAULT_DB_ALIAS].settings_dict
+        if source['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError(
+                'Копирование файлов подходит только для SQLite, для других '
+                'баз нужна репликация средствами СУБД'
+            )
+        while True:
+            started = time.perf_counter()
+            for alias in settings.DATABASE_REPLICAS:
+                copy_sqlite(source['NAME'],
+                            connections[alias].settings_dict['NAME'])
+            self.stdout.write(
+                f'Реплики обновлены за '
+                f'{(time.perf_counter() - started) * 1000:.0f} мс: '
+                f'{", ".join(settings.DATABASE_REPLICAS)}'
+            )
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,88 @@
+import glob
+import json
+import os
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+MAX_STATEMENT = 100
+
+
+def read_traces(path):
+    """Span'ы из файла OTLP/JSON и его копий после ротации по трассам."""
+    traces = defaultdict(list)
+    names = sorted(glob.glob(f'{glob.escape(path)}*'), key=os.path.getmtime)
+    for name in names:
+        with open(name, encoding='utf-8') as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                for resource in json.loads(line)['resourceSpans']:
+                    for scope in resource['scopeSpans']:
+                        for span in scope['spans']:
+                            traces[span['traceId']].append(span)
+    return traces
+
+
+def duration_ms(span):
+    return (int(span['endTimeUnixNano'])
+            - int(span['startTimeUnixNano'])) / 1e6
+
+
+def attributes(span):
+    return {item['key']: next(iter(item['value'].values()))
+            for item in span.get('attributes', ())}
+
+
+class Command(BaseCommand):
+    help = ('Показывает трассы из TRACING_FILE деревом span\'ов и '
+            'собственное время по видам: view, db, template, thumbnail.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=settings.TRACING_FILE)
+        parser.add_argument('--trace-id')
+        parser.add_argument('--last', type=int, default=5,
+                            help='Сколько последних трасс показать.')
+
+    def handle(self, *args, **options):
+        traces = read_traces(options['file'])
+        if options['trace_id']:
+            selected = [options['trace_id']]
+        else:
+            selected = list(traces)[-options['last']:]
+        for trace_id in selected:
+            self.show(trace_id, traces.get(trace_id, []))
+
+    def show(self, trace_id, spans):
+        ids = {span['spanId'] for span in spans}
+        children = defaultdict(list)
+        for span in spans:
+            parent = span['parentSpanId']
+            children[parent if parent in ids else None].append(span)
+        self_time = defaultdict(float)
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Трасса {trace_id}'))
+
+        def walk(span, depth):
+            total = duration_ms(span)
+            nested = sum(duration_ms(child)
+                         for child in children[span['spanId']])
+            self_time[span['name'].split()[0]] += total - nested
+            statement = attributes(span).get('db.statement', '')
+            if len(statement) > MAX_STATEMENT:
+                statement = statement[:MAX_STATEMENT] + '…'
+            self.stdout.write(
+                f'{total:9.2f} мс  {"  " * depth}{span["name"]}'
+                + (f'  {statement}' if statement else '')
+            )
+            for child in sorted(children[span['spanId']],
+                                key=lambda item: item['startTimeUnixNano']):
+                walk(child, depth + 1)
+
+        for root in children[None]:
+            walk(root, 0)
+        summary = ', '.join(
+            f'{name} {value:.2f} мс' for name, value in
+            sorted(self_time.items(), key=lambda item: -item[1])
+        )
+        self.stdout.write(f'Собственное время: {summary}\n')
@@ -0,0 +1,141 @@
+"""Поиск роста памяти воркера через tracemalloc.
+
+``profile()`` включает tracemalloc (если он ещё не включён), делает
+несколько прогревочных запросов к адресу, снимает снимок, выполняет ещё
+N запросов и снимает второй. Разница снимков группируется по модулям
+приложений из MEMORY_PROFILE_APPS: выделение памяти приписывается
+ближайшему кадру стека внутри приложения, даже если сами байты выделил
+Django, например LocMemCache. Запросы идут через тестовый клиент
+в отдельном потоке того же процесса, поэтому видны и его кэши.
+"""
+import gc
+import linecache
+import os
+import tracemalloc
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from django.test import Client
+
+# Адрес обычного посетителя, как в posts.warmup: для INTERNAL_IPS
+# включается отладочная панель, которая сама заметно расходует память.
+REMOTE_ADDR = '192.0.2.1'
+OTHER = 'other'
+SITE_PACKAGES = f'site-packages{os.sep}'
+
+Site = namedtuple('Site', ('module', 'location', 'origin', 'size', 'count'))
+Profile = namedtuple('Profile', ('path', 'requests', 'statuses', 'sites'))
+
+IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, linecache.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+def app_module(filename, apps):
+    """'posts.views' для файла приложения из apps, иначе None."""
+    path = os.path.relpath(filename, settings.BASE_DIR)
+    # Сам замер и тестовый клиент выделяемое не объясняют.
+    if path.startswith('..') or filename == __file__:
+        return None
+    parts = path.replace(os.sep, '/').split('/')
+    if parts[0] not in apps:
+        return None
+    return '.'.join(parts)[:-len('.py')] if path.endswith('.py') else None
+
+
+def location(frame):
+    path = os.path.relpath(frame.filename, settings.BASE_DIR)
+    if path.startswith('..'):
+        path = frame.filename.rpartition(SITE_PACKAGES)[2]
+    return f'{path}:{frame.lineno}'
+
+
+def attribute(stat, apps):
+    """Модуль и строка приложения, к которым относится выделение."""
+    frames = list(stat.traceback)
+    origin = location(frames[-1])
+    for frame in reversed(frames):
+        module = app_module(frame.filename, apps)
+        if module is not None:
+            return Site(module, location(frame), origin,
+                        stat.size_diff, stat.count_diff)
+    return Site(OTHER, origin, origin, stat.size_diff, stat.count_diff)
+
+
+def take_snapshot():
+    gc.collect()
+    return tracemalloc.take_snapshot().filter_traces(IGNORED)
+
+
+def run_requests(path, count, user=None):
+    client = Client(REMOTE_ADDR=REMOTE_ADDR)
+    try:
+        if user is not None:
+            client.force_login(user)
+        return [client.get(path).status_code for _ in range(count)]
+    finally:
+        connections.close_all()
+
+
+def profile(path, requests=10, warmup=1, user=None, apps=None):
+    """Разница памяти до и после requests запросов к path."""
+    apps = tuple(apps or settings.MEMORY_PROFILE_APPS)
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start(settings.MEMORY_PROFILE_FRAMES)
+    try:
+        # Отдельный поток: тестовый клиент не должен трогать замеры,
+        # трассу и соединения запроса, из которого его вызвали.
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(run_requests, path, warmup, user).result()
+            before = take_snapshot()
+            statuses = executor.submit(
+                run_requests, path, requests, user
+            ).result()
+            after = take_snapshot()
+    finally:
+        if started:
+            tracemalloc.stop()
+    sites = [attribute(stat, apps)
+             for stat in after.compare_to(before, 'traceback')
+             if stat.size_diff or stat.count_diff]
+    return Profile(path, requests, statuses, sites)
+
+
+def group(sites, key):
+    totals = defaultdict(lambda: [0, 0])
+    for site in sites:
+        total = totals[key(site)]
+        total[0] += site.size
+        total[1] += site.count
+    return sorted(totals.items(), key=lambda item: -item[1][0])
+
+
+def format_size(size):
+    return f'{size / 1024:+.1f} KiB'
+
+
+def report(result, limit=20):
+    """Строки отчёта: итог, модули и самые растущие места."""
+    total = sum(site.size for site in result.sites)
+    lines = [
+        f'{result.path}: {result.requests} запросов, '
+        f'статусы {sorted(set(result.statuses))}, '
+        f'прирост {format_size(total)}',
+        '',
+        'По модулям:',
+    ]
+    for module, (size, count) in group(result.sites, lambda s: s.module):
+        lines.append(f'  {format_size(size):>14} {count:+8d}  {module}')
+    lines += ['', 'Места выделения:']
+    by_site = group(result.sites, lambda s: (s.location, s.origin))
+    for (site, origin), (size, count) in by_site[:limit]:
+        via = f'  <- {origin}' if origin != site else ''
+        lines.append(f'  {format_size(size):>14} {count:+8d}  {site}{via}')
+    return lines
@@ -0,0 +1,211 @@
+"""Метрики процесса в формате Prometheus.
+
+Счётчики и гистограммы пишутся без блокировок: у каждого потока свой
+словарь значений, а блокировка нужна только при первом обращении потока
+и при сборе снимка. Воркеры одного сервера сбрасывают снимки в файлы
+``<pid>.json`` каталога METRICS_DIR не чаще раза в
+METRICS_FLUSH_INTERVAL секунд, а ``/metrics`` складывает файлы всех
+воркеров, как multiprocess-режим prometheus_client. Значения
+накопительные, поэтому каталог стоит очищать при деплое.
+"""
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+COUNTER = 'counter'
+HISTOGRAM = 'histogram'
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+
+_threads = []
+_finished = {}
+_lock = threading.Lock()
+_local = threading.local()
+_flushed_at = 0
+
+REGISTRY = {}
+
+
+def merge(target, source):
+    for key, value in source.items():
+        if isinstance(value, list):
+            current = target.setdefault(key, [0] * len(value))
+            for index, item in enumerate(value):
+                current[index] += item
+        else:
+            target[key] = target.get(key, 0) + value
+    return target
+
+
+def thread_values():
+    values = getattr(_local, 'values', None)
+    if values is None:
+        values = _local.values = {}
+        with _lock:
+            _threads.append((threading.current_thread(), values))
+    return values
+
+
+class Metric(namedtuple('Metric', ('name', 'kind', 'help', 'buckets'))):
+
+    def key(self, labels):
+        return (self.name, tuple(sorted(labels.items())))
+
+    def inc(self, amount=1, **labels):
+        values = thread_values()
+        key = self.key(labels)
+        values[key] = values.get(key, 0) + amount
+
+    def observe(self, value, **labels):
+        values = thread_values()
+        key = self.key(labels)
+        state = values.get(key)
+        if state is None:
+            # Счётчики корзин, затем сумма и число наблюдений.
+            state = values[key] = [0] * (len(self.buckets) + 2)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                state[index] += 1
+        state[-2] += value
+        state[-1] += 1
+
+
+def counter(name, help_text):
+    return REGISTRY.setdefault(
+        name, Metric(name, COUNTER, help_text, ())
+    )
+
+
+def histogram(name, help_text, buckets=DEFAULT_BUCKETS):
+    return REGISTRY.setdefault(
+        name, Metric(name, HISTOGRAM, help_text, tuple(buckets))
+    )
+
+
+REQUESTS = counter(
+    'http_requests_total', 'Запросы по view, методу и статусу ответа.'
+)
+REQUEST_DURATION = histogram(
+    'http_request_duration_seconds', 'Время обработки запроса по view.'
+)
+DB_QUERIES = counter('db_queries_total', 'Запросы к базе по view.')
+DB_DURATION = counter(
+    'db_query_duration_seconds_total', 'Время запросов к базе по view.'
+)
+PAGE_CACHE = counter(
+    'page_cache_requests_total', 'Ответы кэша страниц: HIT, STALE, MISS.'
+)
+CACHE_REQUESTS = counter(
+    'cache_requests_total', 'Чтения TieredCache по уровню и результату.'
+)
+THUMBNAILS = counter(
+    'thumbnails_generated_total', 'Созданные миниатюры sorl-thumbnail.'
+)
+THUMBNAIL_DURATION = counter(
+    'thumbnail_generation_seconds_total', 'Время создания миниатюр.'
+)
+
+
+def snapshot():
+    """Значения всех потоков процесса.
+
+    Словари завершившихся потоков переносятся в общий, чтобы список
+    потоков не рос у серверов, создающих поток на каждый запрос.
+    """
+    with _lock:
+        alive = []
+        for thread, values in _threads:
+            if thread.is_alive():
+                alive.append((thread, values))
+            else:
+                merge(_finished, values)
+        _threads[:] = alive
+        result = merge({}, _finished)
+        for _, values in alive:
+            merge(result, dict(values))
+    return result
+
+
+def dump(values):
+    return [[name, list(labels), value]
+            for (name, labels), value in values.items()]
+
+
+def load(rows):
+    return {(name, tuple(map(tuple, labels))): value
+            for name, labels, value in rows}
+
+
+def flush(force=False):
+    """Сохраняет снимок процесса в METRICS_DIR не чаще интервала."""
+    global _flushed_at
+    now = time.monotonic()
+    if not force and now - _flushed_at < settings.METRICS_FLUSH_INTERVAL:
+        return
+    _flushed_at = now
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    path = os.path.join(settings.METRICS_DIR, f'{os.getpid()}.json')
+    descriptor, temporary = tempfile.mkstemp(dir=settings.METRICS_DIR)
+    with os.fdopen(descriptor, 'w') as file:
+        json.dump(dump(snapshot()), file)
+    os.replace(temporary, path)
+
+
+def collect():
+    """Складывает снимки всех воркеров."""
+    flush(force=True)
+    values = {}
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.json')):
+        try:
+            with open(path) as file:
+                merge(values, load(json.load(file)))
+        except (OSError, ValueError):
+            continue
+    return values
+
+
+def format_labels(labels, extra=()):
+    pairs = (*labels, *extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', r'\\').replace('"', r'\"'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"'
+                          for name, value in escaped) + '}'
+
+
+def render(values):
+    """Текстовый формат Prometheus 0.0.4."""
+    lines = []
+    for metric in REGISTRY.values():
+        series = sorted(
+            (labels, value) for (name, labels), value in values.items()
+            if name == metric.name
+        )
+        lines.append(f'# HELP {metric.name} {metric.help}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for labels, value in series:
+            if metric.kind == COUNTER:
+                lines.append(f'{metric.name}{format_labels(labels)} {value}')
+                continue
+            for bound, count in zip(metric.buckets, value):
+                le = format_labels(labels, (('le', bound),))
+                lines.append(f'{metric.name}_bucket{le} {count}')
+            le = format_labels(labels, (('le', '+Inf'),))
+            lines.append(f'{metric.name}_bucket{le} {value[-1]}')
+            lines.append(
+                f'{metric.name}_sum{format_labels(labels)} {value[-2]}'
+            )
+            lines.append(
+                f'{metric.name}_count{format_labels(labels)} {value[-1]}'
+            )
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,361 @@
+import cProfile
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from . import (db_router, fragments, metrics, page_cache, probes,
+               stale_cache, tracing, traffic)
+
+CACHE_STATUS_HEADER = 'X-Page-Cache'
+SERVER_TIMING_HEADER = 'Server-Timing'
+TRACE_ID_HEADER = 'X-Trace-Id'
+PROFILE_SUFFIX = '.prof'
+# Сколько медленных адресов помнить до следующего запроса к ним.
+MAX_ARMED_PATHS = 1000
+
+
+def get_resolver_match(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        # Ответ из кэша страниц отдаётся до разбора адреса.
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+    return match
+
+
+def get_view_name(request):
+    match = get_resolver_match(request)
+    return 'unresolved' if match is None else match.view_name
+
+
+class FragmentMiddleware:
+    """Подставляет в страницу персональные фрагменты пользователя.
+
+    Должна стоять перед PageCacheMiddleware, чтобы в кэш попадала
+    общая оболочка страницы, а фрагменты заполнялись на каждый запрос.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            not response.streaming
+            and response.get('Content-Type', '').startswith('text/html')
+        ):
+            response.content = fragments.fill(
+                request, response.content, response.charset
+            )
+        return response
+
+
+class PageCacheMiddleware:
+    """Отдаёт сохранённые страницы целиком.
+
+    Кэшируются только ответы, помеченные view метками Surrogate-Key.
+    Персональные части страниц вынесены во фрагменты, поэтому одна
+    и та же оболочка отдаётся и анонимам, и авторизованным. Устаревшую
+    страницу перерисовывает один запрос, остальные в это время получают
+    прежнюю версию. Заголовки Surrogate-Key и Surrogate-Control нужны
+    только кэшу и снимаются с ответа, после того как страница сохранена.
+    Запросы с cookie REPLICA_STICKY_COOKIE недавно что-то записали и идут
+    мимо кэша: они должны увидеть свою запись, а не страницу, собранную
+    до неё. Middleware должна стоять после AuthenticationMiddleware
+    и последней в списке, чтобы сохранять страницу в том виде, в каком
+    её вернул view.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.is_cacheable_request(request):
+            return page_cache.strip_surrogate_headers(
+                self.get_response(request)
+            )
+        entry = page_cache.get_page(request)
+        if entry is None:
+            return self.render(request)
+        if not page_cache.is_stale(entry):
+            return self.build_response(request, entry)
+        key = page_cache.page_key(request)
+        if not stale_cache.acquire(key):
+            return self.build_response(request, entry, status='STALE')
+        try:
+            return self.render(request)
+        finally:
+            stale_cache.release(key)
+
+    def render(self, request):
+        response = self.get_response(request)
+        if (
+            self.is_cacheable_response(request, response)
+            and page_cache.set_page(request, response)
+        ):
+            response[CACHE_STATUS_HEADER] = 'MISS'
+        return page_cache.strip_surrogate_headers(response)
+
+    @staticmethod
+    def is_cacheable_request(request):
+        return (
+            request.method in ('GET', 'HEAD')
+            and settings.REPLICA_STICKY_COOKIE not in request.COOKIES
+        )
+
+    @staticmethod
+    def is_cacheable_response(request, response):
+        return (
+            request.method == 'GET'
+            and response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and not request.META.get('CSRF_COOKIE_USED')
+            and bool(page_cache.get_surrogate_keys(response))
+        )
+
+    @staticmethod
+    def build_response(request, entry, status='HIT'):
+        response = HttpResponse(
+            entry['content'], content_type=entry['content_type']
+        )
+        for name, value in entry['headers'].items():
+            response[name] = value
+        response[CACHE_STATUS_HEADER] = status
+        if request.user.is_authenticated:
+            for name in page_cache.VALIDATOR_HEADERS:
+                if response.has_header(name):
+                    del response[name]
+            return response
+        return get_conditional_response(
+            request,
+            etag=response.get('ETag'),
+            last_modified=parse_http_date_safe(
+                response.get('Last-Modified', '')
+            ),
+            response=response,
+        )
+
+
+class ProfilingMiddleware:
+    """Замеряет запрос и сохраняет профили медленных запросов.
+
+    Время приложения, view, запросов к базе, шаблонов и миниатюр
+    отдаётся в заголовке Server-Timing. Доля PROFILING_SAMPLE_RATE
+    запросов выполняется под cProfile, и профиль сохраняется
+    в PROFILING_DUMP_DIR. Запрос дольше PROFILING_SLOW_THRESHOLD секунд
+    ставит свой адрес на профилирование: следующий запрос по нему
+    выполняется под cProfile и сохраняется, если тоже окажется медленным.
+    Помнятся только MAX_ARMED_PATHS последних таких адресов.
+    Middleware должна стоять первой, чтобы мерить весь запрос.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.armed = OrderedDict()
+        self.armed_lock = threading.Lock()
+        probes.install()
+
+    def __call__(self, request):
+        sampled = random.random() < settings.PROFILING_SAMPLE_RATE
+        with self.armed_lock:
+            armed = self.armed.pop(request.path, False)
+        profiler = cProfile.Profile() if sampled or armed else None
+        started = time.perf_counter()
+        with probes.activate(request) as probe:
+            if profiler is not None:
+                profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+        duration = time.perf_counter() - started
+        self.add_server_timing(response, probe, duration)
+        slow = duration >= settings.PROFILING_SLOW_THRESHOLD
+        if profiler is not None and (sampled or slow):
+            self.dump(request, profiler, duration)
+        elif slow and profiler is None:
+            with self.armed_lock:
+                self.armed[request.path] = True
+                self.armed.move_to_end(request.path)
+                while len(self.armed) > MAX_ARMED_PATHS:
+                    self.armed.popitem(last=False)
+        return response
+
+    @staticmethod
+    def add_server_timing(response, probe, duration):
+        metrics = [f'app;dur={duration * 1000:.1f}']
+        for name in (probes.VIEW, probes.DB, probes.TEMPLATE,
+                     probes.THUMBNAIL):
+            if name not in probe.counts:
+                continue
+            metric = f'{name};dur={probe.durations[name] * 1000:.1f}'
+            if name == probes.DB:
+                metric += f';desc="{probe.counts[name]} queries"'
+            metrics.append(metric)
+        if response.has_header(SERVER_TIMING_HEADER):
+            metrics.insert(0, response[SERVER_TIMING_HEADER])
+        response[SERVER_TIMING_HEADER] = ', '.join(metrics)
+
+    @staticmethod
+    def dump(request, profiler, duration):
+        """Сохраняет профиль как <view>__<время>__<pid>__<мс>ms.prof.
+
+        Имя view записывается в URL-кодировке: в нём бывают двоеточия
+        и точки (путь к функции у безымянных маршрутов).
+        """
+        view_name = get_view_name(request)
+        os.makedirs(settings.PROFILING_DUMP_DIR, exist_ok=True)
+        name = '__'.join((
+            quote(view_name, safe=''),
+            str(int(time.time() * 1000)),
+            str(os.getpid()),
+            f'{duration * 1000:.0f}ms',
+        ))
+        profiler.dump_stats(
+            os.path.join(settings.PROFILING_DUMP_DIR, name + PROFILE_SUFFIX)
+        )
+
+
+class MetricsMiddleware:
+    """Считает метрики запросов для core.metrics.
+
+    Должна стоять сразу после ProfilingMiddleware: время запросов
+    к базе и создания миниатюр берётся из её замеров.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        duration = time.perf_counter() - started
+        view = get_view_name(request)
+        metrics.REQUESTS.inc(
+            view=view, method=request.method, status=response.status_code
+        )
+        metrics.REQUEST_DURATION.observe(duration, view=view)
+        probe = probes.current()
+        if probe is not None:
+            if probe.counts[probes.DB]:
+                metrics.DB_QUERIES.inc(probe.counts[probes.DB], view=view)
+                metrics.DB_DURATION.inc(
+                    probe.durations[probes.DB], view=view
+                )
+            if probe.counts[probes.THUMBNAIL_CREATE]:
+                metrics.THUMBNAILS.inc(probe.counts[probes.THUMBNAIL_CREATE])
+                metrics.THUMBNAIL_DURATION.inc(
+                    probe.durations[probes.THUMBNAIL_CREATE]
+                )
+        if response.has_header(CACHE_STATUS_HEADER):
+            metrics.PAGE_CACHE.inc(result=response[CACHE_STATUS_HEADER])
+        metrics.flush()
+        return response
+
+
+class TrafficCaptureMiddleware:
+    """Записывает долю запросов для replay_traffic (см. core.traffic)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if (
+            random.random() >= settings.TRAFFIC_CAPTURE_SAMPLE_RATE
+            or not traffic.is_captured(request.path_info)
+        ):
+            return self.get_response(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        traffic.record(
+            request, get_resolver_match(request), response.status_code,
+            time.perf_counter() - started
+        )
+        return response
+
+
+class ReplicaStickinessMiddleware:
+    """Читает из основной базы после записи (см. core.db_router).
+
+    Должна стоять перед SessionMiddleware: сохранение сессии при входе
+    тоже запись, и следующий запрос должен найти сессию.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        db_router.reset(pinned=(
+            request.method not in ('GET', 'HEAD', 'OPTIONS')
+            or settings.REPLICA_STICKY_COOKIE in request.COOKIES
+        ))
+        try:
+            response = self.get_response(request)
+            if db_router.wrote():
+                response.set_cookie(
+                    settings.REPLICA_STICKY_COOKIE, '1',
+                    max_age=settings.REPLICA_STICKY_SECONDS, httponly=True
+                )
+        finally:
+            db_router.reset()
+        return response
+
+
+class TracingMiddleware:
+    """Записывает трассу запроса в журнал core.tracing.
+
+    Трассируется доля TRACING_SAMPLE_RATE запросов. Флаг sampled
+    заголовка traceparent включает трассировку только для запросов
+    с адресов TRACING_TRUSTED_IPS (прокси, коллектор), иначе любой
+    клиент мог бы писать трассы на каждый свой запрос. Трасса
+    продолжает идентификатор из traceparent, а её идентификатор
+    отдаётся в заголовке X-Trace-Id. Строка запроса в трассу
+    не попадает.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        tracing.install()
+
+    def __call__(self, request):
+        parent = tracing.parse_traceparent(
+            request.META.get('HTTP_TRACEPARENT')
+        )
+        forced = (
+            parent is not None and parent[2]
+            and request.META.get('REMOTE_ADDR')
+            in settings.TRACING_TRUSTED_IPS
+        )
+        if not forced and random.random() >= settings.TRACING_SAMPLE_RATE:
+            return self.get_response(request)
+        trace = tracing.Trace(*parent[:2]) if parent else tracing.Trace()
+        with tracing.activate(trace):
+            with tracing.span(
+                f'{request.method} {request.path}',
+                tracing.SPAN_KIND_SERVER,
+                **{'http.method': request.method,
+                   'http.target': request.path},
+            ) as root:
+                response = self.get_response(request)
+                root.name = f'{request.method} {get_view_name(request)}'
+                root.attributes['http.status_code'] = response.status_code
+                if response.has_header(CACHE_STATUS_HEADER):
+                    root.attributes['page_cache'] = (
+                        response[CACHE_STATUS_HEADER]
+                    )
+        tracing.export(trace)
+        response[TRACE_ID_HEADER] = trace.trace_id
+        return response
@@ -0,0 +1,161 @@
+"""Кэш целых страниц с метками (surrogate keys), как у Varnish или CDN.
+
+View помечает ответ метками вида ``post-1``, ``group-2``, ``feed``.
+Каждой метке в кэше соответствует токен версии. Страница хранится вместе
+с токенами своих меток и считается актуальной, пока ни один из них не
+изменился, поэтому сброс метки стоит одну запись в кэш и не требует
+искать зависящие от неё страницы. Токен начинается со времени сброса:
+страницу, прочитанную с реплики вскоре после сброса её метки, реплика
+могла собрать ещё без изменения, и такая страница не сохраняется.
+"""
+import hashlib
+import re
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import db_router, stale_cache
+
+SURROGATE_KEY_HEADER = 'Surrogate-Key'
+SURROGATE_CONTROL_HEADER = 'Surrogate-Control'
+STORED_HEADERS = ('Content-Language',)
+VALIDATOR_HEADERS = ('ETag', 'Last-Modified')
+MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+
+def add_surrogate_keys(response, *keys, max_age=None):
+    """Помечает ответ метками и, при необходимости, своим временем жизни."""
+    existing = response.get(SURROGATE_KEY_HEADER, '').split()
+    response[SURROGATE_KEY_HEADER] = ' '.join(
+        dict.fromkeys((*existing, *map(str, keys)))
+    )
+    if max_age is not None:
+        response[SURROGATE_CONTROL_HEADER] = f'max-age={max_age}'
+    return response
+
+
+def get_surrogate_keys(response):
+    return response.get(SURROGATE_KEY_HEADER, '').split()
+
+
+def strip_surrogate_headers(response):
+    """Убирает служебные заголовки кэша страниц из ответа клиенту."""
+    for name in (SURROGATE_KEY_HEADER, SURROGATE_CONTROL_HEADER):
+        if response.has_header(name):
+            del response[name]
+    return response
+
+
+def get_surrogate_max_age(response):
+    match = MAX_AGE_RE.search(response.get(SURROGATE_CONTROL_HEADER, ''))
+    if match is None:
+        return settings.PAGE_CACHE_TIMEOUT
+    return int(match.group(1))
+
+
+def version_key(key):
+    return f'surrogate:{key}'
+
+
+def new_token(purged_at):
+    return f'{purged_at:.3f}:{uuid.uuid4().hex}'
+
+
+def purged_at(token):
+    """Время сброса метки по её токену."""
+    try:
+        return float(token.split(':', 1)[0])
+    except (AttributeError, ValueError):
+        return 0
+
+
+def get_versions(keys, create=False):
+    """Возвращает токены версий меток.
+
+    С ``create=True`` отсутствующие токены заводятся, чтобы вытеснение
+    токена из кэша не могло вернуть к жизни устаревшую страницу.
+    """
+    cache_keys = {version_key(key): key for key in keys}
+    found = cache.get_many(list(cache_keys))
+    missing = [name for name in cache_keys if name not in found]
+    if create and missing:
+        for name in missing:
+            # Метку ещё не сбрасывали (или её токен вытеснен):
+            # время сброса неизвестно.
+            cache.add(name, new_token(0), timeout=None)
+        found.update(cache.get_many(missing))
+    return {cache_keys[name]: found.get(name) for name in cache_keys}
+
+
+def purge(*keys):
+    """Сбрасывает метки: все страницы с ними перестают быть актуальными."""
+    if not keys:
+        return
+    token = new_token(time.time())
+    cache.set_many(
+        {version_key(key): token for key in keys}, timeout=None
+    )
+
+
+def page_key(request):
+    url = request.build_absolute_uri().encode()
+    return f'page:{hashlib.md5(url).hexdigest()}'
+
+
+def get_page(request):
+    """Возвращает сохранённую страницу, в том числе устаревшую."""
+    return cache.get(page_key(request))
+
+
+def is_stale(entry):
+    """Страница устарела, если истёк её срок или сброшена её метка."""
+    return (
+        not stale_cache.is_fresh(entry['cached'])
+        or get_versions(entry['versions']) != entry['versions']
+    )
+
+
+def is_lagging(versions):
+    """Страницу могли собрать с реплики, ещё не получившей сброс меток.
+
+    Реплика отстаёт не дольше REPLICA_STICKY_SECONDS, столько же после
+    записи её автор читает из основной базы.
+    """
+    if db_router.read_replica() is None:
+        return False
+    purged = max(map(purged_at, versions.values()), default=0)
+    return time.time() - purged < settings.REPLICA_STICKY_SECONDS
+
+
+def set_page(request, response):
+    """Сохраняет оболочку страницы, возвращает True, если сохранил.
+
+    Страница хранится дольше срока свежести, чтобы во время её
+    перерисовки остальным запросам можно было отдать прежнюю версию.
+    ETag и Last-Modified авторизованных пользователей персональны,
+    поэтому сохраняются только валидаторы анонимных ответов.
+    """
+    keys = get_surrogate_keys(response)
+    versions = get_versions(keys, create=True)
+    if is_lagging(versions):
+        return False
+    stored_headers = STORED_HEADERS
+    if not request.user.is_authenticated:
+        stored_headers += VALIDATOR_HEADERS
+    cached, ttl = stale_cache.make_entry(
+        None, get_surrogate_max_age(response)
+    )
+    entry = {
+        'content': response.content,
+        'content_type': response['Content-Type'],
+        'headers': {
+            name: response[name]
+            for name in stored_headers if response.has_header(name)
+        },
+        'versions': versions,
+        'cached': cached,
+    }
+    cache.set(page_key(request), entry, ttl)
+    return True
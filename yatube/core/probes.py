@@ -0,0 +1,98 @@
+"""Замеры времени внутри запроса: view, ORM, шаблоны, миниатюры.
+
+На время запроса в потоке заводится Probe, и точки замера добавляют
+в него время и число вызовов. ``install()`` подключает замеры к общим
+точкам перехвата core.hooks: view, рендер шаблона Django, получение
+и создание миниатюр в ThumbnailBackend. Запросы к базе измеряются через
+``connection.execute_wrapper``. Вложенные вызовы одной точки (include
+внутри шаблона) считаются один раз. Без активного Probe точки сводятся
+к одной проверке.
+"""
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+from . import hooks
+
+VIEW = 'view'
+DB = 'db'
+TEMPLATE = 'tpl'
+THUMBNAIL = 'thumb'
+THUMBNAIL_CREATE = 'thumb_create'
+
+_state = threading.local()
+
+
+class Probe:
+
+    def __init__(self, request=None):
+        self.request = request
+        self.durations = defaultdict(float)
+        self.counts = Counter()
+        self.depth = Counter()
+
+
+def current():
+    return getattr(_state, 'probe', None)
+
+
+@contextmanager
+def activate(request=None):
+    """Включает замеры для текущего потока, в том числе запросов к базе."""
+    probe = _state.probe = Probe(request)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(db_wrapper))
+            yield probe
+    finally:
+        _state.probe = None
+
+
+@contextmanager
+def measure(name):
+    probe = current()
+    if probe is None or probe.depth[name]:
+        yield
+        return
+    probe.depth[name] += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        probe.depth[name] -= 1
+        probe.durations[name] += time.perf_counter() - started
+        probe.counts[name] += 1
+
+
+def db_wrapper(execute, sql, params, many, context):
+    with measure(DB):
+        return execute(sql, params, many, context)
+
+
+def measure_view(view):
+    return measure(VIEW)
+
+
+def measure_template(template):
+    return measure(TEMPLATE)
+
+
+def measure_thumbnail(file_, geometry_string):
+    return measure(THUMBNAIL)
+
+
+def measure_thumbnail_create():
+    return measure(THUMBNAIL_CREATE)
+
+
+def install():
+    """Подключает точки замера. Повторные вызовы ничего не делают."""
+    hooks.register(hooks.VIEW, measure_view)
+    hooks.register(hooks.TEMPLATE, measure_template)
+    hooks.register(hooks.THUMBNAIL, measure_thumbnail)
+    hooks.register(hooks.THUMBNAIL_CREATE, measure_thumbnail_create)
+    hooks.install()
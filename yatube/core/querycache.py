@@ -0,0 +1,174 @@
+"""Кэш результатов запросов ORM с версиями таблиц.
+
+``Model.objects.cached()`` возвращает queryset, результаты которого
+хранятся в кэше под ключом из SQL, параметров и версий всех таблиц,
+участвующих в запросе (включая присоединённые и подзапросы в WHERE).
+Версия таблицы — метка ``table-<имя>`` из page_cache: любая запись
+в таблицу через save, delete, изменение m2m, update или bulk_create
+сбрасывает её, и прежние результаты просто перестают находиться.
+Сигналы сбрасывают только таблицы из ``cached_tables()``, чтобы запись
+сессий и прочих таблиц не стоила записи в кэш. Запись в обход ORM
+(сырой SQL, миграции) кэш не замечает.
+
+Строки ``cached()`` лежат в общем кэше, поэтому запросы к
+пользователям ограничивают поля через ``only()`` или ``values()``:
+хэш пароля и почте там делать нечего.
+"""
+import functools
+import hashlib
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, models, transaction
+from django.db.models.sql import Query
+
+from .page_cache import get_versions, purge
+
+
+def table_key(table):
+    return f'table-{table}'
+
+
+def purge_tables(*tables, using=None):
+    """Сбрасывает версии таблиц.
+
+    Внутри транзакции версии сбрасываются ещё раз после коммита, чтобы
+    в кэше не задержались результаты, прочитанные другими процессами
+    до того, как изменения стали им видны.
+    """
+    keys = [table_key(table) for table in tables]
+    purge(*keys)
+    if connections[using or 'default'].in_atomic_block:
+        transaction.on_commit(lambda: purge(*keys), using=using)
+
+
+def where_tables(node):
+    tables = set()
+    for child in getattr(node, 'children', ()):
+        tables |= where_tables(child)
+        rhs = getattr(child, 'rhs', None)
+        rhs = getattr(rhs, 'query', rhs)
+        if isinstance(rhs, Query):
+            tables |= query_tables(rhs)
+    return tables
+
+
+def query_tables(query):
+    """Таблицы, от которых зависит результат запроса."""
+    tables = {query.get_meta().db_table}
+    tables.update(join.table_name for join in query.alias_map.values())
+    return tables | where_tables(query.where)
+
+
+class CachedQuerySet(models.QuerySet):
+    """QuerySet, который после ``cached()`` берёт результаты из кэша."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cache_timeout = None
+
+    def cached(self, timeout=None):
+        clone = self._chain()
+        clone._cache_timeout = (
+            settings.QUERY_CACHE_TIMEOUT if timeout is None else timeout
+        )
+        return clone
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._cache_timeout = self._cache_timeout
+        return clone
+
+    def query_cache_key(self, query, kind):
+        """Ключ результата или None, если запрос не нужно кэшировать."""
+        if self._cache_timeout is None:
+            return None
+        try:
+            sql, params = query.get_compiler(using=self.db).as_sql()
+        except EmptyResultSet:
+            return None
+        versions = get_versions(
+            map(table_key, sorted(query_tables(query))), create=True
+        )
+        raw = f'{self.db}:{kind}:{sql}:{params!r}:{sorted(versions.items())}'
+        return f'query:{hashlib.md5(raw.encode()).hexdigest()}'
+
+    def cached_value(self, kind, compute, query=None):
+        key = self.query_cache_key(
+            self.query.chain() if query is None else query, kind
+        )
+        if key is None:
+            return compute()
+        value = cache.get(key)
+        if value is None:
+            value = compute()
+            cache.set(key, value, self._cache_timeout)
+        return value
+
+    def _fetch_all(self):
+        if self._result_cache is None and self._cache_timeout is not None:
+            self._result_cache = self.cached_value(
+                'rows', lambda: list(self._iterable_class(self))
+            )
+        super()._fetch_all()
+
+    def count(self):
+        if self._result_cache is not None:
+            return len(self._result_cache)
+        return self.cached_value('count', super().count)
+
+    def exists(self):
+        if self._result_cache is not None:
+            return bool(self._result_cache)
+        return self.cached_value('exists', super().exists)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        purge_tables(self.model._meta.db_table, using=self.db)
+        return objs
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        super().bulk_update(objs, fields, batch_size=batch_size)
+        purge_tables(self.model._meta.db_table, using=self.db)
+
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        purge_tables(self.model._meta.db_table, using=self.db)
+        return rows
+
+    update.alters_data = True
+
+
+CachedManager = models.Manager.from_queryset(CachedQuerySet)
+
+
+@functools.lru_cache(maxsize=None)
+def cached_tables():
+    """Таблицы, которые могут попасть в запросы через ``cached()``.
+
+    Это таблицы моделей с CachedQuerySet, их m2m-таблицы и таблицы
+    связанных с ними моделей (их присоединяют JOIN и подзапросы, сюда
+    же попадает User, который читается через ``cached(User)``).
+    """
+    tables = set()
+    for model in apps.get_models():
+        if not isinstance(model._default_manager.all(), CachedQuerySet):
+            continue
+        tables.add(model._meta.db_table)
+        for field in model._meta.get_fields():
+            if not field.is_relation or field.related_model is None:
+                continue
+            tables.add(field.related_model._meta.db_table)
+            if field.many_to_many:
+                through = getattr(field, 'through', None) or (
+                    field.remote_field.through
+                )
+                tables.add(through._meta.db_table)
+    return frozenset(tables)
+
+
+def cached(model, timeout=None):
+    """Кэширующий queryset для моделей со сторонним менеджером (User)."""
+    return CachedQuerySet(model).cached(timeout)
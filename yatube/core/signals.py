@@ -0,0 +1,32 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from . import slow_queries, sqlite
+from .querycache import cached_tables, purge_tables
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    sqlite.configure(connection)
+
+
+@receiver(connection_created)
+def install_slow_query_log(sender, connection, **kwargs):
+    slow_queries.install(connection)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def purge_model_table(sender, using, **kwargs):
+    if sender._meta.db_table in cached_tables():
+        purge_tables(sender._meta.db_table, using=using)
+
+
+@receiver(m2m_changed)
+def purge_through_table(sender, action, using, **kwargs):
+    if (
+        action in ('post_add', 'post_remove', 'post_clear')
+        and sender._meta.db_table in cached_tables()
+    ):
+        purge_tables(sender._meta.db_table, using=using)
@@ -0,0 +1,137 @@
+"""Журнал медленных запросов к базе с планом выполнения.
+
+Обёртка ``execute_wrapper`` ставится на каждое новое соединение
+(сигнал connection_created) и пишет в логгер ``core.slow_queries``
+строку JSON о каждом запросе дольше SLOW_QUERY_THRESHOLD секунд: view,
+время, SQL, параметры и план — EXPLAIN QUERY PLAN у SQLite и EXPLAIN
+у остальных баз. Вместо значений параметров пишутся их тип и хэш:
+в них бывают пароли и личные данные. План одной формы запроса
+снимается не чаще раза в SLOW_QUERY_EXPLAIN_INTERVAL секунд, EXPLAIN
+идёт в точке сохранения, чтобы его ошибка не прервала транзакцию
+вызывающего кода (в PostgreSQL ошибка прерывает всю транзакцию). Файл
+журнала и его ротация настраиваются в LOGGING, сводку строит
+``manage.py slow_query_report``.
+"""
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from . import probes
+
+logger = logging.getLogger(__name__)
+
+EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+# Сколько форм запросов помнить для ограничения частоты EXPLAIN.
+MAX_EXPLAINED_SHAPES = 1000
+
+_state = threading.local()
+_explained = OrderedDict()
+_explained_lock = threading.Lock()
+
+NUMBER_RE = re.compile(r'\b\d+(\.\d+)?\b')
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+IN_LIST_RE = re.compile(r'IN \((?:\s*%s\s*,?)+\)')
+SPACE_RE = re.compile(r'\s+')
+
+
+def normalize(sql):
+    """Форма запроса: без литералов и с одинаковыми списками IN."""
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    sql = IN_LIST_RE.sub('IN (...)', sql)
+    return SPACE_RE.sub(' ', sql).strip()
+
+
+def redact(param):
+    """Тип и начало хэша значения: одинаковые значения видны, сами — нет."""
+    if param is None:
+        return 'None'
+    digest = hashlib.sha256(str(param).encode()).hexdigest()[:12]
+    return f'{type(param).__name__}:{digest}'
+
+
+def should_explain(shape):
+    """Пора ли снова снимать план запросов этой формы."""
+    now = time.monotonic()
+    with _explained_lock:
+        last = _explained.get(shape)
+        if (
+            last is not None
+            and now - last < settings.SLOW_QUERY_EXPLAIN_INTERVAL
+        ):
+            return False
+        _explained[shape] = now
+        _explained.move_to_end(shape)
+        while len(_explained) > MAX_EXPLAINED_SHAPES:
+            _explained.popitem(last=False)
+    return True
+
+
+def explain(connection, sql, params):
+    prefix = (
+        'EXPLAIN QUERY PLAN' if connection.vendor == 'sqlite' else 'EXPLAIN'
+    )
+    _state.explaining = True
+    try:
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(f'{prefix} {sql}', params)
+                rows = cursor.fetchall()
+    except DatabaseError as error:
+        return [f'EXPLAIN failed: {error}']
+    finally:
+        _state.explaining = False
+    if connection.vendor == 'sqlite':
+        return [row[-1] for row in rows]
+    return [' '.join(map(str, row)) for row in rows]
+
+
+def current_view():
+    probe = probes.current()
+    request = getattr(probe, 'request', None)
+    match = getattr(request, 'resolver_match', None)
+    if match is not None:
+        return match.view_name
+    return 'unresolved' if request is not None else '-'
+
+
+def log_query(connection, sql, params, duration):
+    operation = sql.lstrip().split(None, 1)[0].upper() if sql else ''
+    plan = []
+    if operation in EXPLAINABLE and should_explain(normalize(sql)):
+        plan = explain(connection, sql, params)
+    logger.warning(json.dumps({
+        'time': timezone.now().isoformat(),
+        'alias': connection.alias,
+        'vendor': connection.vendor,
+        'view': current_view(),
+        'duration_ms': round(duration * 1000, 3),
+        'sql': sql,
+        'params': [redact(param) for param in params or ()],
+        'plan': plan,
+    }, ensure_ascii=False))
+
+
+def slow_query_wrapper(execute, sql, params, many, context):
+    threshold = settings.SLOW_QUERY_THRESHOLD
+    if threshold is None or getattr(_state, 'explaining', False):
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration = time.perf_counter() - started
+    if duration >= threshold and not many:
+        log_query(context['connection'], sql, params, duration)
+    return result
+
+
+def install(connection):
+    if slow_query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(slow_query_wrapper)
@@ -0,0 +1,23 @@
+"""Настройки соединений SQLite для продакшна.
+
+Каждое новое соединение получает PRAGMA из SQLITE_PRAGMAS: журнал WAL,
+в котором запись не блокирует чтение, synchronous=NORMAL (в режиме WAL
+база не портится при сбое, теряются лишь последние транзакции),
+отображение файла в память, больший кэш страниц, ожидание блокировки
+вместо немедленной ошибки и временные таблицы в памяти. Вместе
+с CONN_MAX_AGE соединение и его настройки переживают запрос.
+"""
+from django.conf import settings
+
+
+def apply_pragmas(cursor, pragmas=None):
+    pragmas = settings.SQLITE_PRAGMAS if pragmas is None else pragmas
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def configure(connection):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor)
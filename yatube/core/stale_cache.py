@@ -0,0 +1,105 @@
+"""Кэш со stale-while-revalidate и защитой от одновременных пересчётов.
+
+Значение хранится вместе со сроком свежести и живёт в кэше дольше него.
+Когда срок истёк, пересчёт выполняет только тот, кто первым захватил
+блокировку (ключ ``<ключ>:lock``, записанный через ``cache.add``),
+а остальные запросы в это время получают устаревшее значение. Если
+значения нет совсем, остальные ждут результата победителя. Браузер,
+который только что что-то записал, устаревшую страницу не получает:
+PageCacheMiddleware пропускает его мимо кэша страниц. Срок жизни
+размывается случайным образом, чтобы ключи, записанные одновременно,
+не истекали тоже одновременно.
+"""
+import random
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.core.cache import cache
+
+JITTER = 0.1
+LOCK_TIMEOUT = 10
+WAIT_INTERVAL = 0.05
+
+Entry = namedtuple('Entry', ('value', 'fresh_until'))
+
+
+def jittered(timeout, jitter=JITTER):
+    return timeout * random.uniform(1 - jitter, 1 + jitter)
+
+
+def lock_key(key):
+    return f'{key}:lock'
+
+
+def acquire(key, timeout=LOCK_TIMEOUT):
+    """Захватывает блокировку пересчёта ключа, не дожидаясь её."""
+    return cache.add(lock_key(key), True, timeout)
+
+
+def release(key):
+    cache.delete(lock_key(key))
+
+
+@contextmanager
+def try_locked(key, timeout=LOCK_TIMEOUT):
+    """Пробует захватить блокировку ключа один раз, не дожидаясь её.
+
+    Отдаёт True, если блокировку удалось захватить, иначе False:
+    путь записи не должен стоять за чужим пересчётом.
+    """
+    acquired = acquire(key, timeout)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            release(key)
+
+
+def is_fresh(entry):
+    return entry.fresh_until > time.time()
+
+
+def make_entry(value, timeout):
+    """Возвращает запись и время её хранения в кэше с учётом устаревания."""
+    fresh = jittered(timeout)
+    return Entry(value, time.time() + fresh), fresh + timeout
+
+
+def set_value(key, value, timeout):
+    entry, ttl = make_entry(value, timeout)
+    cache.set(key, entry, ttl)
+
+
+def wait_for(key, timeout=LOCK_TIMEOUT):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def get_or_set(key, compute, timeout):
+    """Возвращает значение ключа, пересчитывая его не более одного раза.
+
+    ``compute`` вызывается без аргументов только в том процессе, который
+    захватил блокировку; остальные получают устаревшее значение или,
+    если его нет, ждут нового.
+    """
+    entry = cache.get(key)
+    if entry is not None and is_fresh(entry):
+        return entry.value
+    if acquire(key):
+        try:
+            value = compute()
+            set_value(key, value, timeout)
+            return value
+        finally:
+            release(key)
+    if entry is None:
+        entry = wait_for(key)
+    if entry is None:
+        return compute()
+    return entry.value
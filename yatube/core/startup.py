@@ -0,0 +1,87 @@
+"""Прогрев процесса при запуске.
+
+Всё, что Django и библиотеки откладывают до первого обращения, делается
+при импорте yatube/wsgi.py, а не в первом запросе воркера: сборка
+URL-резолвера, компиляция шаблонов (их кэширует cached.Loader), загрузка
+плагинов Pillow и объектов sorl-thumbnail, чтение сжатого списка паролей
+CommonPasswordValidator. Команды manage.py и тесты не прогреваются.
+"""
+import logging
+import os
+import time
+
+from django.contrib.auth.password_validation import \
+    get_default_password_validators
+from django.template import TemplateSyntaxError, engines
+from django.template.backends.django import DjangoTemplates
+from django.urls import get_resolver, reverse
+from django.utils.functional import empty
+
+logger = logging.getLogger(__name__)
+
+
+def warm_url_resolver():
+    resolver = get_resolver()
+    resolver.resolve('/')
+    reverse('posts:index')
+    return len(resolver.reverse_dict)
+
+
+def template_names(directory):
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.endswith(('.html', '.txt')):
+                path = os.path.join(root, name)
+                yield os.path.relpath(path, directory).replace(os.sep, '/')
+
+
+def warm_templates():
+    """Компилирует шаблоны из DIRS всех движков Django."""
+    compiled = 0
+    for engine in engines.all():
+        if not isinstance(engine, DjangoTemplates):
+            continue
+        for directory in engine.engine.dirs:
+            for name in template_names(directory):
+                try:
+                    engine.get_template(name)
+                except TemplateSyntaxError:
+                    logger.warning('Шаблон %s не компилируется', name)
+                    continue
+                compiled += 1
+    return compiled
+
+
+def warm_thumbnails():
+    from PIL import Image
+    from sorl.thumbnail import default
+
+    Image.init()
+    for lazy in (default.backend, default.engine, default.kvstore,
+                 default.storage):
+        if lazy._wrapped is empty:
+            lazy._setup()
+    return len(Image.OPEN)
+
+
+def warm_password_validators():
+    return len(get_default_password_validators())
+
+
+WARMERS = (
+    ('urls', warm_url_resolver),
+    ('templates', warm_templates),
+    ('thumbnails', warm_thumbnails),
+    ('password_validators', warm_password_validators),
+)
+
+
+def warm_up():
+    """Выполняет все прогревы и возвращает {имя: (результат, секунды)}."""
+    timings = {}
+    for name, warmer in WARMERS:
+        started = time.perf_counter()
+        result = warmer()
+        timings[name] = (result, time.perf_counter() - started)
+    logger.debug('Прогрев при запуске: %s', timings)
+    return timings
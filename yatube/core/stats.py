@@ -0,0 +1,27 @@
+"""Перцентили и сводки замеров для команд-бенчмарков."""
+import math
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(values, percent):
+    """Перцентиль с линейной интерполяцией, как numpy.percentile."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * percent / 100
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    if lower == upper:
+        return ordered[lower]
+    return (ordered[lower] * (upper - position)
+            + ordered[upper] * (position - lower))
+
+
+def summary(values, percents=PERCENTILES):
+    """{'p50': ..., 'p90': ..., 'p99': ..., 'mean': ..., 'max': ...}."""
+    result = {f'p{percent}': percentile(values, percent)
+              for percent in percents}
+    result['mean'] = sum(values) / len(values) if values else 0.0
+    result['max'] = max(values, default=0.0)
+    return result
@@ -0,0 +1,12 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core.fragments import marker
+
+register = template.Library()
+
+
+@register.simple_tag
+def fragment(name, *args):
+    """Выводит маркер персонального фрагмента страницы."""
+    return mark_safe(marker(name, args))
@@ -0,0 +1,47 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+
+from core import stale_cache
+
+register = template.Library()
+
+
+class StaleCacheNode(template.Node):
+    def __init__(self, nodelist, expire_time_var, fragment_name, vary_on):
+        self.nodelist = nodelist
+        self.expire_time_var = expire_time_var
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        expire_time = int(self.expire_time_var.resolve(context))
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        return stale_cache.get_or_set(
+            make_template_fragment_key(self.fragment_name, vary_on),
+            lambda: self.nodelist.render(context),
+            expire_time
+        )
+
+
+@register.tag('stalecache')
+def do_stale_cache(parser, token):
+    """Как {% cache %}, но фрагмент пересчитывает только один запрос.
+
+    Пока фрагмент пересчитывается, остальные запросы получают
+    устаревшую версию::
+
+        {% stalecache 20 index_page page %}...{% endstalecache %}
+    """
+    nodelist = parser.parse(('endstalecache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            f'{tokens[0]!r} tag requires at least 2 arguments.'
+        )
+    return StaleCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(bit) for bit in tokens[3:]],
+    )
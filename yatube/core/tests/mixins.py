@@ -0,0 +1,54 @@
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import override_settings
+
+
+class CacheClearMixin:
+    """Каждый тест начинается с пустого кэша.
+
+    Кэш страниц, запросов и лент общий для всех тестов, и оставленная
+    одним тестом запись подменила бы ответ в следующем.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+
+class TempDirMixin(CacheClearMixin):
+    """Пустой кэш и своя временная папка self.directory на каждый тест.
+
+    Загруженные в тесте файлы тоже попадают в неё (MEDIA_ROOT).
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        media = override_settings(MEDIA_ROOT=self.directory)
+        media.enable()
+        self.addCleanup(media.disable)
+
+
+class TempMediaMixin:
+    """Временный MEDIA_ROOT на весь класс, для загрузок в setUpClass.
+
+    Настройка меняется через override_settings: присвоение
+    settings.MEDIA_ROOT не сбрасывает уже созданное хранилище файлов,
+    и картинки уходили в media/ рядом с кодом.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.media_override = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media_override.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
@@ -0,0 +1,124 @@
+from django.core.cache import caches
+from django.test import SimpleTestCase
+
+from core.cache_backends import TieredCache
+
+
+def make_cache(location, **options):
+    """Отдельный location — отдельный L1, как у другого процесса."""
+    options = {'SHARED_CACHE': 'shared', **options}
+    return TieredCache(location, {'OPTIONS': options})
+
+
+class TieredCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.cache = self.make_cache('worker-1', INVALIDATION_CHECK_INTERVAL=0)
+        self.other = self.make_cache('worker-2', INVALIDATION_CHECK_INTERVAL=0)
+
+    def make_cache(self, name, **options):
+        return make_cache(f'{self.id()}-{name}', **options)
+
+    def test_reads_are_served_from_local_cache(self):
+        """Повторное чтение не обращается к общему кэшу."""
+        self.cache.set('page:1', 'shell')
+        caches['shared'].delete('page:1')
+        self.assertEqual(self.cache.get('page:1'), 'shell')
+        self.assertEqual(self.cache.stats()['l1_hits'], 1)
+
+    def test_local_cache_is_filled_on_shared_hit(self):
+        """Попадание в общий кэш кладёт значение в L1."""
+        self.other.set('page:1', 'shell')
+        self.assertEqual(self.cache.get('page:1'), 'shell')
+        self.assertEqual(self.cache.get('page:1'), 'shell')
+        stats = self.cache.stats()
+        self.assertEqual(stats['l2_hits'], 1)
+        self.assertEqual(stats['l1_hits'], 1)
+
+    def test_values_are_copied(self):
+        """Изменение полученного объекта не портит значение в L1."""
+        self.cache.set('page:1', {'content': 'shell'})
+        self.cache.get('page:1')['content'] = 'changed'
+        self.assertEqual(self.cache.get('page:1'), {'content': 'shell'})
+
+    def test_write_by_other_process_invalidates_key(self):
+        """Чужая запись сбрасывает в L1 только изменённый ключ."""
+        self.cache.set('page:1', 'old')
+        self.cache.set('page:2', 'shell')
+        self.other.set('page:1', 'new')
+        self.assertEqual(self.cache.get('page:1'), 'new')
+        self.assertEqual(self.cache.stats()['l1_invalidations'], 1)
+        caches['shared'].delete('page:2')
+        self.assertEqual(self.cache.get('page:2'), 'shell')
+
+    def test_locks_do_not_touch_other_entries(self):
+        """Блокировки и их снятие не сбрасывают L1 других процессов."""
+        self.cache.set('page:1', 'shell')
+        self.other.add('page:1:lock', True)
+        self.other.delete('page:1:lock')
+        caches['shared'].delete('page:1')
+        self.assertEqual(self.cache.get('page:1'), 'shell')
+
+    def test_add_and_incr_by_other_process(self):
+        """Удачный add и incr в другом процессе сбрасывают ключ в L1."""
+        self.other.set('counter', 1)
+        self.assertEqual(self.cache.get('counter'), 1)
+        self.other.incr('counter')
+        self.assertEqual(self.cache.get('counter'), 2)
+        self.other.delete('token')
+        self.assertIsNone(self.cache.get('token'))
+        self.cache.set('token', 'local')
+        caches['shared'].delete('token')
+        self.assertTrue(self.other.add('token', 'shared'))
+        self.assertEqual(self.cache.get('token'), 'shared')
+
+    def test_own_writes_keep_local_entries(self):
+        """Свои записи процесса не сбрасывают его же L1."""
+        self.cache.set('page:1', 'one')
+        self.cache.set('page:2', 'two')
+        caches['shared'].delete('page:1')
+        self.assertEqual(self.cache.get('page:1'), 'one')
+        self.assertNotIn('l1_invalidations', self.cache.stats())
+
+    def test_lagging_process_clears_local_cache(self):
+        """Отставший больше чем на журнал процесс очищает L1."""
+        self.cache.set('page:1', 'shell')
+        self.cache.get('page:1')
+        caches['shared'].set('tiered:seq', 10 ** 6)
+        self.assertEqual(self.cache.stats()['l1_size'], 1)
+        caches['shared'].delete('page:1')
+        self.assertIsNone(self.cache.get('page:1'))
+
+    def test_delete_by_other_process(self):
+        """Удаление в другом процессе видно сразу."""
+        self.cache.set('page:1', 'shell')
+        self.other.delete('page:1')
+        self.assertIsNone(self.cache.get('page:1'))
+
+    def test_log_is_checked_once_per_interval(self):
+        """Журнал изменений читается не чаще интервала."""
+        cache = self.make_cache('worker-3', INVALIDATION_CHECK_INTERVAL=60)
+        cache.set('page:1', 'old')
+        self.other.set('page:1', 'new')
+        self.assertEqual(cache.get('page:1'), 'old')
+
+    def test_lru_eviction(self):
+        """L1 вытесняет давно не читанные ключи."""
+        cache = self.make_cache('worker-4', L1_MAX_ENTRIES=2)
+        cache.set('page:1', 1)
+        cache.set('page:2', 2)
+        cache.get('page:1')
+        cache.set('page:3', 3)
+        self.assertEqual(cache.stats()['l1_size'], 2)
+        self.assertEqual(cache.stats()['l1_evictions'], 1)
+        caches['shared'].delete_many(['page:1', 'page:2', 'page:3'])
+        self.assertEqual(cache.get('page:1'), 1)
+        self.assertIsNone(cache.get('page:2'))
+
+    def test_locks_go_to_shared_cache(self):
+        """Блокировки берутся в общем кэше, а не в L1."""
+        self.assertTrue(self.cache.add('page:1:lock', True))
+        self.assertFalse(self.other.add('page:1:lock', True))
+        self.cache.delete('page:1:lock')
+        self.assertTrue(self.other.add('page:1:lock', True))
@@ -0,0 +1,202 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from core import db_router
+from core.middleware import ReplicaStickinessMiddleware
+from core.tests.mixins import CacheClearMixin, TempDirMixin
+from posts.models import Post
+
+User = get_user_model()
+REPLICAS = ['replica1', 'replica2']
+# Сайт с основной базой и репликой в настоящих файлах SQLite. Тестовая
+# база Django живёт в памяти, и копию с неё не снять, поэтому сценарий
+# идёт в отдельном процессе.
+REPLICA_SCENARIO = """
+import json
+import sys
+
+import yatube.settings as config
+config.DATABASES['default']['NAME'] = sys.argv[1]
+config.DEBUG = False
+
+import django
+django.setup()
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client
+from django.test.utils import setup_test_environment
+from django.urls import reverse
+
+from core.db_router import copy_sqlite
+from core.middleware import CACHE_STATUS_HEADER
+
+setup_test_environment()
+call_command('migrate', verbosity=0)
+author = get_user_model().objects.create_user(username='author')
+copy_sqlite(sys.argv[1], sys.argv[2])
+profile = reverse('posts:profile', args=['author'])
+visitor, writer = Client(), Client()
+writer.force_login(author)
+result = {'before': visitor.get(profile).get(CACHE_STATUS_HEADER)}
+response = writer.post(reverse('posts:post_create'), {'text': 'Новый пост'})
+result['redirect'] = response.url
+lagging = visitor.get(profile)
+result['lagging'] = [lagging.get(CACHE_STATUS_HEADER),
+                     'Новый пост' in lagging.content.decode()]
+redirected = writer.get(response.url)
+result['redirected'] = [redirected.get(CACHE_STATUS_HEADER),
+                        'Новый пост' in redirected.content.decode()]
+copy_sqlite(sys.argv[1], sys.argv[2])
+synced = visitor.get(profile)
+result['synced'] = 'Новый пост' in synced.content.decode()
+print(json.dumps(result))
+"""
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS)
+class ReplicaRouterTest(TestCase):
+
+    def setUp(self):
+        self.router = db_router.ReplicaRouter()
+        db_router.reset()
+        self.addCleanup(db_router.reset)
+
+    def test_reads_go_to_one_replica_per_request(self):
+        """Все чтения запроса идут в одну и ту же реплику."""
+        first = self.router.db_for_read(Post)
+        self.assertIn(first, REPLICAS)
+        for _ in range(10):
+            self.assertEqual(self.router.db_for_read(Post), first)
+
+    def test_reads_after_write_go_to_primary(self):
+        """После записи запрос читает из основной базы."""
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.assertTrue(db_router.wrote())
+
+    def test_migrations_only_on_primary(self):
+        """Миграции применяются только к основной базе."""
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+        self.assertFalse(self.router.allow_migrate('replica1', 'posts'))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        """Без реплик чтения идут в основную базу."""
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS)
+class ReplicaStickinessMiddlewareTest(TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = db_router.ReplicaRouter()
+
+    def run_request(self, request, write=False):
+        databases = []
+
+        def view(request):
+            databases.append(self.router.db_for_read(Post))
+            if write:
+                self.router.db_for_write(Post)
+            return HttpResponse()
+
+        response = ReplicaStickinessMiddleware(view)(request)
+        return databases[0], response
+
+    def test_get_reads_replica(self):
+        """GET без записи читает реплику и не ставит cookie."""
+        database, response = self.run_request(self.factory.get('/'))
+        self.assertIn(database, REPLICAS)
+        self.assertNotIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+
+    def test_write_sets_sticky_cookie(self):
+        """Запись ставит cookie чтения из основной базы."""
+        database, response = self.run_request(self.factory.post('/'),
+                                              write=True)
+        self.assertEqual(database, 'default')
+        cookie = response.cookies[settings.REPLICA_STICKY_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_STICKY_SECONDS)
+        self.assertFalse(db_router.is_pinned())
+
+    def test_sticky_cookie_reads_primary(self):
+        """С cookie после записи чтения идут в основную базу."""
+        request = self.factory.get('/')
+        request.COOKIES[settings.REPLICA_STICKY_COOKIE] = '1'
+        database, _ = self.run_request(request)
+        self.assertEqual(database, 'default')
+
+
+class StickyAfterPostTest(CacheClearMixin, TestCase):
+
+    def test_post_create_sets_sticky_cookie(self):
+        """Создание поста привязывает автора к основной базе."""
+        user = User.objects.create_user(username='author')
+        self.client.force_login(user)
+        response = self.client.post(reverse('posts:post_create'),
+                                    {'text': 'Новый пост'})
+        self.assertRedirects(response, reverse('posts:profile',
+                                               args=['author']))
+        self.assertIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+
+
+class CopySqliteTest(TempDirMixin, TestCase):
+
+    def test_copy(self):
+        """copy_sqlite снимает согласованную копию и обновляет её."""
+        source = os.path.join(self.directory, 'primary.sqlite3')
+        target = os.path.join(self.directory, 'replica.sqlite3')
+        with sqlite3.connect(source) as db:
+            db.execute('CREATE TABLE item (name TEXT)')
+            db.execute("INSERT INTO item VALUES ('первый')")
+        db_router.copy_sqlite(source, target)
+        replica = sqlite3.connect(target)
+        self.addCleanup(replica.close)
+        self.assertEqual(replica.execute('SELECT count(*) FROM item')
+                         .fetchone()[0], 1)
+        with sqlite3.connect(source) as db:
+            db.execute("INSERT INTO item VALUES ('второй')")
+        db_router.copy_sqlite(source, target)
+        self.assertEqual(replica.execute('SELECT count(*) FROM item')
+                         .fetchone()[0], 2)
+
+
+class ReplicaFilesTest(TempDirMixin, TestCase):
+
+    def test_redirect_after_write_shows_new_post(self):
+        """После записи редирект видит пост, пока реплика отстаёт.
+
+        Основная база и реплика — файлы SQLite, реплика обновляется
+        только через copy_sqlite. Пока она отстаёт, автор после
+        редиректа читает основную базу мимо кэша страниц, а страница,
+        которую с реплики собрал другой посетитель, в кэш не попадает.
+        """
+        primary = os.path.join(self.directory, 'primary.sqlite3')
+        replica = os.path.join(self.directory, 'replica.sqlite3')
+        env = {name: value for name, value in os.environ.items()
+               if not name.startswith(('DJANGO_DB_', 'POSTGRES_'))}
+        env.update(DJANGO_DB_REPLICAS=replica,
+                   DJANGO_SETTINGS_MODULE='yatube.settings')
+        completed = subprocess.run(
+            [sys.executable, '-c', REPLICA_SCENARIO, primary, replica],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+            timeout=120,
+        )
+        self.assertEqual(completed.returncode, 0, completed.stderr)
+        result = json.loads(completed.stdout.splitlines()[-1])
+        self.assertEqual(result['before'], 'MISS')
+        self.assertEqual(result['redirect'],
+                         reverse('posts:profile', args=['author']))
+        self.assertEqual(result['lagging'], [None, False])
+        self.assertEqual(result['redirected'], [None, True])
+        self.assertTrue(result['synced'])
@@ -0,0 +1,54 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.tests.mixins import CacheClearMixin
+from posts.models import Follow
+
+User = get_user_model()
+
+
+class FragmentTest(CacheClearMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        super().setUp()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def get_fragment(self, name, *args):
+        return self.client.get(
+            reverse('core:fragment', kwargs={'name': name}),
+            {'arg': args}
+        )
+
+    def test_fragment_endpoint(self):
+        """Фрагмент можно получить отдельным запросом."""
+        response = self.get_fragment('header', 'posts:index')
+        self.assertContains(response, 'Пользователь: user')
+        response = self.get_fragment('unknown')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_follow_button_follows_subscription(self):
+        """Кэш кнопки подписки сбрасывается при подписке."""
+        self.assertContains(
+            self.get_fragment('follow_button', 'author'), 'Подписаться'
+        )
+        Follow.objects.create(user=self.user, author=self.author)
+        self.assertContains(
+            self.get_fragment('follow_button', 'author'), 'Отписаться'
+        )
+
+    def test_profile_page_follow_button(self):
+        """Страница профиля из кэша показывает кнопку текущего пользователя."""
+        url = reverse('posts:profile', kwargs={'username': 'author'})
+        Client().get(url)
+        Follow.objects.create(user=self.user, author=self.author)
+        response = self.client.get(url)
+        self.assertContains(response, 'Отписаться')
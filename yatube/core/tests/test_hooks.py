@@ -0,0 +1,32 @@
+from django.template import engines
+from django.test import SimpleTestCase
+
+from core import hooks, probes, tracing
+
+
+class HooksTest(SimpleTestCase):
+
+    def test_probes_and_tracing_share_one_patch(self):
+        """Замеры и трассировка подменяют метод один раз."""
+        from django.template.base import Template
+
+        probes.install()
+        tracing.install()
+        render = Template.render
+        probes.install()
+        tracing.install()
+        self.assertIs(Template.render, render)
+        self.assertIn(probes.measure_template, hooks._hooks[hooks.TEMPLATE])
+        self.assertIn(tracing.template_span, hooks._hooks[hooks.TEMPLATE])
+
+    def test_both_see_one_render(self):
+        """Один рендер шаблона виден и замерам, и трассировке."""
+        probes.install()
+        tracing.install()
+        template = engines['django'].from_string('{{ value }}')
+        with probes.activate() as probe, \
+                tracing.activate(tracing.Trace()) as trace:
+            self.assertEqual(template.render({'value': 'ok'}), 'ok')
+        self.assertEqual(probe.counts[probes.TEMPLATE], 1)
+        self.assertEqual([span.name for span in trace.spans],
+                         ['template <string>'])
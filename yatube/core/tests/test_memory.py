@@ -0,0 +1,80 @@
+import tracemalloc
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TransactionTestCase
+from django.urls import reverse
+
+from core import memory
+from core.tests.mixins import CacheClearMixin
+from posts.models import Post
+
+User = get_user_model()
+
+
+class MemoryProfileTest(CacheClearMixin, TransactionTestCase):
+    """Запросы идут из отдельного потока со своим соединением."""
+
+    def setUp(self):
+        super().setUp()
+        # TransactionTestCase чистит базу после теста, а не до него.
+        User.objects.all().delete()
+        self.author = User.objects.create_user(username='author')
+        self.staff = User.objects.create_user(username='staff',
+                                              is_staff=True)
+        self.post = Post.objects.create(author=self.author,
+                                        text='Тестовый пост')
+        self.path = reverse('posts:post_detail', args=[self.post.id])
+
+    def test_profile(self):
+        """Профиль памяти собран по модулям приложений."""
+        result = memory.profile(self.path, requests=3)
+        self.assertEqual(result.statuses, [200] * 3)
+        self.assertFalse(tracemalloc.is_tracing())
+        modules = {site.module for site in result.sites}
+        self.assertTrue(modules)
+        self.assertTrue(all(
+            module == memory.OTHER or module.split('.')[0] in ('posts', 'core')
+            for module in modules
+        ))
+        self.assertNotIn('core.memory', modules)
+
+    def test_app_module(self):
+        """Файл сопоставляется модулю приложения, кроме memory."""
+        self.assertEqual(
+            memory.app_module(memory.__file__.replace('memory', 'probes'),
+                              ('core',)),
+            'core.probes'
+        )
+        self.assertIsNone(memory.app_module(memory.__file__, ('core',)))
+        self.assertIsNone(memory.app_module(tracemalloc.__file__, ('core',)))
+
+    def test_view_is_staff_only(self):
+        """Страница профиля памяти доступна только персоналу."""
+        url = reverse('core:memory')
+        response = self.client.get(url, {'path': self.path})
+        self.assertEqual(response.status_code, 302)
+        self.client.force_login(self.author)
+        response = self.client.get(url, {'path': self.path})
+        self.assertEqual(response.status_code, 302)
+
+    def test_view(self):
+        """Страница показывает профиль и проверяет параметры."""
+        self.client.force_login(self.staff)
+        url = reverse('core:memory')
+        response = self.client.get(url, {'path': self.path, 'requests': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('По модулям:', response.content.decode())
+        for params in ({}, {'path': url}, {'path': self.path, 'requests': 0},
+                       {'path': self.path, 'requests': 'x'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(url, params).status_code, 400)
+
+    def test_command(self):
+        """Команда memory_profile печатает места выделения."""
+        out = StringIO()
+        call_command('memory_profile', self.path, '--requests', '2',
+                     stdout=out)
+        self.assertIn(f'{self.path}: 2 запросов', out.getvalue())
+        self.assertIn('Места выделения:', out.getvalue())
@@ -0,0 +1,98 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics
+from core.tests.mixins import CacheClearMixin
+from posts.models import Post
+
+User = get_user_model()
+METRICS_DIR = tempfile.mkdtemp()
+
+
+@override_settings(METRICS_DIR=METRICS_DIR)
+class MetricsTest(CacheClearMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.create(author=cls.author, text='Тестовый пост')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(METRICS_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def scrape(self):
+        response = self.client.get(reverse('core:metrics'))
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_request_metrics(self):
+        """Запросы попадают в счётчики и гистограммы."""
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        text = self.scrape()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', text)
+        self.assertRegex(
+            text,
+            r'http_requests_total\{method="GET",status="200",'
+            r'view="posts:index"\} \d+'
+        )
+        self.assertRegex(
+            text,
+            r'http_request_duration_seconds_bucket\{view="posts:index",'
+            r'le="\+Inf"\} \d+'
+        )
+        self.assertRegex(text, r'db_queries_total\{view="posts:index"\}')
+        self.assertRegex(text, r'page_cache_requests_total\{result="HIT"\}')
+        self.assertRegex(
+            text, r'cache_requests_total\{layer="l1",result="hits"\}'
+        )
+
+    def test_workers_are_summed(self):
+        """Снимки других воркеров складываются с текущим процессом."""
+        before = metrics.collect().get(
+            ('thumbnails_generated_total', ()), 0
+        )
+        other = os.path.join(METRICS_DIR, '999999.json')
+        with open(other, 'w') as file:
+            json.dump([['thumbnails_generated_total', [], 3]], file)
+        try:
+            after = metrics.collect()[('thumbnails_generated_total', ())]
+        finally:
+            os.remove(other)
+        self.assertEqual(after, before + 3)
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Корзины гистограммы накопительные."""
+        metric = metrics.histogram('test_seconds', 'Тест.', buckets=(1, 2))
+
+        def observe():
+            metric.observe(0.5)
+            metric.observe(1.5)
+            metric.observe(5)
+
+        thread = threading.Thread(target=observe)
+        thread.start()
+        thread.join()
+        self.assertEqual(
+            metrics.snapshot()[('test_seconds', ())], [1, 2, 7, 3]
+        )
+        text = metrics.render(metrics.snapshot())
+        self.assertIn('test_seconds_bucket{le="2"} 2', text)
+        self.assertIn('test_seconds_bucket{le="+Inf"} 3', text)
+        metrics.REGISTRY.pop('test_seconds')
+
+    def test_scrape_is_local_only(self):
+        """Метрики отдаются только локальным адресам."""
+        response = self.client.get(
+            reverse('core:metrics'), REMOTE_ADDR='192.0.2.1'
+        )
+        self.assertEqual(response.status_code, 403)
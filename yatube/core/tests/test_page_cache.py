@@ -0,0 +1,133 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core import page_cache, stale_cache
+from core.middleware import CACHE_STATUS_HEADER
+from core.tests.mixins import CacheClearMixin
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class AnonymousPageCacheTest(CacheClearMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='test_group',
+            slug='test-slug',
+            description='test_description'
+        )
+        cls.other_group = Group.objects.create(
+            title='other_group',
+            slug='other-slug',
+            description='test_description'
+        )
+        cls.post = Post.objects.create(
+            text='test_post',
+            author=cls.author,
+            group=cls.group
+        )
+        cls.post_url = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.pk}
+        )
+        cls.group_url = reverse(
+            'posts:group_list', kwargs={'slug': cls.group.slug}
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.guest_client = Client()
+
+    def assertCacheStatus(self, url, status):
+        response = self.guest_client.get(url)
+        self.assertEqual(response[CACHE_STATUS_HEADER], status)
+        return response
+
+    def test_second_request_is_served_from_cache(self):
+        """Повторный запрос анонима отдаётся из кэша без отрисовки."""
+        for url in (reverse('posts:index'), self.group_url, self.post_url):
+            with self.subTest(url=url):
+                self.assertCacheStatus(url, 'MISS')
+                response = self.assertCacheStatus(url, 'HIT')
+                self.assertTemplateNotUsed(response, 'base.html')
+
+    def test_surrogate_headers_are_not_sent(self):
+        """Метки кэша страниц не уходят клиенту, в том числе из кэша."""
+        for status in ('MISS', 'HIT'):
+            with self.subTest(status=status):
+                response = self.assertCacheStatus(self.post_url, status)
+                self.assertFalse(response.has_header('Surrogate-Key'))
+                self.assertFalse(response.has_header('Surrogate-Control'))
+
+    def test_save_purges_only_affected_pages(self):
+        """Сохранение объекта сбрасывает только страницы с его метками."""
+        self.assertCacheStatus(self.post_url, 'MISS')
+        self.assertCacheStatus(self.group_url, 'MISS')
+        Comment.objects.create(
+            post=self.post, author=self.author, text='comment'
+        )
+        self.assertCacheStatus(self.post_url, 'MISS')
+        self.assertCacheStatus(self.group_url, 'HIT')
+        Post.objects.create(
+            text='new_post', author=self.author, group=self.other_group
+        )
+        self.assertCacheStatus(self.group_url, 'HIT')
+        self.post.group = self.other_group
+        self.post.save()
+        self.assertCacheStatus(self.group_url, 'MISS')
+
+    def test_stale_page_is_served_while_revalidating(self):
+        """Пока страницу перерисовывает другой запрос, отдаётся старая."""
+        response = self.assertCacheStatus(self.post_url, 'MISS')
+        page_cache.purge(f'post-{self.post.pk}')
+        request = response.wsgi_request
+        self.assertTrue(stale_cache.acquire(page_cache.page_key(request)))
+        self.assertCacheStatus(self.post_url, 'STALE')
+        stale_cache.release(page_cache.page_key(request))
+        self.assertCacheStatus(self.post_url, 'MISS')
+
+    def test_sticky_requests_bypass_cache(self):
+        """После своей записи браузер не получает страницу из кэша."""
+        self.assertCacheStatus(self.post_url, 'MISS')
+        page_cache.purge(f'post-{self.post.pk}')
+        request = self.guest_client.get(self.post_url).wsgi_request
+        self.assertTrue(stale_cache.acquire(page_cache.page_key(request)))
+        self.addCleanup(stale_cache.release, page_cache.page_key(request))
+        self.guest_client.cookies[settings.REPLICA_STICKY_COOKIE] = '1'
+        response = self.guest_client.get(self.post_url)
+        self.assertFalse(response.has_header(CACHE_STATUS_HEADER))
+        self.assertTemplateUsed(response, 'posts/post_detail.html')
+
+    def test_author_sees_own_write_while_page_revalidates(self):
+        """Автор после записи не получает устаревшую страницу."""
+        self.assertCacheStatus(self.post_url, 'MISS')
+        client = Client()
+        client.force_login(self.author)
+        comment_url = reverse('posts:add_comment', args=[self.post.pk])
+        # Другой посетитель уже перерисовывает сброшенную страницу.
+        with mock.patch.object(stale_cache, 'acquire', return_value=False):
+            response = client.post(comment_url, {'text': 'Свежий'},
+                                   follow=True)
+            self.assertFalse(response.has_header(CACHE_STATUS_HEADER))
+            self.assertContains(response, 'Свежий')
+            self.assertCacheStatus(self.post_url, 'STALE')
+
+    def test_shell_is_shared_between_users(self):
+        """Оболочка страницы общая, персональные фрагменты у каждого свои."""
+        self.assertCacheStatus(self.post_url, 'MISS')
+        client = Client()
+        client.force_login(self.author)
+        response = client.get(self.post_url)
+        self.assertEqual(response[CACHE_STATUS_HEADER], 'HIT')
+        self.assertContains(response, 'Пользователь: author')
+        self.assertContains(response, 'Редактировать пост')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        response = self.assertCacheStatus(self.post_url, 'HIT')
+        self.assertNotContains(response, 'Пользователь: author')
+        self.assertNotContains(response, 'csrfmiddlewaretoken')
@@ -0,0 +1,96 @@
+import cProfile
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from core.management.commands.profile_report import parse_dump_name
+from core.middleware import SERVER_TIMING_HEADER, ProfilingMiddleware
+from core.tests.mixins import CacheClearMixin
+from posts.models import Post
+
+User = get_user_model()
+DUMP_DIR = tempfile.mkdtemp()
+
+
+@override_settings(PROFILING_DUMP_DIR=DUMP_DIR)
+class ProfilingMiddlewareTest(CacheClearMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.create(author=cls.author, text='Тестовый пост')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(DUMP_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        shutil.rmtree(DUMP_DIR, ignore_errors=True)
+
+    def dumps(self):
+        out = StringIO()
+        call_command('profile_report', '--limit', '3', stdout=out)
+        return out.getvalue()
+
+    def test_server_timing(self):
+        """Ответ несёт Server-Timing с view, базой и шаблонами."""
+        timing = self.client.get('/')[SERVER_TIMING_HEADER]
+        for metric in ('app;dur=', 'view;dur=', 'db;dur=', 'tpl;dur='):
+            with self.subTest(metric=metric):
+                self.assertIn(metric, timing)
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ queries"')
+
+    def test_cached_page_has_no_view_timing(self):
+        """У страницы из кэша нет времени view."""
+        self.client.get('/')
+        timing = self.client.get('/')[SERVER_TIMING_HEADER]
+        self.assertIn('app;dur=', timing)
+        self.assertNotIn('view;dur=', timing)
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_sampled_requests_are_dumped(self):
+        """Выборочные запросы сохраняют профиль."""
+        self.client.get('/')
+        report = self.dumps()
+        self.assertIn('posts:index: профилей 1', report)
+        self.assertIn('function calls', report)
+
+    @override_settings(PROFILING_SLOW_THRESHOLD=0)
+    def test_slow_request_arms_profiling(self):
+        """Медленный запрос включает профиль следующего."""
+        self.assertEqual(self.dumps(), 'Профилей нет.\n')
+        self.client.get('/')
+        self.assertEqual(self.dumps(), 'Профилей нет.\n')
+        self.client.get('/')
+        self.assertIn('posts:index: профилей 1', self.dumps())
+
+    @override_settings(PROFILING_SLOW_THRESHOLD=0)
+    def test_armed_paths_are_capped(self):
+        """Взведённых адресов не больше MAX_ARMED_PATHS."""
+        middleware = ProfilingMiddleware(lambda request: HttpResponse())
+        with mock.patch('core.middleware.MAX_ARMED_PATHS', 2):
+            for path in ('/a/', '/b/', '/c/'):
+                middleware(RequestFactory().get(path))
+        self.assertEqual(list(middleware.armed), ['/b/', '/c/'])
+
+    def test_dump_name_keeps_view_name(self):
+        """Имя view восстанавливается из имени файла без искажений."""
+        for view_name in ('posts:index', 'posts.views.index'):
+            with self.subTest(view_name=view_name):
+                shutil.rmtree(DUMP_DIR, ignore_errors=True)
+                request = RequestFactory().get('/')
+                with mock.patch('core.middleware.get_view_name',
+                                return_value=view_name):
+                    ProfilingMiddleware.dump(request, cProfile.Profile(),
+                                             0.25)
+                name, = os.listdir(DUMP_DIR)
+                self.assertEqual(parse_dump_name(name), (view_name, 250))
@@ -0,0 +1,134 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.test import TestCase
+from django.urls import reverse
+
+from core.querycache import cached, cached_tables
+from core.tests.mixins import CacheClearMixin
+from posts.models import Follow, Group, Post, Tag
+
+User = get_user_model()
+
+
+class QueryCacheTest(CacheClearMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def test_results_are_cached(self):
+        """Повторный запрос через cached() не идёт в базу."""
+        Group.objects.cached().get(slug='test-slug')
+        with self.assertNumQueries(0):
+            group = Group.objects.cached().get(slug='test-slug')
+        self.assertEqual(group, self.group)
+
+    def test_queries_without_cached_are_not_cached(self):
+        """Запросы без cached() в кэш не попадают."""
+        Group.objects.get(slug='test-slug')
+        with self.assertNumQueries(1):
+            Group.objects.get(slug='test-slug')
+
+    def test_parameters_are_part_of_key(self):
+        """Разные параметры запроса — разные ключи кэша."""
+        Group.objects.create(title='Другая', slug='other', description='')
+        self.assertEqual(
+            Group.objects.cached().get(slug='test-slug'), self.group
+        )
+        self.assertEqual(
+            Group.objects.cached().get(slug='other').slug, 'other'
+        )
+
+    def test_save_invalidates_table(self):
+        """Сохранение объекта сбрасывает кэш его таблицы."""
+        self.assertEqual(Group.objects.cached().count(), 1)
+        self.group.title = 'Новое название'
+        self.group.save()
+        with self.assertNumQueries(1):
+            group = Group.objects.cached().get(slug='test-slug')
+        self.assertEqual(group.title, 'Новое название')
+
+    def test_update_and_bulk_create_invalidate_table(self):
+        """update и bulk_create сбрасывают кэш таблицы."""
+        self.assertEqual(Group.objects.cached().count(), 1)
+        Group.objects.bulk_create([
+            Group(title='Вторая', slug='second', description='')
+        ])
+        self.assertEqual(Group.objects.cached().count(), 2)
+        Group.objects.filter(slug='second').update(title='Обновлённая')
+        self.assertTrue(
+            Group.objects.filter(title='Обновлённая').cached().exists()
+        )
+
+    def test_joined_tables_are_tracked(self):
+        """Изменение присоединённой таблицы сбрасывает запрос."""
+        Follow.objects.create(user=self.user, author=self.author)
+        following = Follow.objects.filter(
+            user=self.user, author__username='author'
+        ).cached()
+        self.assertTrue(following.exists())
+        self.author.username = 'renamed'
+        self.author.save()
+        self.assertFalse(following.exists())
+
+    def test_m2m_changes_invalidate_through_table(self):
+        """Изменение связи m2m сбрасывает кэш запросов."""
+        post = Post.objects.create(author=self.author, text='Текст')
+        tag = Tag.objects.create(name='django')
+        tagged = Post.objects.filter(tags__name='django').cached()
+        self.assertEqual(list(tagged), [])
+        post.tags.add(tag)
+        self.assertEqual(list(tagged.all()), [post])
+
+    def test_tag_lookups_are_cached(self):
+        """Тег ленты по тегу читается через свой CachedManager."""
+        tag = Tag.objects.create(name='django')
+        Tag.objects.cached().get(name='django')
+        with self.assertNumQueries(0):
+            self.assertEqual(Tag.objects.cached().get(name='django'), tag)
+
+    def test_models_with_foreign_managers(self):
+        """cached() работает с моделями без нашего менеджера."""
+        cached(User).get(username='auth')
+        with self.assertNumQueries(0):
+            self.assertEqual(cached(User).get(username='auth'), self.user)
+
+    def test_empty_queries(self):
+        """Заведомо пустые запросы возвращают пустой список."""
+        self.assertEqual(list(Group.objects.none().cached()), [])
+        self.assertEqual(list(Group.objects.filter(pk__in=[]).cached()), [])
+
+    def test_zero_timeout_is_kept(self):
+        """Нулевой срок не подменяется сроком по умолчанию."""
+        self.assertEqual(Group.objects.cached(0)._cache_timeout, 0)
+        self.assertEqual(Group.objects.cached()._cache_timeout,
+                         settings.QUERY_CACHE_TIMEOUT)
+
+    def test_unrelated_tables_are_not_purged(self):
+        """Запись в некэшируемые таблицы кэш не сбрасывает."""
+        self.assertIn(Group._meta.db_table, cached_tables())
+        self.assertIn(User._meta.db_table, cached_tables())
+        self.assertNotIn(Session._meta.db_table, cached_tables())
+        Group.objects.cached().count()
+        self.client.force_login(self.user)
+        Session.objects.all().delete()
+        with self.assertNumQueries(0):
+            Group.objects.cached().count()
+
+    def test_profile_does_not_cache_password(self):
+        """Хэш пароля автора не попадает в общий кэш."""
+        self.user.set_password('секрет')
+        self.user.save()
+        self.client.get(reverse('posts:profile', args=['auth']))
+        stored = caches['shared']._cache.values()
+        self.assertTrue(stored)
+        self.assertFalse(any(self.user.password.encode() in value
+                             for value in stored))
@@ -0,0 +1,116 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import slow_queries
+from core.slow_queries import normalize, redact
+from core.tests.mixins import CacheClearMixin
+from posts.models import Post
+
+User = get_user_model()
+
+
+@override_settings(SLOW_QUERY_THRESHOLD=0, SLOW_QUERY_EXPLAIN_INTERVAL=0)
+class SlowQueryLogTest(CacheClearMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.create(author=cls.author, text='Тестовый пост')
+
+    def capture(self, func):
+        with self.assertLogs('core.slow_queries', 'WARNING') as logs:
+            func()
+        return [json.loads(record.getMessage()) for record in logs.records]
+
+    def test_normalize(self):
+        """Форма запроса не зависит от литералов и длины IN."""
+        self.assertEqual(
+            normalize("SELECT  * FROM t WHERE a IN (%s, %s, %s) AND b = 'x'"
+                      " LIMIT 21"),
+            'SELECT * FROM t WHERE a IN (...) AND b = ? LIMIT ?'
+        )
+
+    @skipUnless(connection.vendor == 'sqlite', 'План в формате SQLite')
+    def test_slow_queries_are_logged_with_plan(self):
+        """Медленный запрос пишется в журнал с планом."""
+        records = self.capture(
+            lambda: list(Post.objects.order_by('text'))
+        )
+        record = records[-1]
+        self.assertEqual(record['view'], '-')
+        self.assertIn('ORDER BY', record['sql'])
+        plan = ' '.join(record['plan'])
+        self.assertIn('SCAN', plan)
+        self.assertIn('TEMP B-TREE', plan)
+
+    def test_view_name_is_logged(self):
+        """В записи указан view, выполнивший запрос."""
+        records = self.capture(
+            lambda: self.client.get(reverse('posts:profile',
+                                            args=['author']))
+        )
+        self.assertIn('posts:profile', {record['view'] for record in records})
+
+    def test_params_are_redacted(self):
+        """Вместо значений параметров пишутся тип и хэш."""
+        records = self.capture(
+            lambda: list(Post.objects.filter(text='секретный текст'))
+        )
+        self.assertNotIn('секретный', json.dumps(records[-1],
+                                                 ensure_ascii=False))
+        self.assertEqual(records[-1]['params'],
+                         [redact('секретный текст')])
+
+    @override_settings(SLOW_QUERY_EXPLAIN_INTERVAL=60)
+    def test_explain_is_throttled_per_shape(self):
+        """План одной формы запроса снимается раз в интервал."""
+        records = self.capture(lambda: [
+            list(Post.objects.filter(text=text).order_by('pub_date'))
+            for text in ('первый', 'второй')
+        ])
+        plans = [record['plan'] for record in records
+                 if 'ORDER BY' in record['sql']]
+        self.assertEqual(len(plans), 2)
+        self.assertTrue(plans[0])
+        self.assertEqual(plans[1], [])
+
+    def test_failed_explain_keeps_transaction(self):
+        """Ошибка EXPLAIN не прерывает транзакцию."""
+        with transaction.atomic():
+            with self.assertLogs('core.slow_queries', 'WARNING') as logs:
+                slow_queries.log_query(
+                    connection, 'SELECT * FROM no_such_table', [], 1.0
+                )
+            self.assertIn('EXPLAIN failed', logs.output[-1])
+            self.assertEqual(Post.objects.count(), 1)
+
+    @override_settings(SLOW_QUERY_THRESHOLD=None)
+    def test_disabled(self):
+        """Без порога журнал не пишется."""
+        with self.assertRaises(AssertionError):
+            self.capture(lambda: list(Post.objects.all()))
+
+    @skipUnless(connection.vendor == 'sqlite', 'План в формате SQLite')
+    def test_report(self):
+        """Отчёт группирует запросы и объясняет план."""
+        records = self.capture(lambda: list(Post.objects.order_by('text')))
+        descriptor, path = tempfile.mkstemp()
+        self.addCleanup(os.remove, path)
+        with os.fdopen(descriptor, 'w') as file:
+            for record in records * 2:
+                file.write(json.dumps(record) + '\n')
+        out = StringIO()
+        call_command('slow_query_report', '--log', path, stdout=out)
+        report = out.getvalue()
+        self.assertIn('2 раз', report)
+        self.assertIn('полный просмотр posts_post', report)
+        self.assertIn('временное B-дерево для ORDER BY', report)
@@ -0,0 +1,55 @@
+import os
+import sqlite3
+from io import StringIO
+from unittest import skipUnless
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from core.sqlite import apply_pragmas
+from core.tests.mixins import TempDirMixin
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Только для SQLite')
+class SqlitePragmasTest(TempDirMixin, TestCase):
+
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_connection_is_configured(self):
+        """Соединение получает PRAGMA из настроек."""
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('temp_store'), 2)
+        self.assertEqual(self.pragma('busy_timeout'),
+                         settings.SQLITE_PRAGMAS['busy_timeout'])
+        self.assertEqual(self.pragma('cache_size'),
+                         settings.SQLITE_PRAGMAS['cache_size'])
+
+    def test_file_database_uses_wal(self):
+        """База в файле переводится в режим WAL."""
+        db = sqlite3.connect(os.path.join(self.directory, 'test.sqlite3'))
+        self.addCleanup(db.close)
+        apply_pragmas(db.cursor())
+        self.assertEqual(db.execute('PRAGMA journal_mode').fetchone()[0],
+                         'wal')
+
+    def test_connections_are_reused(self):
+        """Соединения с базой живут дольше запроса."""
+        self.assertGreater(settings.DATABASES['default']['CONN_MAX_AGE'], 0)
+
+
+class BenchSqliteTest(SimpleTestCase):
+
+    def test_command(self):
+        """bench_sqlite сравнивает настройки и печатает чтения."""
+        out = StringIO()
+        call_command('bench_sqlite', '--rows', '100', '--readers', '2',
+                     '--seconds', '0.2', stdout=out)
+        report = out.getvalue()
+        self.assertIn('по умолчанию', report)
+        self.assertIn('постоянные соединения', report)
+        self.assertEqual(report.count('чтение:'), 3)
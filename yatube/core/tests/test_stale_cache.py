@@ -0,0 +1,65 @@
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from core import stale_cache
+from core.tests.mixins import CacheClearMixin
+
+THREADS = 10
+
+
+class StaleCacheTest(CacheClearMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.calls = 0
+        self.calls_lock = threading.Lock()
+
+    def compute(self):
+        with self.calls_lock:
+            self.calls += 1
+        time.sleep(0.2)
+        return 'new'
+
+    def run_concurrently(self):
+        barrier = threading.Barrier(THREADS)
+        results = []
+
+        def worker():
+            barrier.wait()
+            results.append(
+                stale_cache.get_or_set('fragment', self.compute, 20)
+            )
+
+        threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_cold_key_is_computed_once(self):
+        """Пустой ключ пересчитывается одним потоком, остальные ждут."""
+        results = self.run_concurrently()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, ['new'] * THREADS)
+
+    def test_expired_key_is_revalidated_once(self):
+        """Истёкший ключ пересчитывается один раз, пока отдаётся старый."""
+        entry = stale_cache.Entry('old', time.time() - 1)
+        cache.set('fragment', entry, 60)
+        results = self.run_concurrently()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results.count('new'), 1)
+        self.assertEqual(results.count('old'), THREADS - 1)
+        self.assertEqual(stale_cache.get_or_set('fragment', None, 20), 'new')
+
+    def test_timeout_is_jittered(self):
+        """Срок свежести размывается в пределах JITTER."""
+        with mock.patch('random.uniform', return_value=1.1):
+            entry, ttl = stale_cache.make_entry('value', 100)
+        self.assertAlmostEqual(entry.fresh_until - time.time(), 110, 0)
+        self.assertAlmostEqual(ttl, 210)
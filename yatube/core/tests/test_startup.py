@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.template import engines
+from django.test import SimpleTestCase
+
+from core import startup
+
+
+WARMED = '''
+import sys
+if sys.argv[1] == 'wsgi':
+    import yatube.wsgi
+else:
+    import django
+    django.setup()
+from django.template import engines
+loader = engines['django'].engine.template_loaders[0]
+print('posts/index.html' in loader.get_template_cache)
+'''
+
+
+class StartupWarmupTest(SimpleTestCase):
+
+    def test_warm_up(self):
+        """Прогрев проходит все шаги и замеряет каждый."""
+        timings = startup.warm_up()
+        self.assertEqual(
+            set(timings), {name for name, _ in startup.WARMERS}
+        )
+        for name, (result, _) in timings.items():
+            with self.subTest(name=name):
+                self.assertGreater(result, 0)
+
+    def test_templates_are_cached(self):
+        """Шаблоны компилируются один раз, в том числе при DEBUG."""
+        startup.warm_templates()
+        loader = engines['django'].engine.template_loaders[0]
+        self.assertIn('posts/index.html', loader.get_template_cache)
+        self.assertIs(
+            engines['django'].get_template('posts/index.html').template,
+            engines['django'].get_template('posts/index.html').template,
+        )
+
+    def warmed(self, entry_point):
+        env = {name: value for name, value in os.environ.items()
+               if name != 'DJANGO_STARTUP_WARMUP'}
+        env['DJANGO_SETTINGS_MODULE'] = 'yatube.settings'
+        completed = subprocess.run(
+            [sys.executable, '-c', WARMED, entry_point],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+            timeout=60,
+        )
+        self.assertEqual(completed.returncode, 0, completed.stderr)
+        return completed.stdout.split()[-1]
+
+    def test_only_wsgi_entry_point_warms_up(self):
+        """Прогревает только запуск через yatube.wsgi."""
+        self.assertEqual(self.warmed('setup'), 'False')
+        self.assertEqual(self.warmed('wsgi'), 'True')
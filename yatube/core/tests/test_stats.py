@@ -0,0 +1,23 @@
+from django.test import SimpleTestCase
+
+from core import stats
+
+
+class StatsTest(SimpleTestCase):
+
+    def test_percentile(self):
+        """Перцентиль с интерполяцией, пустой список даёт 0."""
+        values = list(range(1, 101))
+        self.assertEqual(stats.percentile(values, 0), 1)
+        self.assertEqual(stats.percentile(values, 100), 100)
+        self.assertAlmostEqual(stats.percentile(values, 50), 50.5)
+        self.assertAlmostEqual(stats.percentile(values, 90), 90.1)
+        self.assertEqual(stats.percentile([], 50), 0.0)
+
+    def test_summary(self):
+        """Сводка содержит перцентили, среднее и максимум."""
+        result = stats.summary([3, 1, 2])
+        self.assertEqual(result['p50'], 2)
+        self.assertEqual(result['mean'], 2)
+        self.assertEqual(result['max'], 3)
+        self.assertEqual(set(result), {'p50', 'p90', 'p99', 'mean', 'max'})
@@ -0,0 +1,109 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.middleware import TRACE_ID_HEADER
+from core.tests.mixins import CacheClearMixin
+from core.tracing import parse_traceparent
+from posts.models import Post
+
+User = get_user_model()
+TRACE_ID = '4bf92f3577b34da6a3ce929d0e0e4736'
+PARENT_ID = '00f067aa0ba902b7'
+
+
+class TracingTest(CacheClearMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.create(author=cls.author, text='Тестовый пост')
+
+    def capture(self, *args, **kwargs):
+        with self.assertLogs('core.tracing', 'INFO') as logs:
+            response = self.client.get(*args, **kwargs)
+        self.lines = [record.getMessage() for record in logs.records]
+        return response
+
+    def read_spans(self):
+        self.assertEqual(len(self.lines), 1)
+        request = json.loads(self.lines[0])
+        return request['resourceSpans'][0]['scopeSpans'][0]['spans']
+
+    def test_parse_traceparent(self):
+        """Заголовок traceparent разбирается, мусор отбрасывается."""
+        self.assertEqual(
+            parse_traceparent(f'00-{TRACE_ID}-{PARENT_ID}-01'),
+            (TRACE_ID, PARENT_ID, True)
+        )
+        for header in (None, 'garbage', f'00-{"0" * 32}-{PARENT_ID}-01'):
+            with self.subTest(header=header):
+                self.assertIsNone(parse_traceparent(header))
+
+    def test_requests_are_not_traced_by_default(self):
+        """Без выборки запросы не трассируются."""
+        with self.assertNoLogs('core.tracing', 'INFO'):
+            response = self.client.get(reverse('posts:profile',
+                                               args=['author']))
+        self.assertFalse(response.has_header(TRACE_ID_HEADER))
+
+    @override_settings(TRACING_SAMPLE_RATE=1)
+    def test_nested_spans(self):
+        """Спаны view, шаблонов и базы вложены в спан запроса."""
+        response = self.capture(reverse('posts:profile', args=['author']),
+                                {'page': 1})
+        spans = self.read_spans()
+        by_id = {span['spanId']: span for span in spans}
+        root = spans[0]
+        self.assertEqual(root['name'], 'GET posts:profile')
+        self.assertEqual(root['kind'], 2)
+        self.assertEqual(response[TRACE_ID_HEADER], root['traceId'])
+        self.assertNotIn('page=', json.dumps(root))
+        names = [span['name'] for span in spans]
+        self.assertIn('view posts.views.profile', names)
+        self.assertIn('template posts/profile.html', names)
+        self.assertIn('template posts/includes/post_list.html', names)
+        for span in spans[1:]:
+            with self.subTest(span=span['name']):
+                self.assertIn(span['parentSpanId'], by_id)
+        db_spans = [span for span in spans if span['name'].startswith('db')]
+        self.assertTrue(db_spans)
+        keys = {item['key'] for item in db_spans[0]['attributes']}
+        self.assertIn('db.statement', keys)
+
+    @override_settings(TRACING_TRUSTED_IPS=['127.0.0.1'])
+    def test_incoming_traceparent_is_continued(self):
+        """Доверенный traceparent продолжает чужую трассу."""
+        self.capture(reverse('posts:index'),
+                     HTTP_TRACEPARENT=f'00-{TRACE_ID}-{PARENT_ID}-01')
+        root = self.read_spans()[0]
+        self.assertEqual(root['traceId'], TRACE_ID)
+        self.assertEqual(root['parentSpanId'], PARENT_ID)
+
+    def test_untrusted_traceparent_does_not_force_tracing(self):
+        """Чужой traceparent не включает трассировку."""
+        with self.assertNoLogs('core.tracing', 'INFO'):
+            response = self.client.get(
+                reverse('posts:index'),
+                HTTP_TRACEPARENT=f'00-{TRACE_ID}-{PARENT_ID}-01'
+            )
+        self.assertFalse(response.has_header(TRACE_ID_HEADER))
+
+    @override_settings(TRACING_SAMPLE_RATE=1)
+    def test_trace_report(self):
+        """Отчёт по трассам показывает собственное время."""
+        self.capture(reverse('posts:index'))
+        descriptor, path = tempfile.mkstemp(suffix='.jsonl')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(descriptor, 'w') as file:
+            file.write('\n'.join(self.lines) + '\n')
+        out = StringIO()
+        call_command('trace_report', '--file', path, stdout=out)
+        self.assertIn('GET posts:index', out.getvalue())
+        self.assertIn('Собственное время:', out.getvalue())
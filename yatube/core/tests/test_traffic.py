@@ -0,0 +1,89 @@
+import json
+import os
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import traffic
+from core.tests.mixins import CacheClearMixin, TempDirMixin
+
+User = get_user_model()
+
+
+@override_settings(TRAFFIC_CAPTURE_SAMPLE_RATE=1)
+class TrafficCaptureTest(CacheClearMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+
+    def capture(self, url, **params):
+        with self.assertLogs('core.traffic', 'INFO') as logs:
+            self.client.get(url, params)
+        return [json.loads(record.getMessage()) for record in logs.records]
+
+    def test_record_is_anonymised(self):
+        """В записи нет адреса и чужих параметров запроса."""
+        record, = self.capture(reverse('posts:index'), page=1, secret='x')
+        self.assertEqual(record['method'], 'GET')
+        self.assertEqual(record['route'], '')
+        self.assertEqual(record['kwargs'], {})
+        self.assertEqual(record['query'], 'page=1')
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertEqual(record['user'], traffic.ANONYMOUS)
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['duration_ms'], 0)
+        self.assertNotIn('secret', json.dumps(record))
+
+    def test_route_params_are_hashed(self):
+        """Параметры маршрута пишутся хэшами."""
+        record, = self.capture(
+            reverse('posts:profile', args=['secret-user'])
+        )
+        self.assertEqual(record['route'], 'profile/<str:username>/')
+        self.assertEqual(record['kwargs'],
+                         {'username': traffic.token('secret-user')})
+        self.assertNotIn('secret-user', json.dumps(record))
+
+    def test_user_class(self):
+        """Пользователь записан классом, а не именем."""
+        self.client.force_login(self.staff)
+        record, = self.capture(reverse('posts:index'))
+        self.assertEqual(record['user'], traffic.STAFF)
+
+    def test_excluded_paths(self):
+        """Служебные адреса не записываются."""
+        with self.assertNoLogs('core.traffic', 'INFO'):
+            self.client.get(reverse('core:metrics'))
+
+    @override_settings(TRAFFIC_CAPTURE_SAMPLE_RATE=0)
+    def test_disabled(self):
+        """С нулевой долей выборки журнал не пишется."""
+        with self.assertNoLogs('core.traffic', 'INFO'):
+            self.client.get(reverse('posts:index'))
+
+
+class TrafficLogTest(TempDirMixin, TestCase):
+
+    def test_read_log_with_rotated_files(self):
+        """Журнал читается с ротированными файлами по порядку."""
+        path = os.path.join(self.directory, 'traffic.jsonl')
+        for name, stamps in ((path, (3, 4)), (path + '.1', (1, 2))):
+            with open(name, 'w') as file:
+                for ts in stamps:
+                    file.write(json.dumps({'ts': ts}) + '\n')
+                file.write('обрезанная строка\n')
+        self.assertEqual([item['ts'] for item in traffic.read_log(path)],
+                         [1, 2, 3, 4])
+
+    def test_compare(self):
+        """Сравнение берёт только адреса из обоих прогонов."""
+        result = traffic.compare(
+            [('a', 10), ('a', 20), ('b', 5)], [('a', 30), ('a', 40)]
+        )
+        count, before, after = result['a']
+        self.assertEqual(count, 2)
+        self.assertEqual(before['p50'], 15)
+        self.assertEqual(after['p50'], 35)
+        self.assertNotIn('b', result)
@@ -0,0 +1,181 @@
+"""Трассировка запросов вложенными span'ами.
+
+TracingMiddleware открывает корневой span запроса, а точки, которые
+``install()`` подключает к core.hooks, — вложенные: view, каждый
+SQL-запрос (через ``connection.execute_wrapper``), каждый отрисованный
+шаблон, включая подключённые через include, и каждое обращение
+к sorl-thumbnail.
+Входящий заголовок W3C ``traceparent`` продолжает чужую трассу. Готовая трасса
+пишется строкой JSON в логгер ``core.tracing`` в формате OTLP/JSON
+(ExportTraceServiceRequest), как у file exporter из OpenTelemetry
+Collector; файл TRACING_FILE и его ротация настраиваются в LOGGING.
+Файл можно отдать коллектору или прочитать командой ``trace_report``.
+"""
+import json
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+from . import hooks
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+SERVICE_NAME = 'yatube'
+SCOPE_NAME = 'core.tracing'
+TRACEPARENT_RE = re.compile(
+    r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$'
+)
+
+logger = logging.getLogger(__name__)
+
+_state = threading.local()
+
+
+class Span:
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'kind',
+                 'start', 'end', 'attributes', 'status')
+
+    def __init__(self, trace_id, parent_id, name, kind, attributes):
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start = time.time_ns()
+        self.end = None
+        self.attributes = attributes
+        self.status = STATUS_OK
+
+
+class Trace:
+
+    def __init__(self, trace_id=None, parent_id=''):
+        self.trace_id = trace_id or secrets.token_hex(16)
+        self.parent_id = parent_id
+        self.spans = []
+        self.stack = []
+
+
+def current():
+    return getattr(_state, 'trace', None)
+
+
+def parse_traceparent(header):
+    """Возвращает (trace_id, parent_id, sampled) или None."""
+    match = TRACEPARENT_RE.match(header or '')
+    if match is None or set(match.group(1)) == {'0'}:
+        return None
+    trace_id, parent_id, flags = match.groups()
+    return trace_id, parent_id, bool(int(flags, 16) & 1)
+
+
+@contextmanager
+def span(name, kind=SPAN_KIND_INTERNAL, **attributes):
+    trace = current()
+    if trace is None:
+        yield None
+        return
+    parent_id = trace.stack[-1].span_id if trace.stack else trace.parent_id
+    new = Span(trace.trace_id, parent_id, name, kind, attributes)
+    trace.spans.append(new)
+    trace.stack.append(new)
+    try:
+        yield new
+    except Exception as error:
+        new.status = STATUS_ERROR
+        new.attributes['exception.type'] = type(error).__name__
+        raise
+    finally:
+        new.end = time.time_ns()
+        trace.stack.pop()
+
+
+@contextmanager
+def activate(trace):
+    """Включает трассу для потока, в том числе для запросов к базе."""
+    _state.trace = trace
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(db_span))
+            yield trace
+    finally:
+        _state.trace = None
+
+
+def db_span(execute, sql, params, many, context):
+    connection = context['connection']
+    operation = sql.split(None, 1)[0].upper() if sql else 'SQL'
+    with span(
+        f'db {operation}',
+        SPAN_KIND_CLIENT,
+        **{'db.system': connection.vendor, 'db.statement': sql,
+           'db.many': many},
+    ):
+        return execute(sql, params, many, context)
+
+
+def view_span(view):
+    name = getattr(view, '__qualname__', type(view).__name__)
+    return span(f'view {view.__module__}.{name}')
+
+
+def template_span(template):
+    return span(f'template {template.name or "<string>"}')
+
+
+def thumbnail_span(file_, geometry_string):
+    return span('thumbnail', **{'thumbnail.file': str(file_),
+                                'thumbnail.geometry': geometry_string})
+
+
+def install():
+    """Подключает точки трассировки. Повторные вызовы ничего не делают."""
+    hooks.register(hooks.VIEW, view_span)
+    hooks.register(hooks.TEMPLATE, template_span)
+    hooks.register(hooks.THUMBNAIL, thumbnail_span)
+    hooks.install()
+
+
+def attribute(key, value):
+    if isinstance(value, bool):
+        return {'key': key, 'value': {'boolValue': value}}
+    if isinstance(value, int):
+        return {'key': key, 'value': {'intValue': str(value)}}
+    return {'key': key, 'value': {'stringValue': str(value)}}
+
+
+def to_otlp(trace):
+    """Трасса в формате ExportTraceServiceRequest (OTLP/JSON)."""
+    spans = [{
+        'traceId': item.trace_id,
+        'spanId': item.span_id,
+        'parentSpanId': item.parent_id,
+        'name': item.name,
+        'kind': item.kind,
+        'startTimeUnixNano': str(item.start),
+        'endTimeUnixNano': str(item.end or item.start),
+        'attributes': [attribute(key, value)
+                       for key, value in item.attributes.items()],
+        'status': {'code': item.status},
+    } for item in trace.spans]
+    return {'resourceSpans': [{
+        'resource': {'attributes': [
+            attribute('service.name', SERVICE_NAME),
+            attribute('process.pid', os.getpid()),
+        ]},
+        'scopeSpans': [{'scope': {'name': SCOPE_NAME}, 'spans': spans}],
+    }]}
+
+
+def export(trace):
+    logger.info(json.dumps(to_otlp(trace), ensure_ascii=False))
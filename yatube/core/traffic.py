@@ -0,0 +1,91 @@
+"""Запись боевого трафика для последующего воспроизведения.
+
+TrafficCaptureMiddleware пишет долю TRAFFIC_CAPTURE_SAMPLE_RATE
+запросов строками JSON в логгер ``core.traffic``; файл и его ротация
+настраиваются в LOGGING. Запись обезличена: вместо пользователя только
+его класс (anonymous, user, staff), вместо адреса — шаблон маршрута
+(``profile/<str:username>/``) и HMAC параметров маршрута, из строки
+запроса остаются лишь параметры TRAFFIC_CAPTURE_QUERY_PARAMS, а адрес
+клиента, cookie и тело запроса не сохраняются. Одинаковые значения дают
+одинаковый HMAC, поэтому ``replay_traffic`` подставляет вместо них
+записи тестовой базы, сохраняя повторы: популярный пост остаётся
+популярным.
+"""
+import glob
+import json
+import logging
+import time
+from collections import defaultdict
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.utils.crypto import salted_hmac
+
+from . import stats
+
+logger = logging.getLogger(__name__)
+
+ANONYMOUS = 'anonymous'
+USER = 'user'
+STAFF = 'staff'
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+def user_class(request):
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return ANONYMOUS
+    return STAFF if user.is_staff else USER
+
+
+def is_captured(path):
+    return not path.startswith(tuple(settings.TRAFFIC_CAPTURE_EXCLUDE))
+
+
+def token(value):
+    """Обезличенное значение параметра маршрута."""
+    return salted_hmac(__name__, str(value)).hexdigest()[:16]
+
+
+def record(request, match, status, duration):
+    query = [(name, value) for name, value in request.GET.items()
+             if name in settings.TRAFFIC_CAPTURE_QUERY_PARAMS]
+    logger.info(json.dumps({
+        'ts': round(time.time(), 6),
+        'method': request.method,
+        'route': match.route if match else None,
+        'kwargs': {name: token(value)
+                   for name, value in match.kwargs.items()} if match else {},
+        'query': urlencode(query),
+        'view': match.view_name if match else 'unresolved',
+        'user': user_class(request),
+        'status': status,
+        'duration_ms': round(duration * 1000, 3),
+    }, ensure_ascii=False))
+
+
+def read_log(path):
+    """Записи журнала и файлов после ротации в порядке времени."""
+    records = []
+    for name in glob.glob(f'{glob.escape(path)}*'):
+        with open(name, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    return sorted(records, key=lambda item: item['ts'])
+
+
+def compare(original, replayed):
+    """{view: (число, сводка записи, сводка воспроизведения)}."""
+    durations = defaultdict(lambda: ([], []))
+    for view, duration in original:
+        durations[view][0].append(duration)
+    for view, duration in replayed:
+        durations[view][1].append(duration)
+    return {
+        view: (len(before), stats.summary(before), stats.summary(after))
+        for view, (before, after) in sorted(durations.items())
+        if before and after
+    }
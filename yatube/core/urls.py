@@ -0,0 +1,11 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'core'
+
+urlpatterns = [
+    path('fragments/<slug:name>/', views.fragment, name='fragment'),
+    path('metrics/', views.metrics_view, name='metrics'),
+    path('memory/', views.memory_view, name='memory'),
+]
@@ -1,4 +1,11 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import (Http404, HttpResponse, HttpResponseBadRequest,
+                         HttpResponseForbidden)
 from django.shortcuts import render
+from django.views.decorators.cache import never_cache
+
+from . import fragments, memory, metrics
 
 
 def page_not_found(request, exception):
@@ -15,3 +22,44 @@ def server_error(request):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+@never_cache
+def fragment(request, name):
+    if name not in fragments.FRAGMENTS:
+        raise Http404
+    html = fragments.render_fragment(request, name, request.GET.getlist('arg'))
+    return HttpResponse(html)
+
+
+@never_cache
+def metrics_view(request):
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        metrics.render(metrics.collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
+@never_cache
+@staff_member_required
+def memory_view(request):
+    path = request.GET.get('path', '')
+    try:
+        requests = int(request.GET.get('requests', 10))
+        limit = int(request.GET.get('limit', 20))
+    except ValueError:
+        return HttpResponseBadRequest('requests и limit должны быть числами')
+    if not path.startswith('/') or path.startswith(request.path):
+        return HttpResponseBadRequest('Нужен параметр path=/адрес/')
+    if not 0 < requests <= settings.MEMORY_PROFILE_MAX_REQUESTS:
+        return HttpResponseBadRequest(
+            f'requests от 1 до {settings.MEMORY_PROFILE_MAX_REQUESTS}'
+        )
+    user = request.user if request.GET.get('as_user') else None
+    result = memory.profile(path, requests, user=user)
+    return HttpResponse(
+        '\n'.join(memory.report(result, limit)) + '\n',
+        content_type='text/plain; charset=utf-8'
+    )
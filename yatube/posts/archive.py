@@ -0,0 +1,196 @@
+"""Архив старых постов.
+
+Посты старше POST_ARCHIVE_AFTER_DAYS почти не читают, но они раздувают
+posts_post и его индексы. Команда ``archive_posts`` переносит их пачками
+вместе с комментариями в таблицу ArchivedPost той же базы (с шардами —
+шарда автора): текст и комментарии сжимаются zlib, из индексов остаётся
+только (author, pub_date). Пачки переносятся от самых старых постов,
+каждая в своей транзакции, поэтому команду можно прервать и запускать
+по расписанию — следующий запуск продолжит с того же места.
+
+Страница поста и профиль читают архив прозрачно: архивный пост
+превращается в несохранённый Post, а комментарии — в ArchivedComment.
+Профиль без архива читается как обычный queryset с LIMIT/OFFSET, а если
+весь архив автора старше его живых постов — архив просто продолжает
+ленту (ChainedFeed); сливать ленты приходится, только когда они
+перекрываются по времени.
+Архивные посты доступны только для чтения и не попадают в ленты групп,
+тегов, упоминаний, поиска и главной.
+"""
+import json
+import zlib
+from collections import Counter, namedtuple
+
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from . import shards
+from .models import ArchivedPost, AuthorShard, Comment, Post, User
+
+COMPRESSION_LEVEL = 6
+
+ArchivedComment = namedtuple('ArchivedComment', ('author', 'text', 'created'))
+
+
+def compress(value):
+    return zlib.compress(value.encode(), COMPRESSION_LEVEL)
+
+
+def decompress(data):
+    return zlib.decompress(data).decode()
+
+
+def to_post(archived):
+    """Пост из архива как несохранённый объект Post."""
+    post = Post(
+        id=archived.pk,
+        author_id=archived.author_id,
+        group_id=archived.group_id,
+        text=decompress(archived.text),
+        pub_date=archived.pub_date,
+        updated=archived.updated,
+        image=archived.image,
+    )
+    post._state.adding = False
+    post._state.db = archived._state.db
+    return post
+
+
+def get_comments(archived):
+    """Комментарии архивного поста, новые первыми."""
+    rows = json.loads(decompress(archived.comments))
+    authors = User.objects.in_bulk({row['author'] for row in rows})
+    return [
+        ArchivedComment(authors[row['author']], row['text'],
+                        parse_datetime(row['created']))
+        for row in rows if row['author'] in authors
+    ]
+
+
+class ArchivedFeed:
+    """Архивные посты для MergedFeed: Post создаются по мере чтения."""
+
+    def __init__(self, queryset):
+        self.queryset = queryset.defer('comments')
+
+    def count(self):
+        return self.queryset.count()
+
+    def __getitem__(self, index):
+        return map(to_post, self.queryset[index])
+
+
+class ChainedFeed:
+    """Живые посты, а после них архивные — для архива старше всех постов.
+
+    Страница читается срезами из одной или двух таблиц, без слияния:
+    архивные строки нужны, только когда живые закончились.
+    """
+
+    def __init__(self, posts, archived):
+        self.posts = posts
+        self.archived = archived
+        self.live = None
+
+    def live_count(self):
+        if self.live is None:
+            self.live = self.posts.count()
+        return self.live
+
+    def count(self):
+        return self.live_count() + self.archived.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        live = self.live_count()
+        rows = []
+        if start < live:
+            rows += self.posts[start:index.stop]
+        if index.stop is None or index.stop > live:
+            stop = None if index.stop is None else index.stop - live
+            rows += self.archived[max(start - live, 0):stop]
+        return rows
+
+
+def with_archived(posts, archived):
+    """Лента из постов и архивных постов, новые первыми."""
+    posts = posts.order_by(*shards.MERGE_ORDER)
+    newest_archived = archived.order_by(*shards.MERGE_ORDER).values_list(
+        'pub_date', 'pk'
+    ).first()
+    if newest_archived is None:
+        return posts
+    archived = ArchivedFeed(archived.order_by(*shards.MERGE_ORDER))
+    oldest_post = posts.reverse().values_list('pub_date', 'pk').first()
+    if oldest_post is None or newest_archived < oldest_post:
+        return ChainedFeed(posts, archived)
+    return shards.MergedFeed([posts, archived])
+
+
+def archived_post(post, comments):
+    return ArchivedPost(
+        id=post.pk,
+        author_id=post.author_id,
+        group_id=post.group_id,
+        pub_date=post.pub_date,
+        updated=post.updated,
+        image=post.image.name or '',
+        text=compress(post.text),
+        comments=compress(json.dumps([
+            {'author': comment.author_id, 'text': comment.text,
+             'created': comment.created.isoformat()}
+            for comment in comments
+        ], ensure_ascii=False)),
+    )
+
+
+def archive_batch(db, cutoff, batch_size):
+    """Переносит в архив до batch_size самых старых постов базы.
+
+    Авторы, которых сейчас переносят между шардами, пропускаются.
+    Возвращает Counter: число постов и комментариев, размер текста
+    до и после сжатия.
+    """
+    moving = AuthorShard.objects.filter(moving=True).values_list(
+        'author_id', flat=True
+    )
+    with transaction.atomic(using=db):
+        posts = list(
+            Post.objects.using(db).filter(pub_date__lt=cutoff).exclude(
+                author_id__in=list(moving)
+            ).order_by('pub_date', 'pk')[:batch_size]
+        )
+        comments = {post.pk: [] for post in posts}
+        for comment in Comment.objects.using(db).filter(post__in=posts):
+            comments[comment.post_id].append(comment)
+        archived = [archived_post(post, comments[post.pk]) for post in posts]
+        ArchivedPost.objects.using(db).bulk_create(archived)
+        Post.objects.using(db).filter(
+            pk__in=[post.pk for post in posts]
+        ).delete()
+    return Counter(
+        posts=len(posts),
+        comments=sum(map(len, comments.values())),
+        raw=sum(len(post.text.encode()) for post in posts),
+        compressed=sum(len(entry.text) for entry in archived),
+    )
+
+
+def archive_posts(cutoff, batch_size, max_batches=None):
+    """Переносит в архив посты старше cutoff во всех базах.
+
+    С max_batches каждая база переносит не больше стольких пачек,
+    остальное достанется следующему запуску.
+    """
+    total = Counter()
+    for db in shards.databases():
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            done = archive_batch(db, cutoff, batch_size)
+            total += done
+            batches += 1
+            if done['posts'] < batch_size:
+                break
+    return total
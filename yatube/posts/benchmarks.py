@@ -0,0 +1,158 @@
+"""Бенчмарк горячих view приложения posts.
+
+Каждый сценарий — запрос к одному view через тестовый клиент со всем
+стеком middleware. Для сценария считаются перцентили времени ответа,
+число запросов к базе и пик памяти tracemalloc за один запрос. По
+умолчанию кэш очищается перед каждым запросом, чтобы мерить сам view,
+а не кэш страниц; ``warm_cache=True`` оставляет кэш. Замер всегда идёт
+на кэшах в памяти процесса (isolated_caches), поэтому очистка не трогает
+общий кэш сайта, даже когда бенчмарк запущен на рабочей базе.
+"""
+import time
+import tracemalloc
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from core import stats
+
+from .models import Group, Post, User
+from .warmup import REMOTE_ADDR
+
+Scenario = namedtuple('Scenario', ('name', 'method', 'url', 'user', 'data'))
+
+LATENCY_KEYS = ('p50', 'p90')
+TIERED_CACHE = 'core.cache_backends.TieredCache'
+LOCMEM_CACHE = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+def isolated_caches():
+    """Те же кэши, но в памяти процесса: не смешивать данные с боевыми."""
+    return {
+        alias: config if config['BACKEND'] == TIERED_CACHE else {
+            'BACKEND': LOCMEM_CACHE, 'LOCATION': f'benchmark-{alias}',
+        }
+        for alias, config in settings.CACHES.items()
+    }
+
+
+def most(queryset, relation):
+    return queryset.annotate(total=Count(relation)).order_by('-total').first()
+
+
+def scenarios():
+    """Сценарии для самых нагруженных объектов текущей базы."""
+    group = most(Group.objects.all(), 'posts')
+    author = most(User.objects.all(), 'posts')
+    post = most(Post.objects.all(), 'comments')
+    follower = most(User.objects.all(), 'follower')
+    result = [Scenario('index', 'get', reverse('posts:index'), None, None)]
+    if group is not None:
+        result.append(Scenario(
+            'group_posts', 'get',
+            reverse('posts:group_list', args=[group.slug]), None, None
+        ))
+    if author is not None:
+        result.append(Scenario(
+            'profile', 'get',
+            reverse('posts:profile', args=[author.username]), None, None
+        ))
+    if post is not None:
+        result.append(Scenario(
+            'post_detail', 'get',
+            reverse('posts:post_detail', args=[post.pk]), None, None
+        ))
+    if follower is not None:
+        result.append(Scenario(
+            'follow_index', 'get', reverse('posts:follow_index'),
+            follower, None
+        ))
+    if post is not None and follower is not None:
+        result.append(Scenario(
+            'add_comment', 'post',
+            reverse('posts:add_comment', args=[post.pk]),
+            follower, {'text': 'Комментарий бенчмарка'}
+        ))
+    return result
+
+
+def send(client, scenario, warm_cache):
+    if not warm_cache:
+        cache.clear()
+    response = getattr(client, scenario.method)(scenario.url, scenario.data)
+    if response.status_code >= 400:
+        raise RuntimeError(
+            f'{scenario.name}: {scenario.url} ответил {response.status_code}'
+        )
+    return response
+
+
+def measure(scenario, requests=30, warmup=3, warm_cache=False):
+    """Метрики сценария: перцентили в мс, запросы к базе, пик в КиБ."""
+    with override_settings(CACHES=isolated_caches()):
+        return measure_isolated(scenario, requests, warmup, warm_cache)
+
+
+def measure_isolated(scenario, requests, warmup, warm_cache):
+    client = Client(REMOTE_ADDR=REMOTE_ADDR)
+    if scenario.user is not None:
+        client.force_login(scenario.user)
+    for _ in range(warmup):
+        send(client, scenario, warm_cache)
+    latencies = []
+    queries = []
+    for _ in range(requests):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            send(client, scenario, warm_cache)
+            latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(len(captured))
+    # Отдельный запрос: под tracemalloc время ответа заметно больше.
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        send(client, scenario, warm_cache)
+        peak = tracemalloc.get_traced_memory()[1] - base
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+    result = {key: round(value, 3)
+              for key, value in stats.summary(latencies).items()}
+    result['requests'] = requests
+    result['queries'] = max(queries)
+    result['peak_kib'] = round(peak / 1024, 1)
+    return result
+
+
+def compare(baseline, results, tolerance):
+    """Строки о метриках, которые хуже базовых больше чем на tolerance.
+
+    Время и память сравниваются с допуском, число запросов к базе —
+    точно: лишний запрос почти всегда означает новый N+1.
+    """
+    regressions = []
+    for size, views in results.items():
+        for view, metrics in views.items():
+            old = baseline.get(size, {}).get(view)
+            if old is None:
+                continue
+            for key in (*LATENCY_KEYS, 'peak_kib'):
+                if metrics[key] > old[key] * (1 + tolerance):
+                    regressions.append(
+                        f'{size} {view} {key}: {old[key]} -> {metrics[key]}'
+                    )
+            if metrics['queries'] > old['queries']:
+                regressions.append(
+                    f'{size} {view} queries: '
+                    f'{old["queries"]} -> {metrics["queries"]}'
+                )
+    return regressions
@@ -0,0 +1,41 @@
+"""Метки (surrogate keys) страниц приложения posts."""
+
+FEED_KEY = 'feed'
+
+
+def post_key(post_id):
+    return f'post-{post_id}'
+
+
+def author_key(user_id):
+    return f'author-{user_id}'
+
+
+def group_key(group_id):
+    return f'group-{group_id}'
+
+
+def tag_key(name):
+    return f'tag-{name}'
+
+
+def mentions_key(user_id):
+    return f'mentions-{user_id}'
+
+
+def follow_key(user_id):
+    return f'follow-{user_id}'
+
+
+def follow_feed_key(user_id):
+    return f'follow-feed-{user_id}'
+
+
+def page_keys(page_obj):
+    """Метки постов, выведенных на странице ленты."""
+    keys = []
+    for post in page_obj:
+        keys.append(post_key(post.pk))
+        if post.group_id:
+            keys.append(group_key(post.group_id))
+    return keys
@@ -0,0 +1,196 @@
+"""Валидаторы условных GET-запросов (ETag и Last-Modified) для страниц.
+
+Штамп страницы считается одним агрегирующим запросом по индексам
+(author, updated) и (group, updated) и запоминается на объекте запроса,
+чтобы etag, last_modified и view использовали одно и то же значение.
+Штамп архивного поста строится по ArchivedPost: его комментарии уже
+не меняются, поэтому в штамп входят время переноса в архив и число
+постов автора.
+
+Название группы и имя автора в таблице постов не видны, поэтому
+в штамп входят и токены меток страницы (author-<id>, group-<id>)
+из page_cache: правка группы или автора сбрасывает метку, а вместе
+с ней меняются ETag и Last-Modified.
+"""
+import hashlib
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from django.db.models import Count, Max, OuterRef, Subquery
+
+from core import page_cache
+from core.querycache import cached
+
+from . import shards
+from .cache_keys import author_key, group_key
+from .models import ArchivedPost, Follow, Group, Post, User
+
+STAMP_ATTR = '_posts_stamp'
+
+
+class Stamp(namedtuple('Stamp', ('last_modified', 'counts', 'keys'),
+                       defaults=((),))):
+
+    @property
+    def version(self):
+        """Версия для ключей кэша фрагментов страницы."""
+        updated = self.last_modified.timestamp() if self.last_modified else 0
+        parts = (updated, *self.counts)
+        if self.keys:
+            digest = hashlib.md5(''.join(self.keys).encode()).hexdigest()
+            parts += (digest[:8],)
+        return '-'.join(map(str, parts))
+
+
+def latest(*dates):
+    return max((date for date in dates if date), default=None)
+
+
+def key_stamp(last_modified, counts, *keys):
+    """Штамп с токенами меток; время их сброса сдвигает Last-Modified."""
+    tokens = page_cache.get_versions(keys, create=True)
+    purged = max(map(page_cache.purged_at, tokens.values()), default=0)
+    if purged:
+        last_modified = latest(
+            last_modified, datetime.fromtimestamp(purged, timezone.utc)
+        )
+    return Stamp(last_modified, counts, tuple(tokens[key] for key in keys))
+
+
+def page_keys(author_id, group_id):
+    keys = [author_key(author_id)]
+    if group_id:
+        keys.append(group_key(group_id))
+    return keys
+
+
+def stamped(func):
+    """Запоминает штамп на запросе, чтобы не считать его повторно."""
+    def wrapper(request, *args, **kwargs):
+        if not hasattr(request, STAMP_ATTR):
+            setattr(request, STAMP_ATTR, func(*args, **kwargs))
+        return getattr(request, STAMP_ATTR)
+    return wrapper
+
+
+def get_stamp(request):
+    return getattr(request, STAMP_ATTR, None)
+
+
+@stamped
+def post_stamp(post_id):
+    author_posts = Post.objects.filter(
+        author=OuterRef('author')
+    ).order_by().values('author').annotate(count=Count('id')).values('count')
+    posts = shards.for_post(Post.objects, post_id)
+    values = posts.filter(pk=post_id).order_by().annotate(
+        commented=Max('comments__created'),
+        comment_count=Count('comments'),
+        author_posts=Subquery(author_posts),
+    ).values('updated', 'commented', 'comment_count', 'author_posts',
+             'author_id', 'group_id').first()
+    if values is None:
+        return archived_stamp(post_id)
+    return key_stamp(
+        latest(values['updated'], values['commented']),
+        (values['comment_count'], values['author_posts']),
+        *page_keys(values['author_id'], values['group_id'])
+    )
+
+
+def archived_stamp(post_id):
+    values = shards.for_post(ArchivedPost.objects, post_id).filter(
+        pk=post_id
+    ).values('author_id', 'group_id', 'updated', 'archived').first()
+    if values is None:
+        return Stamp(None, ())
+    author_id = values['author_id']
+    author_posts = sum(
+        shards.for_author(
+            model.objects.filter(author_id=author_id), author_id
+        ).count()
+        for model in (Post, ArchivedPost)
+    )
+    return key_stamp(latest(values['updated'], values['archived']),
+                     (author_posts,),
+                     *page_keys(author_id, values['group_id']))
+
+
+@stamped
+def group_stamp(slug):
+    group_id = Group.objects.cached().filter(slug=slug).values_list(
+        'pk', flat=True
+    ).first()
+    if group_id is None:
+        return Stamp(None, ())
+    values = shards.aggregate(
+        Post.objects.filter(group_id=group_id),
+        updated=Max('updated'),
+        count=Count('id'),
+    )
+    return key_stamp(values['updated'], (values['count'],),
+                     group_key(group_id))
+
+
+@stamped
+def profile_stamp(username):
+    author_id = cached(User).filter(username=username).values_list(
+        'pk', flat=True
+    ).first()
+    if author_id is None:
+        return Stamp(None, ())
+    values = shards.aggregate(
+        Post.objects.filter(author_id=author_id),
+        updated=Max('updated'),
+        count=Count('id'),
+    )
+    return key_stamp(values['updated'], (values['count'],),
+                     author_key(author_id))
+
+
+def user_part(request):
+    """Часть ETag, зависящая от пользователя.
+
+    Для авторизованных страница содержит имя, кнопки и CSRF-токен,
+    поэтому ETag привязан к сессии.
+    """
+    if not request.user.is_authenticated:
+        return 'anon'
+    session_key = request.session.session_key or ''
+    return hashlib.md5(
+        f'{request.user.pk}:{session_key}'.encode()
+    ).hexdigest()
+
+
+def make_etag(stamp_func, extra=None):
+    def etag(request, *args, **kwargs):
+        stamp = stamp_func(request, *args, **kwargs)
+        parts = [stamp.version, user_part(request)]
+        if extra is not None and request.user.is_authenticated:
+            parts.append(str(extra(request, *args, **kwargs)))
+        return '-'.join(parts)
+    return etag
+
+
+def make_last_modified(stamp_func):
+    def last_modified(request, *args, **kwargs):
+        stamp = stamp_func(request, *args, **kwargs)
+        if request.user.is_authenticated:
+            return None
+        return stamp.last_modified
+    return last_modified
+
+
+def is_following(request, username):
+    follows = Follow.objects.filter(
+        user=request.user, author__username=username
+    ).cached()
+    return any(part.exists() for part in shards.each(follows))
+
+
+post_etag = make_etag(post_stamp)
+post_last_modified = make_last_modified(post_stamp)
+group_etag = make_etag(group_stamp)
+group_last_modified = make_last_modified(group_stamp)
+profile_etag = make_etag(profile_stamp, extra=is_following)
+profile_last_modified = make_last_modified(profile_stamp)
@@ -0,0 +1,270 @@
+"""Генерация большого набора данных для нагрузочных замеров.
+
+Записи создаются через bulk_create пачками, каждая пачка в своей
+транзакции. Первичные ключи назначаются заранее, непрерывными
+диапазонами после самого большого из существующих. Поэтому пачки
+независимы и их можно раздать процессам, а комментарии и подписки
+ссылаются на посты и пользователей без чтения их из базы. С шардами
+id постов общие для всех баз: их диапазон начинается после всех id,
+занятых в любой базе или выданных PostAuthor, а каждая пачка постов
+заносится в PostAuthor в своей транзакции.
+
+Распределения похожи на настоящие:
+
+* популярность авторов, групп и постов подчиняется закону Ципфа
+  (номер по популярности ``int(n ** random())``);
+* число подписчиков автора растёт с его популярностью, а число
+  подписок пользователя распределено логарифмически равномерно;
+* время публикации монотонно растёт с id поста и повторяет суточный
+  ритм с редкими всплесками активности, комментарии появляются
+  вскоре после поста.
+"""
+import bisect
+import math
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+
+from . import shards
+from .models import ArchivedPost, Comment, Follow, Group, Post, User
+
+# Простое число для перестановки номеров по популярности в id, чтобы
+# популярные записи не шли подряд с начала диапазона.
+SCATTER = 1000003
+# Доля постов без группы.
+NO_GROUP_SHARE = 0.3
+# Среднее время до комментария после публикации, часы.
+COMMENT_DELAY_HOURS = 6
+# Относительная активность по часам суток.
+DIURNAL = (
+    2, 1, 1, 1, 1, 2, 4, 6, 8, 9, 9, 9,
+    10, 10, 9, 9, 9, 10, 12, 14, 14, 12, 8, 4,
+)
+WORDS = (
+    'танцы', 'вечер', 'музыка', 'зал', 'шаг', 'ритм', 'пара', 'сцена',
+    'фестиваль', 'репетиция', 'урок', 'хореография', 'партнёр', 'движение',
+    'сальса', 'танго', 'вальс', 'бачата', 'хип-хоп', 'контемпорари',
+    'сегодня', 'завтра', 'было', 'будет', 'очень', 'снова', 'впервые',
+    'город', 'друзья', 'команда', 'тренер', 'конкурс', 'победа', 'в', 'и',
+    'на', 'с', 'после', 'перед', 'наконец', 'отлично', 'сложно', 'весело',
+)
+
+
+def skewed(rng, count):
+    """Номер 0..count-1 с вероятностью, обратной номеру (Ципф, s=1)."""
+    return min(int(count ** rng.random()) - 1, count - 1)
+
+
+def scatter(rank, count):
+    """Перестановка номеров 0..count-1."""
+    step = SCATTER if math.gcd(SCATTER, count) == 1 else 1
+    return rank * step % count
+
+
+def text(rng, low, high):
+    return ' '.join(rng.choices(WORDS, k=rng.randint(low, high)))
+
+
+class Timeline:
+    """Время публикации поста по его номеру.
+
+    Интенсивность публикаций задана по часам: суточный ритм DIURNAL,
+    умноженный на всплески. Пост номер i из count получает момент,
+    до которого накопилась доля (i + 0.5) / count всей интенсивности,
+    поэтому время растёт с номером, а в часы всплесков посты идут гуще.
+    """
+
+    def __init__(self, start, days, seed):
+        rng = random.Random(seed)
+        hours = max(days, 1) * 24
+        rates = [DIURNAL[hour % 24] for hour in range(hours)]
+        for _ in range(max(days // 10, 1)):
+            center = rng.randrange(hours)
+            factor = rng.uniform(5, 20)
+            for hour in range(center, min(center + rng.randint(2, 12), hours)):
+                rates[hour] *= factor
+        self.start = start
+        self.hours = hours
+        self.cumulative = list(accumulate(rates))
+
+    def at(self, index, count):
+        target = (index + 0.5) / count * self.cumulative[-1]
+        hour = bisect.bisect_left(self.cumulative, target)
+        previous = self.cumulative[hour - 1] if hour else 0
+        fraction = (target - previous) / (self.cumulative[hour] - previous)
+        return self.start + timedelta(hours=hour + fraction)
+
+    @property
+    def end(self):
+        return self.start + timedelta(hours=self.hours)
+
+
+@contextmanager
+def explicit_dates():
+    """Отключает auto_now и auto_now_add, чтобы сохранить свои даты."""
+    fields = [
+        Post._meta.get_field('pub_date'),
+        Post._meta.get_field('updated'),
+        Comment._meta.get_field('created'),
+        ArchivedPost._meta.get_field('archived'),
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now = auto_now
+            field.auto_now_add = auto_now_add
+
+
+def next_id(model):
+    return (model.objects.aggregate(top=models.Max('pk'))['top'] or 0) + 1
+
+
+def reset_sequences():
+    """Сдвигает последовательности PostgreSQL после явных id."""
+    statements = connection.ops.sequence_reset_sql(
+        no_style(), [User, Group, Post, Comment, Follow]
+    )
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+class Plan:
+    """Диапазоны id и параметры набора; передаётся в процессы."""
+
+    def __init__(self, users, groups, posts, comments, max_follows,
+                 days, seed, prefix, start):
+        self.users = users
+        self.posts = posts
+        self.comments = comments
+        self.max_follows = max_follows
+        self.days = days
+        self.seed = seed
+        self.prefix = prefix
+        self.start = start
+        self.user_id = next_id(User)
+        self.group_id = next_id(Group)
+        self.post_id = (shards.next_post_id() if shards.is_enabled()
+                        else next_id(Post))
+        self.comment_id = next_id(Comment)
+        self.group_count = groups
+
+    def timeline(self):
+        return Timeline(self.start, self.days, self.seed)
+
+    def user(self, rng):
+        return self.user_id + scatter(skewed(rng, self.users), self.users)
+
+    def group(self, rng):
+        if not self.group_count or rng.random() < NO_GROUP_SHARE:
+            return None
+        return self.group_id + skewed(rng, self.group_count)
+
+    def post(self, rng):
+        return self.post_id + scatter(skewed(rng, self.posts), self.posts)
+
+    def rng(self, kind, first):
+        return random.Random(f'{self.seed}:{kind}:{first}')
+
+
+def create_groups(plan):
+    Group.objects.bulk_create(
+        Group(id=plan.group_id + number,
+              title=f'Группа {plan.prefix}{number}',
+              slug=f'{plan.prefix}group-{plan.group_id + number}',
+              description=f'Сгенерированная группа {number}')
+        for number in range(plan.group_count)
+    )
+
+
+def build_users(plan, first, count):
+    password = make_password(None)
+    return [
+        User(id=plan.user_id + number,
+             username=f'{plan.prefix}{plan.user_id + number}',
+             password=password, date_joined=plan.start)
+        for number in range(first, first + count)
+    ]
+
+
+def build_posts(plan, first, count):
+    rng = plan.rng('posts', first)
+    timeline = plan.timeline()
+    posts = []
+    for number in range(first, first + count):
+        pub_date = timeline.at(number, plan.posts)
+        posts.append(Post(
+            id=plan.post_id + number, text=text(rng, 5, 60),
+            author_id=plan.user(rng), group_id=plan.group(rng),
+            pub_date=pub_date, updated=pub_date,
+        ))
+    return posts
+
+
+def build_comments(plan, first, count):
+    rng = plan.rng('comments', first)
+    timeline = plan.timeline()
+    comments = []
+    for number in range(first, first + count):
+        post_id = plan.post(rng)
+        created = timeline.at(post_id - plan.post_id, plan.posts) + timedelta(
+            hours=rng.expovariate(1 / COMMENT_DELAY_HOURS)
+        )
+        comments.append(Comment(
+            id=plan.comment_id + number, post_id=post_id,
+            author_id=plan.user_id + rng.randrange(plan.users),
+            text=text(rng, 2, 25), created=min(created, timeline.end),
+        ))
+    return comments
+
+
+def build_follows(plan, first, count):
+    """Подписки пользователей first..first+count-1."""
+    rng = plan.rng('follows', first)
+    follows = []
+    for number in range(first, first + count):
+        user_id = plan.user_id + number
+        wanted = min(skewed(rng, plan.max_follows + 1), plan.users - 1)
+        authors = set()
+        # Популярные авторы выпадают чаще, поэтому попыток нужно больше.
+        for _ in range(wanted * 4):
+            if len(authors) == wanted:
+                break
+            author_id = plan.user(rng)
+            if author_id != user_id:
+                authors.add(author_id)
+        follows += [Follow(user_id=user_id, author_id=author_id)
+                    for author_id in sorted(authors)]
+    return follows
+
+
+BUILDERS = {
+    User: build_users,
+    Post: build_posts,
+    Comment: build_comments,
+    Follow: build_follows,
+}
+
+
+def create_batch(plan, model, first, count):
+    """Создаёт одну пачку в транзакции и возвращает число записей."""
+    objs = BUILDERS[model](plan, first, count)
+    with explicit_dates(), transaction.atomic():
+        if model is Post and shards.is_enabled():
+            shards.register_posts(objs)
+        model.objects.bulk_create(objs)
+    return len(objs)
+
+
+def batches(total, size):
+    return [(first, min(size, total - first))
+            for first in range(0, total, size)]
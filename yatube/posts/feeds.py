@@ -0,0 +1,222 @@
+"""Кэши лент постов.
+
+Лента подписок. Для каждого пользователя хранятся id постов и общее
+число постов первых ``FOLLOW_CACHED_PAGES`` страниц ленты. Ключ включает
+версию метки ``follow-feed-<id>``, которую сбрасывают подписка и отписка
+пользователя, и версии меток ``author-<id>`` авторов, на которых он
+подписан: их сбрасывает публикация и удаление поста. Поэтому пост
+стоит одной записи в кэш, сколько бы подписчиков ни было у автора,
+а чтение ленты — одного get_many по её авторам. Сами посты загружаются
+по id одним запросом, поэтому правки постов видны сразу и не требуют
+сброса лент.
+
+Лента группы. Для каждой группы хранится число её постов и упорядоченный
+по дате список id ``GROUP_WINDOW`` самых новых, как sorted set в redis.
+Список не сбрасывается, а правится на месте при создании, удалении
+и переносе поста между группами под блокировкой группы. Блокировка
+берётся без ожидания: если она занята, список удаляется, и сохранение
+поста не ждёт чужой правки. Каждая запись увеличивает версию списка
+группы, а список, построенный или исправленный при другой версии,
+в кэш не попадает — иначе он потерял бы пост, записанный во время
+построения. Страницы внутри окна загружаются по id, дальше — обычным
+запросом. После bulk_create и update, которые сигналов не шлют, списки
+групп удаляются и строятся заново при следующем показе.
+"""
+import bisect
+import hashlib
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+
+from core import stale_cache
+from core.page_cache import get_versions
+
+from . import shards
+from .cache_keys import author_key, follow_feed_key
+from .models import Follow, Post
+from .utils import POSTS_COUNT, paginate
+
+FOLLOW_CACHED_PAGES = 3
+FOLLOW_FEED_TIMEOUT = 60 * 10
+GROUP_WINDOW = 100
+GROUP_WINDOW_TIMEOUT = 60 * 60
+
+
+class PostWindow:
+    """Лента для Paginator, у которой заранее известны число постов
+    и id постов подряд, начиная с позиции ``offset``.
+
+    Срезы внутри известного окна загружаются по id одним запросом,
+    любые другие — обычным запросом к ``queryset``.
+    """
+
+    def __init__(self, queryset, count, ids, offset=0):
+        self.queryset = queryset
+        self.total = count
+        self.ids = ids
+        self.offset = offset
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start = index.start - self.offset
+            stop = index.stop - self.offset
+            if 0 <= start and stop <= len(self.ids):
+                ids = self.ids[start:stop]
+                posts = self.queryset.in_bulk(ids)
+                return [posts[pk] for pk in ids if pk in posts]
+        return self.queryset[index]
+
+
+def followed_authors(user_id):
+    follows = Follow.objects.cached().filter(user_id=user_id).values_list(
+        'author_id', flat=True
+    )
+    return sorted({pk for part in shards.each(follows) for pk in part})
+
+
+def follow_feed_cache_key(user_id, number):
+    keys = [follow_feed_key(user_id),
+            *map(author_key, followed_authors(user_id))]
+    versions = get_versions(keys, create=True)
+    digest = hashlib.md5(
+        ' '.join(versions[key] for key in keys).encode()
+    ).hexdigest()
+    return f'follow-feed:{user_id}:{number}:{digest}'
+
+
+def follow_page(request):
+    """Страница ленты подписок текущего пользователя."""
+    queryset = shards.merge(
+        Post.objects.filter(author__following__user=request.user)
+    )
+    try:
+        number = int(request.GET.get('page') or 1)
+    except ValueError:
+        return paginate(request, queryset)
+    if not 1 <= number <= FOLLOW_CACHED_PAGES:
+        return paginate(request, queryset)
+    key = follow_feed_cache_key(request.user.pk, number)
+    window = cache.get(key)
+    if window is None:
+        page_obj = paginate(request, queryset)
+        if page_obj.number == number:
+            ids = [post.pk for post in page_obj]
+            cache.set(
+                key, (page_obj.paginator.count, ids), FOLLOW_FEED_TIMEOUT
+            )
+        return page_obj
+    count, ids = window
+    offset = (number - 1) * POSTS_COUNT
+    paginator = Paginator(PostWindow(queryset, count, ids, offset),
+                          POSTS_COUNT)
+    return paginator.page(number)
+
+
+def group_window_key(group_id):
+    return f'group-posts:{group_id}'
+
+
+def group_window_version_key(group_id):
+    return f'group-posts:{group_id}:version'
+
+
+def shared_cache():
+    """Общий кэш в обход памяти процесса (у TieredCache)."""
+    return getattr(cache, 'shared', cache)
+
+
+def get_window_version(group_id):
+    return shared_cache().get(group_window_version_key(group_id), 0)
+
+
+def bump_window_version(group_id):
+    key = group_window_version_key(group_id)
+    if cache.add(key, 1, None):
+        return
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+
+
+def get_group_window(group_id):
+    """Число постов группы и пары (время публикации, id) самых новых."""
+    key = group_window_key(group_id)
+    window = cache.get(key)
+    if window is None:
+        version = get_window_version(group_id)
+        posts = Post.objects.filter(group_id=group_id)
+        latest = shards.merge(posts.values_list('pub_date', 'pk'), key=None)
+        window = {
+            'count': shards.merge(posts).count(),
+            'posts': [
+                (pub_date.timestamp(), pk) for pub_date, pk
+                in latest[:GROUP_WINDOW]
+            ],
+        }
+        if get_window_version(group_id) == version:
+            cache.add(key, window, GROUP_WINDOW_TIMEOUT)
+    return window
+
+
+def group_page(request, group):
+    """Страница ленты группы с постами из окна или из базы."""
+    window = get_group_window(group.pk)
+    ids = [pk for _, pk in window['posts']]
+    paginator = Paginator(
+        PostWindow(shards.merge(group.posts.all()), window['count'], ids),
+        POSTS_COUNT
+    )
+    return paginator.get_page(request.GET.get('page'))
+
+
+def update_group_window(group_id, post, add):
+    """Добавляет пост в список группы или убирает его оттуда.
+
+    Список читается в обход памяти процесса (у TieredCache — из общего
+    кэша), чтобы не затереть правки других процессов. Если блокировку
+    взять не удалось или версия списка сменилась во время правки,
+    список удаляется и будет построен заново.
+    """
+    key = group_window_key(group_id)
+    bump_window_version(group_id)
+    with stale_cache.try_locked(key) as acquired:
+        if not acquired:
+            cache.delete(key)
+            return
+        version = get_window_version(group_id)
+        window = shared_cache().get(key)
+        if window is None:
+            return
+        posts = [entry for entry in window['posts'] if entry[1] != post.pk]
+        complete = window['count'] == len(window['posts'])
+        if add:
+            count = window['count'] + 1
+            entry = (post.pub_date.timestamp(), post.pk)
+            keys = [-timestamp for timestamp, _ in posts]
+            position = bisect.bisect_left(keys, -entry[0])
+            if complete or position < len(posts):
+                posts.insert(position, entry)
+        else:
+            count = window['count'] - 1
+        if (
+            (not posts and count > 0)
+            or get_window_version(group_id) != version
+        ):
+            cache.delete(key)
+            return
+        cache.set(
+            key,
+            {'count': count, 'posts': posts[:GROUP_WINDOW]},
+            GROUP_WINDOW_TIMEOUT
+        )
+
+
+def drop_group_windows(group_ids):
+    group_ids = {pk for pk in group_ids if pk}
+    for group_id in group_ids:
+        bump_window_version(group_id)
+    cache.delete_many([group_window_key(pk) for pk in group_ids])
@@ -0,0 +1,61 @@
+from django.template.loader import render_to_string
+
+from core.fragments import register
+
+from .cache_keys import follow_key
+from .forms import CommentForm
+from .models import Follow
+from .shards import each
+
+
+def follow_keys(request, username):
+    if not request.user.is_authenticated:
+        return ()
+    return (follow_key(request.user.pk),)
+
+
+@register('follow_button', timeout=60 * 5, keys=follow_keys)
+def follow_button(request, username):
+    following = False
+    if (request.user.is_authenticated
+            and request.user.username != username):
+        follows = Follow.objects.filter(
+            user=request.user, author__username=username
+        ).cached()
+        following = any(part.exists() for part in each(follows))
+    context = {
+        'username': username,
+        'following': following,
+    }
+    return render_to_string(
+        'posts/includes/follow_button.html', context, request
+    )
+
+
+@register('switcher', timeout=60 * 5)
+def switcher(request, active=''):
+    return render_to_string(
+        'posts/includes/switcher.html', {'active': active}, request
+    )
+
+
+@register('post_actions')
+def post_actions(request, post_id, author_id):
+    context = {
+        'post_id': post_id,
+        'is_author': str(request.user.pk) == str(author_id),
+    }
+    return render_to_string(
+        'posts/includes/post_actions.html', context, request
+    )
+
+
+@register('comment_form')
+def comment_form(request, post_id):
+    context = {
+        'post_id': post_id,
+        'form': CommentForm(),
+    }
+    return render_to_string(
+        'posts/includes/comment_form.html', context, request
+    )
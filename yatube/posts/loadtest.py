@@ -0,0 +1,283 @@
+"""Нагрузка на WSGI-приложение без внешних инструментов.
+
+Запросы заранее раскладываются по смеси ролей: анонимные читатели,
+подписчики со своей лентой, авторы новых постов и комментаторы.
+Потом план выполняется вызовами ``yatube.wsgi.application`` из пула
+потоков или процессов. Сессии ролей с входом создаются заранее,
+а POST-запросы несут cookie и поле CSRF, поэтому запросы проходят весь
+стек middleware, включая проверку CSRF. Посты и комментарии
+записываются в текущую базу.
+"""
+import io
+import random
+import sys
+import time
+from collections import defaultdict, namedtuple
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db.models import Count
+from django.middleware.csrf import get_token
+from django.test import Client, RequestFactory
+from django.urls import NoReverseMatch, reverse
+
+from core import stats
+
+from .models import Group, Post, Tag, User
+from .warmup import REMOTE_ADDR
+
+Request = namedtuple(
+    'Request', ('label', 'method', 'path', 'query', 'body', 'cookie')
+)
+Result = namedtuple('Result', ('label', 'status', 'duration'))
+
+ROLES = ('reader', 'follower', 'poster', 'commenter')
+DEFAULT_MIX = {'reader': 70, 'follower': 20, 'poster': 5, 'commenter': 5}
+SAMPLE_SIZE = 200
+# Сколько значений каждого параметра маршрута брать для replay_traffic.
+REPLAY_POOL_SIZE = 10000
+
+
+def parse_mix(value):
+    """'reader=70,poster=5' -> {'reader': 70, 'poster': 5}."""
+    mix = {}
+    for part in value.split(','):
+        role, _, weight = part.partition('=')
+        role = role.strip()
+        if role not in ROLES:
+            raise ValueError(f'Неизвестная роль: {role}')
+        mix[role] = float(weight)
+    if not any(mix.values()):
+        raise ValueError('Все веса нулевые')
+    return mix
+
+
+class Session:
+    """Cookie вошедшего пользователя и его токен CSRF."""
+
+    def __init__(self, user):
+        client = Client()
+        client.force_login(user)
+        self.user = user
+        self.csrf_token = get_token(RequestFactory().get('/'))
+        self.cookie = '; '.join((
+            f'{settings.SESSION_COOKIE_NAME}='
+            f'{client.cookies[settings.SESSION_COOKIE_NAME].value}',
+            f'{settings.CSRF_COOKIE_NAME}={self.csrf_token}',
+        ))
+
+
+class Planner:
+    """Раскладывает запросы по ролям на данных текущей базы."""
+
+    def __init__(self, sessions=20, seed=0):
+        self.rng = random.Random(seed)
+        self.groups = list(
+            Group.objects.values_list('slug', flat=True)[:SAMPLE_SIZE]
+        )
+        self.authors = list(
+            User.objects.annotate(total=Count('posts'))
+            .filter(total__gt=0).order_by('-total')
+            .values_list('username', flat=True)[:SAMPLE_SIZE]
+        )
+        self.posts = list(
+            Post.objects.order_by('-pub_date')
+            .values_list('pk', flat=True)[:SAMPLE_SIZE]
+        )
+        followers = (
+            User.objects.annotate(total=Count('follower'))
+            .filter(total__gt=0).order_by('-total')[:sessions]
+        )
+        self.followers = [Session(user) for user in followers]
+        self.writers = [
+            Session(user) for user in User.objects.order_by('?')[:sessions]
+        ]
+
+    def get(self, name, args=(), query=None, session=None):
+        return Request(
+            name, 'GET', reverse(name, args=args),
+            urlencode(query or {}), b'',
+            session.cookie if session else '',
+        )
+
+    def post(self, name, args, data, session):
+        data = dict(data, csrfmiddlewaretoken=session.csrf_token)
+        return Request(
+            name, 'POST', reverse(name, args=args), '',
+            urlencode(data).encode(), session.cookie,
+        )
+
+    def reader(self):
+        choices = [lambda: self.get('posts:index',
+                                    query={'page': self.rng.randint(1, 3)})]
+        if self.groups:
+            choices.append(lambda: self.get(
+                'posts:group_list', [self.rng.choice(self.groups)]
+            ))
+        if self.authors:
+            choices.append(lambda: self.get(
+                'posts:profile', [self.rng.choice(self.authors)]
+            ))
+        if self.posts:
+            choices.append(lambda: self.get(
+                'posts:post_detail', [self.rng.choice(self.posts)]
+            ))
+        return self.rng.choice(choices)()
+
+    def follower(self):
+        session = self.rng.choice(self.followers)
+        if self.posts and self.rng.random() < 0.3:
+            return self.get('posts:post_detail',
+                            [self.rng.choice(self.posts)], session=session)
+        return self.get('posts:follow_index',
+                        query={'page': self.rng.randint(1, 2)},
+                        session=session)
+
+    def poster(self):
+        return self.post(
+            'posts:post_create', (),
+            {'text': f'Пост нагрузочного теста {self.rng.random()}'},
+            self.rng.choice(self.writers),
+        )
+
+    def commenter(self):
+        return self.post(
+            'posts:add_comment', [self.rng.choice(self.posts)],
+            {'text': 'Комментарий нагрузочного теста'},
+            self.rng.choice(self.writers),
+        )
+
+    def available(self, mix):
+        """Роли смеси, для которых в базе хватает данных."""
+        needs = {
+            'follower': self.followers,
+            'poster': self.writers,
+            'commenter': self.writers and self.posts,
+        }
+        return {role: weight for role, weight in mix.items()
+                if weight and needs.get(role, True)}
+
+    def plan(self, count, mix):
+        mix = self.available(mix)
+        if not mix:
+            raise ValueError('В базе нет данных ни для одной роли смеси')
+        roles = self.rng.choices(list(mix), weights=list(mix.values()),
+                                 k=count)
+        return [getattr(self, role)() for role in roles]
+
+
+class Substitutes:
+    """Значения параметров маршрутов из текущей базы для replay_traffic.
+
+    Записанный HMAC параметра всегда переходит в одно и то же значение
+    из выборки, так что повторы запросов сохраняются.
+    """
+
+    def __init__(self):
+        self.pools = {
+            'post_id': Post.objects.order_by('-pub_date')
+            .values_list('pk', flat=True),
+            'username': User.objects.order_by('pk')
+            .values_list('username', flat=True),
+            'slug': Group.objects.order_by('pk')
+            .values_list('slug', flat=True),
+            'name': Tag.objects.order_by('pk')
+            .values_list('name', flat=True),
+        }
+        self.loaded = {}
+
+    def pool(self, name):
+        if name not in self.loaded:
+            values = self.pools.get(name)
+            self.loaded[name] = (
+                list(values[:REPLAY_POOL_SIZE]) if values is not None else []
+            )
+        return self.loaded[name]
+
+    def path(self, record):
+        """Адрес записи с подставленными значениями или None."""
+        kwargs = {}
+        for name, token in record.get('kwargs', {}).items():
+            pool = self.pool(name)
+            if not pool:
+                return None
+            kwargs[name] = pool[int(token, 16) % len(pool)]
+        try:
+            return reverse(record['view'], kwargs=kwargs)
+        except NoReverseMatch:
+            return None
+
+
+def environ(request, host, multiprocess=False):
+    return {
+        'REQUEST_METHOD': request.method,
+        'SCRIPT_NAME': '',
+        'PATH_INFO': request.path,
+        'QUERY_STRING': request.query,
+        'SERVER_NAME': host,
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': host,
+        'HTTP_COOKIE': request.cookie,
+        'REMOTE_ADDR': REMOTE_ADDR,
+        'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+        'CONTENT_LENGTH': str(len(request.body)),
+        'wsgi.input': io.BytesIO(request.body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0),
+        'wsgi.multithread': not multiprocess,
+        'wsgi.multiprocess': multiprocess,
+        'wsgi.run_once': False,
+    }
+
+
+def execute(request, host='localhost', multiprocess=False):
+    """Выполняет запрос через WSGI-приложение и читает ответ целиком."""
+    from yatube.wsgi import application
+
+    statuses = []
+
+    def start_response(status, headers, exc_info=None):
+        statuses.append(int(status.split(None, 1)[0]))
+
+    started = time.perf_counter()
+    response = application(environ(request, host, multiprocess),
+                           start_response)
+    try:
+        for _ in response:
+            pass
+    finally:
+        if hasattr(response, 'close'):
+            response.close()
+    duration = time.perf_counter() - started
+    return Result(f'{request.method} {request.label}', statuses[0], duration)
+
+
+def report(results, elapsed):
+    """Строки отчёта: пропускная способность и перцентили по адресам."""
+    by_label = defaultdict(list)
+    statuses = defaultdict(int)
+    for result in results:
+        by_label[result.label].append(result)
+        statuses[result.status] += 1
+    lines = [
+        f'{len(results)} запросов за {elapsed:.2f} с, '
+        f'{len(results) / elapsed:.1f} запросов/с',
+        'Статусы: ' + ', '.join(f'{status}: {count}'
+                                for status, count in sorted(statuses.items())),
+        '',
+        f'  {"адрес":28} {"число":>6} {"ошибок":>6} {"p50":>8} {"p90":>8} '
+        f'{"p99":>8} {"max":>8}',
+    ]
+    rows = sorted(by_label.items())
+    rows.append(('всего', results))
+    for label, items in rows:
+        summary = stats.summary([item.duration * 1000 for item in items])
+        errors = sum(item.status >= 500 for item in items)
+        lines.append(
+            f'  {label:28} {len(items):6d} {errors:6d} '
+            f'{summary["p50"]:8.1f} {summary["p90"]:8.1f} '
+            f'{summary["p99"]:8.1f} {summary["max"]:8.1f}'
+        )
+    return lines
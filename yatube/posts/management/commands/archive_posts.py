@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts.archive import archive_posts
+
+
+class Command(BaseCommand):
+    help = ('Переносит посты старше --days вместе с комментариями в сжатый '
+            'архив. Работает пачками от самых старых постов, прерванный '
+            'запуск продолжается следующим.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            default=settings.POST_ARCHIVE_AFTER_DAYS)
+        parser.add_argument('--batch-size', type=int,
+                            default=settings.POST_ARCHIVE_BATCH_SIZE)
+        parser.add_argument('--max-batches', type=int,
+                            help='Не больше N пачек в каждой базе.')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        total = archive_posts(
+            cutoff, options['batch_size'], options['max_batches']
+        )
+        self.stdout.write(
+            f'В архив перенесено постов: {total["posts"]}, '
+            f'комментариев: {total["comments"]}'
+        )
+        if total['raw']:
+            self.stdout.write(
+                f'Текст постов: {total["raw"] / 1024:.1f} КиБ, '
+                f'сжатый: {total["compressed"] / 1024:.1f} КиБ'
+            )
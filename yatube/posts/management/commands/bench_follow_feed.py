@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.feeds import follow_feed_cache_key
+from posts.models import Follow, Post, User
+
+
+class Command(BaseCommand):
+    help = ('Замеряет цену ленты подписок: ключ ленты читателя с --follows '
+            'подписками и публикацию поста автором с --followers '
+            'подписчиками. Тестовые данные создаются в транзакции '
+            'и откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--follows', type=int, default=1000)
+        parser.add_argument('--followers', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def measure(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return (f'лучшее {min(timings) * 1000:.1f} мс, '
+                f'худшее {max(timings) * 1000:.1f} мс')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            reader = User.objects.create(username='bench-reader')
+            author = User.objects.create(username='bench-author')
+            User.objects.bulk_create(
+                User(username=f'bench-user-{number}') for number in range(
+                    max(options['follows'], options['followers'])
+                )
+            )
+            users = list(User.objects.filter(
+                username__startswith='bench-user-'
+            ).values_list('pk', flat=True))
+            Follow.objects.bulk_create(
+                [Follow(user=reader, author_id=pk)
+                 for pk in users[:options['follows']]]
+                + [Follow(user_id=pk, author=author)
+                   for pk in users[:options['followers']]]
+            )
+            follow_feed_cache_key(reader.pk, 1)
+            feed = self.measure(
+                lambda: follow_feed_cache_key(reader.pk, 1),
+                options['repeat'],
+            )
+            publish = self.measure(
+                lambda: Post.objects.create(author=author, text='Бенчмарк'),
+                options['repeat'],
+            )
+            transaction.set_rollback(True)
+        self.stdout.write(
+            f'Ключ ленты при {options["follows"]} подписках: {feed}'
+        )
+        self.stdout.write(
+            f'Пост автора с {options["followers"]} подписчиками: {publish}'
+        )
@@ -0,0 +1,110 @@
+import json
+import os
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from posts import benchmarks
+from posts.models import Post
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+class Command(BaseCommand):
+    help = ('Мерит view index, group_posts, profile, post_detail, '
+            'follow_index и add_comment на сгенерированных наборах '
+            'нескольких размеров и сравнивает с базовым файлом.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000',
+                            help='Размеры набора в постах через запятую.')
+        parser.add_argument('--requests', type=int, default=30)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--warm-cache', action='store_true',
+                            help='Не очищать кэш перед запросами.')
+        parser.add_argument('--baseline', default=settings.BENCHMARK_BASELINE)
+        parser.add_argument('--tolerance', type=float,
+                            default=settings.BENCHMARK_TOLERANCE,
+                            help='Допустимое ухудшение, доля.')
+        parser.add_argument('--save', action='store_true',
+                            help='Записать результаты в базовый файл.')
+        parser.add_argument('--in-place', action='store_true',
+                            help='Генерировать данные в текущей базе, '
+                                 'а не во временной тестовой.')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = sorted(int(size) for size in options['sizes'].split(','))
+        except ValueError:
+            raise CommandError('--sizes: числа через запятую')
+        if options['in_place']:
+            results = self.run(sizes, options)
+        else:
+            name = connection.settings_dict['NAME']
+            connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False
+            )
+            try:
+                results = self.run(sizes, options)
+            finally:
+                connection.creation.destroy_test_db(name, verbosity=0)
+        baseline = load_baseline(options['baseline'])
+        regressions = benchmarks.compare(
+            baseline.get('sizes', {}), results, options['tolerance']
+        )
+        if options['save']:
+            baseline.setdefault('sizes', {}).update(results)
+            directory = os.path.dirname(options['baseline'])
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(options['baseline'], 'w', encoding='utf-8') as file:
+                json.dump(baseline, file, indent=2, sort_keys=True)
+            self.stdout.write(f'Базовые значения: {options["baseline"]}')
+        elif regressions:
+            raise CommandError(
+                'Ухудшение больше допуска:\n' + '\n'.join(regressions)
+            )
+
+    def generate(self, size):
+        missing = size - Post.objects.count()
+        if missing <= 0:
+            return
+        call_command(
+            'generate_dataset', users=max(missing // 10, 2),
+            groups=max(missing // 100, 1), posts=missing,
+            comments=missing * 2,
+            max_follows=100, seed=size, prefix=f'bench{size}-',
+            stdout=StringIO(),
+        )
+
+    def run(self, sizes, options):
+        results = {}
+        for size in sizes:
+            self.generate(size)
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{size} постов'
+            ))
+            self.stdout.write(
+                f'  {"view":14} {"p50":>8} {"p90":>8} {"p99":>8} '
+                f'{"запросов":>9} {"пик КиБ":>9}'
+            )
+            views = results[str(size)] = {}
+            for scenario in benchmarks.scenarios():
+                metrics = views[scenario.name] = benchmarks.measure(
+                    scenario, options['requests'], options['warmup'],
+                    options['warm_cache'],
+                )
+                self.stdout.write(
+                    f'  {scenario.name:14} {metrics["p50"]:8.2f} '
+                    f'{metrics["p90"]:8.2f} {metrics["p99"]:8.2f} '
+                    f'{metrics["queries"]:9d} {metrics["peak_kib"]:9.1f}'
+                )
+        return results
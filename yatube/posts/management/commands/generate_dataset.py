@@ -0,0 +1,91 @@
+import multiprocessing
+import time
+from datetime import timedelta
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from core.page_cache import purge
+from core.querycache import purge_tables
+from posts import dataset
+from posts.cache_keys import FEED_KEY
+from posts.models import Comment, Follow, Group, Post, User
+
+
+def setup_worker():
+    django.setup()
+
+
+def run_batch(task):
+    return dataset.create_batch(*task)
+
+
+class Command(BaseCommand):
+    help = ('Создаёт большой набор пользователей, постов, комментариев '
+            'и подписок с реалистичной неравномерностью. С --workers '
+            'пачки пишутся параллельно; это имеет смысл для PostgreSQL, '
+            'SQLite всё равно пишет по одной транзакции.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=200000)
+        parser.add_argument('--max-follows', type=int, default=500,
+                            help='Наибольшее число подписок пользователя.')
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько последних дней публикации.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='gen-',
+                            help='Префикс имён пользователей и slug групп.')
+
+    def handle(self, *args, **options):
+        if options['users'] < 2 and (options['posts'] or options['comments']):
+            raise CommandError('Нужно хотя бы два пользователя')
+        plan = dataset.Plan(
+            users=options['users'], groups=options['groups'],
+            posts=options['posts'], comments=options['comments'],
+            max_follows=options['max_follows'], days=options['days'],
+            seed=options['seed'], prefix=options['prefix'],
+            start=timezone.now() - timedelta(days=options['days']),
+        )
+        dataset.create_groups(plan)
+        size = options['batch_size']
+        phases = (
+            (User, plan.users, size),
+            (Post, plan.posts, size),
+            (Comment, plan.comments if plan.posts else 0, size),
+            # Пачка подписок — пользователи, а не записи.
+            (Follow, plan.users, max(size // 50, 1)),
+        )
+        pool = None
+        if options['workers'] > 1:
+            # Дочерние процессы не должны унаследовать открытые соединения.
+            connections.close_all()
+            pool = multiprocessing.Pool(options['workers'],
+                                        initializer=setup_worker)
+        try:
+            for model, total, batch in phases:
+                tasks = [(plan, model, first, count)
+                         for first, count in dataset.batches(total, batch)]
+                started = time.perf_counter()
+                if pool is None:
+                    created = sum(map(run_batch, tasks))
+                else:
+                    created = sum(pool.imap_unordered(run_batch, tasks))
+                self.stdout.write(
+                    f'{model.__name__}: {created} за '
+                    f'{time.perf_counter() - started:.1f} с'
+                )
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        dataset.reset_sequences()
+        purge_tables(*(model._meta.db_table
+                       for model in (User, Group, Post, Comment, Follow)))
+        purge(FEED_KEY)
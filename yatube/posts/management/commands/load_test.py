@@ -0,0 +1,71 @@
+import functools
+import multiprocessing
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from posts import loadtest
+
+
+def setup_worker():
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = ('Нагружает yatube.wsgi.application из пула потоков или '
+            'процессов смесью ролей и печатает пропускную способность '
+            'и перцентили по адресам. Посты и комментарии ролей poster '
+            'и commenter пишутся в текущую базу.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--processes', action='store_true',
+                            help='Пул процессов вместо пула потоков.')
+        parser.add_argument(
+            '--mix',
+            default=','.join(f'{role}={weight}' for role, weight
+                             in loadtest.DEFAULT_MIX.items()),
+            help='Веса ролей reader, follower, poster, commenter.'
+        )
+        parser.add_argument('--sessions', type=int, default=20,
+                            help='Сколько пользователей входят в систему.')
+        parser.add_argument('--warmup', type=int, default=20,
+                            help='Запросы до замера, в один поток.')
+        parser.add_argument('--host', default=settings.WARM_CACHES_HOST)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            mix = loadtest.parse_mix(options['mix'])
+        except ValueError as error:
+            raise CommandError(f'--mix: {error}')
+        planner = loadtest.Planner(options['sessions'], options['seed'])
+        try:
+            warmup = planner.plan(options['warmup'], mix)
+            plan = planner.plan(options['requests'], mix)
+        except ValueError as error:
+            raise CommandError(f'--mix: {error}')
+        execute = functools.partial(
+            loadtest.execute, host=options['host'],
+            multiprocess=options['processes']
+        )
+        for request in warmup:
+            execute(request)
+        started = time.perf_counter()
+        if options['processes']:
+            # Дочерние процессы не должны унаследовать открытые соединения.
+            connections.close_all()
+            with multiprocessing.Pool(options['concurrency'],
+                                      initializer=setup_worker) as pool:
+                results = pool.map(execute, plan, chunksize=1)
+        else:
+            with ThreadPoolExecutor(options['concurrency']) as executor:
+                results = list(executor.map(execute, plan))
+        elapsed = time.perf_counter() - started
+        for line in loadtest.report(results, elapsed):
+            self.stdout.write(line)
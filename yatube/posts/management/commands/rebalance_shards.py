@@ -0,0 +1,84 @@
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Count
+
+from posts import shards
+from posts.models import AuthorShard, Post, User
+
+
+class Command(BaseCommand):
+    help = ('Переносит авторов между шардами, не останавливая сайт. '
+            'С именами авторов и --to переносит их в указанную базу, '
+            'без них — все данные из основной базы в шарды, а затем '
+            'выравнивает число постов в шардах.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*')
+        parser.add_argument('--to', help='База для указанных авторов.')
+        parser.add_argument('--batch', type=int, default=50,
+                            help='Сколько авторов переносить за раз.')
+        parser.add_argument('--grace', type=float,
+                            default=settings.SHARD_MOVE_GRACE)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать план.')
+
+    def handle(self, *args, **options):
+        if not shards.is_enabled():
+            raise CommandError('Шардов нет: задайте DJANGO_DB_SHARDS')
+        if options['usernames']:
+            if options['to'] not in shards.databases():
+                raise CommandError(
+                    f'--to должен быть одной из баз: '
+                    f'{", ".join(shards.databases())}'
+                )
+            authors = User.objects.filter(username__in=options['usernames'])
+            moves = dict.fromkeys(
+                authors.values_list('pk', flat=True), options['to']
+            )
+        else:
+            moves = shards.plan(self.authors(), settings.DATABASE_SHARDS)
+        moves = {author_id: target for author_id, target in moves.items()
+                 if shards.author_shard(author_id) != target}
+        self.stdout.write(f'Авторов к переносу: {len(moves)}')
+        if options['dry_run'] or not moves:
+            for author_id, target in moves.items():
+                self.stdout.write(
+                    f'  {author_id}: {shards.author_shard(author_id)} '
+                    f'→ {target}'
+                )
+            return
+        for shard in settings.DATABASE_SHARDS:
+            shards.sync_reference(shard)
+        items = list(moves.items())
+        copied = Counter()
+        for start in range(0, len(items), options['batch']):
+            batch = dict(items[start:start + options['batch']])
+            try:
+                copied += shards.move_authors(batch, options['grace'])
+            except shards.PostIdConflict as error:
+                raise CommandError(error)
+            self.stdout.write(
+                f'Перенесено авторов: {start + len(batch)} из {len(items)}'
+            )
+        self.stdout.write(', '.join(
+            f'{name}: {count}' for name, count in sorted(copied.items())
+        ))
+
+    def authors(self):
+        """{id автора: (база, число постов)} для всех пользователей."""
+        locations = dict(AuthorShard.objects.values_list('author_id', 'shard'))
+        counts = Counter()
+        for db in shards.databases():
+            counts.update(dict(
+                Post.objects.using(db).order_by().values_list(
+                    'author_id'
+                ).annotate(count=Count('id'))
+            ))
+        return {
+            author_id: (locations.get(author_id, DEFAULT_DB_ALIAS),
+                        counts[author_id])
+            for author_id in User.objects.values_list('pk', flat=True)
+        }
@@ -0,0 +1,125 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import traffic
+from posts import loadtest
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = ('Воспроизводит журнал TrafficCaptureMiddleware через '
+            'yatube.wsgi.application с выбранной скоростью и сравнивает '
+            'время ответа по view с записанным. Параметры маршрутов '
+            'заменяются записями текущей базы. Запросы с телом (POST) '
+            'не записываются целиком и пропускаются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=settings.TRAFFIC_CAPTURE_LOG)
+        parser.add_argument('--speed', type=float, default=1.0,
+                            help='Во сколько раз быстрее записи; '
+                                 '0 — без пауз.')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--user',
+                            help='Пользователь для запросов вошедших; '
+                                 'без него такие запросы пропускаются.')
+        parser.add_argument('--limit', type=int,
+                            help='Воспроизвести только первые N записей.')
+        parser.add_argument('--host', default=settings.WARM_CACHES_HOST)
+        parser.add_argument('--tolerance', type=float,
+                            default=settings.BENCHMARK_TOLERANCE,
+                            help='Порог выделения медленных view, доля.')
+
+    def handle(self, *args, **options):
+        records = traffic.read_log(options['log'])[:options['limit']]
+        if not records:
+            raise CommandError(f'В {options["log"]} нет записей')
+        session = None
+        if options['user']:
+            try:
+                session = loadtest.Session(
+                    User.objects.get(username=options['user'])
+                )
+            except User.DoesNotExist:
+                raise CommandError(
+                    f'Пользователь {options["user"]} не найден'
+                )
+        replayable = self.replayable(records, session)
+        if not replayable:
+            raise CommandError(
+                f'В {options["log"]} нет записей, которые можно '
+                f'воспроизвести'
+            )
+        self.stdout.write(
+            f'Записей: {len(records)}, воспроизводится: {len(replayable)}'
+        )
+        started = time.perf_counter()
+        results = self.replay(replayable, session, options)
+        elapsed = time.perf_counter() - started
+        recorded = replayable[-1]['ts'] - replayable[0]['ts']
+        self.stdout.write(
+            f'Длительность записи {recorded:.1f} с, '
+            f'воспроизведения {elapsed:.1f} с'
+        )
+        comparison = traffic.compare(
+            [(record['view'], record['duration_ms'])
+             for record in replayable],
+            [(record['view'], result.duration * 1000)
+             for record, result in zip(replayable, results)],
+        )
+        self.stdout.write(
+            f'  {"view":28} {"число":>6} {"p50 было":>9} {"p50 стало":>10} '
+            f'{"p90 было":>9} {"p90 стало":>10}'
+        )
+        for view, (count, before, after) in comparison.items():
+            line = (
+                f'  {view:28} {count:6d} {before["p50"]:9.1f} '
+                f'{after["p50"]:10.1f} {before["p90"]:9.1f} '
+                f'{after["p90"]:10.1f}'
+            )
+            if after['p50'] > before['p50'] * (1 + options['tolerance']):
+                line = self.style.ERROR(line)
+            self.stdout.write(line)
+        errors = sum(result.status >= 500 for result in results)
+        if errors:
+            self.stdout.write(self.style.ERROR(f'Ответов 5xx: {errors}'))
+
+    def replayable(self, records, session):
+        """Записи, которые можно отправить, с адресами из текущей базы."""
+        substitutes = loadtest.Substitutes()
+        replayable = []
+        for record in records:
+            if record['method'] not in traffic.SAFE_METHODS or (
+                record['user'] != traffic.ANONYMOUS and session is None
+            ):
+                continue
+            path = substitutes.path(record)
+            if path is not None:
+                replayable.append(dict(record, path=path))
+        return replayable
+
+    def replay(self, records, session, options):
+        """Отправляет запросы в моменты записи, сжатые в speed раз."""
+        speed = options['speed']
+        first = records[0]['ts']
+        started = time.perf_counter()
+        futures = []
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            for record in records:
+                if speed > 0:
+                    delay = ((record['ts'] - first) / speed
+                             - (time.perf_counter() - started))
+                    if delay > 0:
+                        time.sleep(delay)
+                user = record['user'] != traffic.ANONYMOUS
+                request = loadtest.Request(
+                    record['view'], record['method'], record['path'],
+                    record['query'], b'',
+                    session.cookie if user else '',
+                )
+                futures.append(executor.submit(
+                    loadtest.execute, request, options['host']
+                ))
+        return [future.result() for future in futures]
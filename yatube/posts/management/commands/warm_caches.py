@@ -0,0 +1,52 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.warmup import warm, warm_urls
+
+
+class Command(BaseCommand):
+    help = ('Прогревает кэши: запрашивает первые страницы лент, '
+            'популярные группы, профили и посты.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=3,
+                            help='Сколько первых страниц каждой ленты.')
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--profiles', type=int, default=10)
+        parser.add_argument('--posts', type=int, default=20)
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--host', default=settings.WARM_CACHES_HOST,
+                            help='Адрес сайта, как его видят посетители.')
+        parser.add_argument('--secure', action='store_true',
+                            help='Запрашивать страницы по https.')
+
+    def handle(self, *args, **options):
+        urls = warm_urls(
+            pages=options['pages'],
+            groups=options['groups'],
+            profiles=options['profiles'],
+            posts=options['posts'],
+        )
+        started = time.perf_counter()
+        results = warm(
+            urls,
+            host=options['host'],
+            secure=options['secure'],
+            threads=options['threads'],
+        )
+        elapsed = time.perf_counter() - started
+        failed = 0
+        for result in results:
+            if result.status != 200:
+                failed += 1
+            self.stdout.write(
+                f'{result.status} {result.cache:5} '
+                f'{result.duration * 1000:7.1f} мс  {result.url}'
+            )
+        style = self.style.ERROR if failed else self.style.SUCCESS
+        self.stdout.write(style(
+            f'Прогрето страниц: {len(results) - failed} из {len(results)} '
+            f'за {elapsed:.2f} с'
+        ))
@@ -0,0 +1,31 @@
+import math
+
+from django.conf import settings
+from django.shortcuts import render
+
+from .shards import ShardMoving
+
+
+class ShardMovingMiddleware:
+    """Отвечает 503 с Retry-After на запись автора, которого переносят.
+
+    Пока rebalance_shards копирует данные автора, его посты,
+    комментарии к ним и подписки на него не принимают запись
+    (ShardMoving). Перенос длится две паузы SHARD_MOVE_GRACE плюс
+    копирование, поэтому клиенту предлагается повторить позже.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, ShardMoving):
+            return None
+        response = render(request, 'core/503.html', status=503)
+        response['Retry-After'] = max(
+            math.ceil(2 * settings.SHARD_MOVE_GRACE), 1
+        )
+        return response
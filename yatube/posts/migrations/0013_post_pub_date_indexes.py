@@ -0,0 +1,47 @@
+# Generated by Django 2.2.16 on 2026-10-19 08:39
+
+from django.db import migrations, models
+
+# Индексы, которые есть только в PostgreSQL: BRIN по дате публикации
+# (посты пишутся по порядку дат, и индекс занимает килобайты),
+# частичный индекс ленты группы и GIN для полнотекстового поиска.
+# Выражение GIN-индекса должно совпадать с SearchVector в posts.search.
+POSTGRES_INDEXES = (
+    ('post_pub_date_brin',
+     'CREATE INDEX post_pub_date_brin ON posts_post USING brin (pub_date)'),
+    ('post_group_pub_date_idx',
+     'CREATE INDEX post_group_pub_date_idx ON posts_post '
+     '(group_id, pub_date DESC) WHERE group_id IS NOT NULL'),
+    ('post_text_search_idx',
+     'CREATE INDEX post_text_search_idx ON posts_post USING gin '
+     "(to_tsvector('russian'::regconfig, COALESCE(text, '')))"),
+)
+
+
+def create_postgres_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for _, sql in POSTGRES_INDEXES:
+        schema_editor.execute(sql)
+
+
+def drop_postgres_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in POSTGRES_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_updated'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-pub_date'], name='post_pub_date_idx'),
+        ),
+        migrations.RunPython(create_postgres_indexes, drop_postgres_indexes),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+# BRIN-индекс из 0013 повторял b-tree post_pub_date_idx и не умеет
+# отдавать строки по порядку, поэтому для ORDER BY pub_date DESC LIMIT
+# лент бесполезен, а каждую вставку поста удорожал.
+BRIN_INDEX = 'post_pub_date_brin'
+
+
+def drop_brin_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {BRIN_INDEX}')
+
+
+def create_brin_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX {BRIN_INDEX} ON posts_post USING brin (pub_date)'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_archivedpost'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_brin_index, create_brin_index),
+    ]
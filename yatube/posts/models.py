@@ -2,6 +2,8 @@ from django.contrib.auth import get_user_model
 from django.db import models
 from django.urls import reverse
 
+from core.querycache import CachedManager, CachedQuerySet
+
 User = get_user_model()
 
 
@@ -10,16 +12,72 @@ class Group(models.Model):
     slug = models.SlugField(unique=True)
     description = models.TextField()
 
+    objects = CachedManager()
+
     def __str__(self):
         return self.title
 
 
+class Tag(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+
+    objects = CachedManager()
+
+    class Meta:
+        ordering = ('name',)
+        verbose_name = 'Тег'
+        verbose_name_plural = 'Теги'
+
+    def __str__(self):
+        return self.name
+
+    def get_absolute_url(self):
+        return reverse('posts:tag_list', kwargs={'name': self.name})
+
+
+class ShardedQuerySet(CachedQuerySet):
+    """Создаёт объекты через save(), чтобы ShardRouter выбрал шард
+    по самому объекту, а не только по модели."""
+
+    def create(self, **kwargs):
+        if self._db is not None:
+            return super().create(**kwargs)
+        obj = self.model(**kwargs)
+        self._for_write = True
+        obj.save(force_insert=True)
+        return obj
+
+
+class PostQuerySet(ShardedQuerySet):
+    """Сбрасывает списки постов групп при массовых изменениях."""
+
+    def bulk_create(self, objs, *args, **kwargs):
+        from .feeds import drop_group_windows
+        objs = super().bulk_create(objs, *args, **kwargs)
+        drop_group_windows(obj.group_id for obj in objs)
+        return objs
+
+    def update(self, **kwargs):
+        from .feeds import drop_group_windows
+        if not {'group', 'group_id', 'pub_date'} & set(kwargs):
+            return super().update(**kwargs)
+        group_ids = set(self.values_list('group_id', flat=True))
+        rows = super().update(**kwargs)
+        group = kwargs.get('group', kwargs.get('group_id'))
+        group_ids.add(getattr(group, 'pk', group))
+        drop_group_windows(group_ids)
+        return rows
+
+    update.alters_data = True
+
+
 class Post(models.Model):
     text = models.TextField(
         verbose_name='Текст поста',
         help_text='Текстовое поле'
     )
     pub_date = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField('Дата изменения', auto_now=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -41,9 +99,35 @@ class Post(models.Model):
         blank=True,
         help_text='Вставьте картинку'
     )
+    tags = models.ManyToManyField(
+        Tag,
+        blank=True,
+        related_name='posts',
+        verbose_name='Теги'
+    )
+    mentions = models.ManyToManyField(
+        User,
+        blank=True,
+        related_name='mentioned_in',
+        verbose_name='Упоминания'
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = (
+            # Лента главной: ORDER BY pub_date DESC LIMIT без сортировки.
+            models.Index(fields=('-pub_date',), name='post_pub_date_idx'),
+            models.Index(
+                fields=('author', 'updated'),
+                name='post_author_updated_idx'
+            ),
+            models.Index(
+                fields=('group', 'updated'),
+                name='post_group_updated_idx'
+            ),
+        )
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
@@ -75,6 +159,8 @@ class Comment(models.Model):
         auto_now_add=True
     )
 
+    objects = ShardedQuerySet.as_manager()
+
     class Meta:
         ordering = ('-created',)
 
@@ -94,5 +180,83 @@ class Follow(models.Model):
         on_delete=models.CASCADE
     )
 
+    objects = ShardedQuerySet.as_manager()
+
     def __str__(self):
         return f"Последователь: '{self.user}', автор: '{self.author}'"
+
+
+class AuthorShard(models.Model):
+    """Шард, в котором лежат посты, комментарии к ним и подписки
+    на автора (см. posts.shards). Хранится только в основной базе."""
+    author = models.OneToOneField(
+        User,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    shard = models.CharField('База', max_length=100)
+    moving = models.BooleanField('Переносится', default=False)
+
+    objects = CachedManager()
+
+    def __str__(self):
+        return f'{self.author_id}: {self.shard}'
+
+
+class PostAuthor(models.Model):
+    """Автор поста по его id: по нему находится шард поста.
+
+    Последовательность id этой таблицы выдаёт id новым постам, чтобы
+    они не повторялись в разных шардах.
+    """
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+
+    objects = CachedManager()
+
+
+class ArchivedPost(models.Model):
+    """Старый пост в архиве (posts.archive).
+
+    Текст и комментарии хранятся сжатыми, id совпадает с id поста.
+    """
+    id = models.IntegerField(primary_key=True)
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='+'
+    )
+    pub_date = models.DateTimeField()
+    updated = models.DateTimeField()
+    image = models.CharField(max_length=100, blank=True)
+    text = models.BinaryField()
+    comments = models.BinaryField()
+    archived = models.DateTimeField(auto_now_add=True)
+
+    objects = ShardedQuerySet.as_manager()
+
+    class Meta:
+        ordering = ('-pub_date',)
+        indexes = (
+            models.Index(
+                fields=('author', '-pub_date'),
+                name='archived_author_date_idx'
+            ),
+        )
+
+    def __str__(self):
+        return str(self.pk)
+
+    def get_absolute_url(self):
+        return reverse('posts:post_detail', kwargs={'post_id': self.pk})
@@ -0,0 +1,30 @@
+"""Поиск постов по тексту.
+
+В PostgreSQL — полнотекстовый поиск со словарём русского языка по
+GIN-индексу post_text_search_idx (миграция 0013): находятся и другие
+формы слова. В остальных базах каждое слово запроса ищется подстрокой
+без учёта регистра. Для этого используется iregex, а не icontains:
+LIKE в SQLite не различает регистр только у латиницы.
+"""
+import re
+
+from django.db import connections
+from django.db.models import Q
+
+SEARCH_CONFIG = 'russian'
+MAX_QUERY_LENGTH = 200
+
+
+def search_posts(queryset, query):
+    words = query[:MAX_QUERY_LENGTH].split()
+    if not words:
+        return queryset.none()
+    if connections[queryset.db].vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchVector
+        return queryset.annotate(
+            search=SearchVector('text', config=SEARCH_CONFIG)
+        ).filter(search=SearchQuery(' '.join(words), config=SEARCH_CONFIG))
+    condition = Q()
+    for word in words:
+        condition &= Q(text__iregex=re.escape(word))
+    return queryset.filter(condition)
@@ -0,0 +1,492 @@
+"""Шардирование постов по авторам.
+
+Посты автора, комментарии к ним, их теги и упоминания, его архивные
+посты и подписки на автора лежат в одной базе из DATABASE_SHARDS —
+её называет карта AuthorShard в основной базе. Новый пользователь
+сразу получает шард, а у авторов без записи в карте данные остаются
+в основной базе, где они были до включения шардов; туда и обратно их
+переносит команда ``rebalance_shards``. Страница автора и поста
+читает одну базу, общие ленты — все базы сразу, сливая их по дате
+публикации (``merge``).
+
+Id постов выдаёт общая последовательность PostAuthor, она же говорит,
+какому автору, а значит и какому шарду, принадлежит пост. Справочники
+(пользователи, группы, теги) копируются во все шарды, чтобы работали
+внешние ключи и JOIN внутри шарда; сессии и всё остальное живёт
+только в основной базе.
+
+ShardRouter направляет запросы, у которых есть объект-подсказка
+(``post.comments``, ``comment.post``, ``post.save()``), остальные
+запросы к постам получают базу явно через функции этого модуля.
+Когда DATABASE_SHARDS пуст, все функции возвращают queryset без
+изменений.
+"""
+import heapq
+import time
+from collections import Counter
+from itertools import islice
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, transaction
+from django.db.models import Max
+
+from . import dataset
+from .models import (ArchivedPost, AuthorShard, Comment, Follow, Group, Post,
+                     PostAuthor, Tag, User)
+
+SHARDED_MODELS = (
+    Post, Comment, Follow, Post.tags.through, Post.mentions.through,
+    ArchivedPost,
+)
+REFERENCE_MODELS = (User, Group, Tag)
+MERGE_ORDER = ('-pub_date', '-pk')
+BATCH_SIZE = 500
+COMBINE = {'Count': sum, 'Sum': sum, 'Max': max, 'Min': min}
+
+
+class ShardMoving(DatabaseError):
+    """Запись отклонена: данные автора сейчас переносятся."""
+
+
+class PostIdConflict(DatabaseError):
+    """Id поста в справочнике PostAuthor уже принадлежит другому автору."""
+
+
+def is_enabled():
+    return bool(settings.DATABASE_SHARDS)
+
+
+def databases():
+    """Базы, в которых могут лежать посты."""
+    return [DEFAULT_DB_ALIAS, *settings.DATABASE_SHARDS]
+
+
+def author_shard(author_id, for_write=False):
+    """База автора по карте; запись во время переноса отклоняется."""
+    row = AuthorShard.objects.using(DEFAULT_DB_ALIAS).filter(
+        author_id=author_id
+    ).values_list('shard', 'moving').cached().first()
+    if row is None:
+        return DEFAULT_DB_ALIAS
+    shard, moving = row
+    if for_write and moving:
+        raise ShardMoving(f'Автор {author_id} переносится в другой шард')
+    return shard
+
+
+def post_author(post_id):
+    return PostAuthor.objects.using(DEFAULT_DB_ALIAS).filter(
+        pk=post_id
+    ).values_list('author_id', flat=True).cached().first()
+
+
+def shard_for_post(post_id):
+    author_id = post_author(post_id)
+    if author_id is None:
+        return DEFAULT_DB_ALIAS
+    return author_shard(author_id)
+
+
+def route(queryset, db):
+    # Основную базу выбирает ReplicaRouter: чтение уйдёт на реплику,
+    # а запись закрепит запрос за основной базой.
+    return queryset if db == DEFAULT_DB_ALIAS else queryset.using(db)
+
+
+def for_author(queryset, author_id, for_write=False):
+    """Queryset в базе автора; для записи — только вне переноса."""
+    if not is_enabled():
+        return queryset
+    return route(queryset, author_shard(author_id, for_write))
+
+
+def for_post(queryset, post_id):
+    if not is_enabled():
+        return queryset
+    return route(queryset, shard_for_post(post_id))
+
+
+def each(queryset):
+    """Копии queryset для каждой базы с постами."""
+    if not is_enabled():
+        return [queryset]
+    return [route(queryset, db) for db in databases()]
+
+
+class MergedFeed:
+    """Лента из нескольких баз для Paginator и PostWindow.
+
+    Каждая база отдаёт первые ``stop`` строк в порядке MERGE_ORDER,
+    и они сливаются в одну ленту, как в сортировке слиянием. Поэтому
+    страница N стоит N страниц строк из каждой базы: глубокие страницы
+    общих лент с шардами дороже, чем без них.
+    """
+
+    def __init__(self, querysets, key=attrgetter('pub_date', 'pk')):
+        self.querysets = querysets
+        self.key = key
+        self.total = None
+
+    def count(self):
+        if self.total is None:
+            self.total = sum(queryset.count() for queryset in self.querysets)
+        return self.total
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        parts = [queryset[:index.stop] if index.stop is not None else queryset
+                 for queryset in self.querysets]
+        merged = heapq.merge(*parts, key=self.key, reverse=True)
+        return list(islice(merged, start, index.stop))
+
+    def in_bulk(self, ids):
+        posts = {}
+        for queryset in self.querysets:
+            posts.update(queryset.in_bulk(ids))
+        return posts
+
+
+def merge(queryset, key=attrgetter('pub_date', 'pk')):
+    """Лента по всем базам, новые посты первыми.
+
+    ``key`` должен давать (pub_date, pk) для элемента queryset, для
+    ``values_list('pub_date', 'pk')`` это ``None``.
+    """
+    if not is_enabled():
+        return queryset
+    return MergedFeed(
+        [part.order_by(*MERGE_ORDER) for part in each(queryset)], key
+    )
+
+
+def aggregate(queryset, **aggregates):
+    """aggregate() по всем базам; поддерживаются Count, Sum, Max и Min."""
+    if not is_enabled():
+        return queryset.aggregate(**aggregates)
+    results = [part.aggregate(**aggregates) for part in each(queryset)]
+    combined = {}
+    for name, function in aggregates.items():
+        values = [result[name] for result in results
+                  if result[name] is not None]
+        combined[name] = COMBINE[function.name](values) if values else None
+    return combined
+
+
+def instance_author(instance):
+    if isinstance(instance, (Post, Follow, ArchivedPost)):
+        return instance.author_id
+    if isinstance(instance, Comment):
+        if Comment.post.is_cached(instance):
+            return instance.post.author_id
+        return post_author(instance.post_id)
+    return None
+
+
+class ShardRouter:
+    """Запросы с объектом-подсказкой — в шард автора этого объекта.
+
+    Справочники через пост (``post.tags``, ``post.mentions``) тоже
+    читаются из шарда: там и связи, и копии строк справочника.
+    """
+
+    def shard(self, model, instance, for_write=False):
+        if not is_enabled():
+            return None
+        if model not in SHARDED_MODELS and (
+            for_write or model not in REFERENCE_MODELS
+        ):
+            return None
+        author_id = instance_author(instance)
+        if author_id is None:
+            return None
+        shard = author_shard(author_id, for_write)
+        return None if shard == DEFAULT_DB_ALIAS else shard
+
+    def db_for_read(self, model, **hints):
+        return self.shard(model, hints.get('instance'))
+
+    def db_for_write(self, model, **hints):
+        return self.shard(model, hints.get('instance'), for_write=True)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Справочники есть в каждом шарде, поэтому пост из шарда может
+        # ссылаться на пользователя, загруженного из основной базы.
+        shards = set(settings.DATABASE_SHARDS)
+        if shards & {obj1._state.db, obj2._state.db}:
+            return True
+        return None
+
+
+def reset_sequence(model, using=DEFAULT_DB_ALIAS):
+    """Сдвигает последовательность PostgreSQL после явных id."""
+    connection = connections[using]
+    statements = connection.ops.sequence_reset_sql(no_style(), [model])
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def allocate_post_id(author_id):
+    """Id нового поста, единственный среди всех баз."""
+    directory = PostAuthor.objects.using(DEFAULT_DB_ALIAS)
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        if directory.exists():
+            return directory.create(author_id=author_id).pk
+        # Первый пост после включения шардов: id продолжают посты,
+        # созданные до этого.
+        entry = directory.create(pk=next_post_id(), author_id=author_id)
+        reset_sequence(PostAuthor)
+        return entry.pk
+
+
+def next_post_id():
+    """Первый id поста, не занятый ни в одной базе и не выданный PostAuthor.
+
+    От него пишут посты с заранее назначенными id (generate_dataset);
+    такие посты нужно занести в справочник через ``register_posts``.
+    """
+    tops = [PostAuthor.objects.using(DEFAULT_DB_ALIAS).aggregate(
+        top=Max('pk')
+    )['top']]
+    for db in databases():
+        for model in (Post, ArchivedPost):
+            tops.append(
+                model.objects.using(db).aggregate(top=Max('pk'))['top']
+            )
+    return max(filter(None, tops), default=0) + 1
+
+
+def register_posts(posts):
+    """Заносит посты в справочник PostAuthor.
+
+    Если id уже записан за другим автором, два поста в разных базах
+    делят один id, и ни один из них нельзя будет надёжно открыть:
+    вместо того чтобы молча оставить прежнего автора, поднимает
+    PostIdConflict.
+    """
+    authors = {post.pk: post.author_id for post in posts}
+    ids = sorted(authors)
+    directory = PostAuthor.objects.using(DEFAULT_DB_ALIAS)
+    known = {}
+    for start in range(0, len(ids), BATCH_SIZE):
+        known.update(directory.filter(
+            pk__in=ids[start:start + BATCH_SIZE]
+        ).values_list('pk', 'author_id'))
+    conflicts = [pk for pk, author_id in known.items()
+                 if authors[pk] != author_id]
+    if conflicts:
+        raise PostIdConflict(
+            f'Id постов уже принадлежат другим авторам: '
+            f'{", ".join(map(str, sorted(conflicts)[:10]))}'
+        )
+    directory.bulk_create(
+        [PostAuthor(pk=pk, author_id=authors[pk])
+         for pk in ids if pk not in known],
+        batch_size=BATCH_SIZE
+    )
+    reset_sequence(PostAuthor)
+
+
+def assign(author_id):
+    """Назначает шард новому автору."""
+    shards = settings.DATABASE_SHARDS
+    AuthorShard.objects.using(DEFAULT_DB_ALIAS).get_or_create(
+        author_id=author_id,
+        defaults={'shard': shards[author_id % len(shards)]}
+    )
+
+
+def reference_fields(model):
+    return [field for field in model._meta.concrete_fields
+            if not field.primary_key]
+
+
+def replicate(instance, delete=False):
+    """Повторяет в шардах изменение строки справочника."""
+    model = type(instance)
+    for shard in settings.DATABASE_SHARDS:
+        rows = model._base_manager.using(shard)
+        if delete:
+            rows.filter(pk=instance.pk).delete()
+            continue
+        rows.update_or_create(pk=instance.pk, defaults={
+            field.attname: getattr(instance, field.attname)
+            for field in reference_fields(model)
+        })
+
+
+def copy_reference(objs):
+    """Добавляет в шарды строки справочника, созданные bulk_create."""
+    objs = list(objs)
+    if not objs:
+        return
+    manager = type(objs[0])._base_manager
+    for shard in settings.DATABASE_SHARDS:
+        manager.using(shard).bulk_create(objs, ignore_conflicts=True)
+
+
+def sync_reference(shard):
+    """Приводит справочники шарда к основной базе (без удалений)."""
+    for model in REFERENCE_MODELS:
+        manager = model._base_manager
+        rows = list(manager.using(DEFAULT_DB_ALIAS).order_by('pk'))
+        target = manager.using(shard)
+        existing = set(target.values_list('pk', flat=True))
+        target.bulk_create(
+            [row for row in rows if row.pk not in existing],
+            batch_size=BATCH_SIZE
+        )
+        target.bulk_update(
+            [row for row in rows if row.pk in existing],
+            [field.name for field in reference_fields(model)],
+            batch_size=BATCH_SIZE
+        )
+
+
+def set_location(author_id, shard, moving=False):
+    AuthorShard.objects.using(DEFAULT_DB_ALIAS).update_or_create(
+        author_id=author_id, defaults={'shard': shard, 'moving': moving}
+    )
+
+
+def detached(rows):
+    """Строки без id для вставки в другую базу с новыми id."""
+    rows = list(rows)
+    for row in rows:
+        row.pk = None
+    return rows
+
+
+def delete_author(author_id, db):
+    """Удаляет данные автора из базы, возвращает id их групп."""
+    posts = Post.objects.using(db).filter(author_id=author_id)
+    group_ids = set(posts.values_list('group_id', flat=True))
+    Follow.objects.using(db).filter(author_id=author_id).delete()
+    ArchivedPost.objects.using(db).filter(author_id=author_id).delete()
+    posts.delete()
+    return group_ids
+
+
+def copy_author(author_id, source, target):
+    """Копирует данные автора из source в target поверх прежних.
+
+    Посты и архивные посты сохраняют id и до копирования заносятся
+    в PostAuthor (PostIdConflict, если id занят чужим постом),
+    у комментариев, подписок и связей с тегами в target будут свои id.
+    Возвращает число строк по моделям.
+    """
+    posts = list(Post.objects.using(source).filter(author_id=author_id))
+    archived = list(
+        ArchivedPost.objects.using(source).filter(author_id=author_id)
+    )
+    register_posts([*posts, *archived])
+    copied = Counter(post=len(posts), archivedpost=len(archived))
+    with dataset.explicit_dates(), transaction.atomic(using=target):
+        delete_author(author_id, target)
+        Post.objects.using(target).bulk_create(posts, batch_size=BATCH_SIZE)
+        ArchivedPost.objects.using(target).bulk_create(
+            archived, batch_size=BATCH_SIZE
+        )
+        for model, rows in (
+            (Post.tags.through, Post.tags.through.objects.filter(
+                post__author_id=author_id)),
+            (Post.mentions.through, Post.mentions.through.objects.filter(
+                post__author_id=author_id)),
+            (Comment, Comment.objects.filter(post__author_id=author_id)),
+            (Follow, Follow.objects.filter(author_id=author_id)),
+        ):
+            rows = detached(rows.using(source))
+            model.objects.using(target).bulk_create(
+                rows, batch_size=BATCH_SIZE
+            )
+            copied[model._meta.model_name] = len(rows)
+    return copied
+
+
+def move_authors(moves, grace=None):
+    """Переносит авторов между базами, не останавливая сайт.
+
+    ``moves`` — {id автора: база}. Запись для переносимых авторов
+    отклоняется (ShardMoving), пока их данные копируются; чтение идёт
+    из старой базы до переключения карты. ``grace`` секунд после
+    каждого изменения карты ждём, пока его увидят все процессы
+    (карта читается через кэш запросов) и закончатся начатые записи.
+    """
+    from .feeds import drop_group_windows
+    grace = settings.SHARD_MOVE_GRACE if grace is None else grace
+    sources = {author_id: author_shard(author_id)
+               for author_id in moves}
+    moves = {author_id: target for author_id, target in moves.items()
+             if sources[author_id] != target}
+    for author_id in moves:
+        set_location(author_id, sources[author_id], moving=True)
+    try:
+        time.sleep(grace)
+        copied = Counter()
+        for author_id, target in moves.items():
+            copied += copy_author(author_id, sources[author_id], target)
+    except BaseException:
+        for author_id in moves:
+            set_location(author_id, sources[author_id])
+        raise
+    for author_id, target in moves.items():
+        set_location(author_id, target)
+    time.sleep(grace)
+    group_ids = set()
+    for author_id in moves:
+        group_ids |= delete_author(author_id, sources[author_id])
+    drop_group_windows(group_ids)
+    return copied
+
+
+def plan(authors, shards):
+    """Переезды, выравнивающие число постов в шардах.
+
+    ``authors`` — {id автора: (база, число постов)}. Авторы не из
+    шардов переезжают все, начиная с самых плодовитых, в наименее
+    загруженный шард. Затем авторы переезжают из самого загруженного
+    шарда в самый свободный, пока это сокращает разрыв между ними.
+    Возвращает {id автора: шард}.
+    """
+    loads = dict.fromkeys(shards, 0)
+    placed = {shard: {} for shard in shards}
+    for author_id, (db, count) in authors.items():
+        if db in loads:
+            loads[db] += count
+            placed[db][author_id] = count
+    moves = {}
+    legacy = sorted(
+        ((count, author_id) for author_id, (db, count) in authors.items()
+         if db not in loads),
+        reverse=True
+    )
+    for count, author_id in legacy:
+        target = min(shards, key=loads.get)
+        moves[author_id] = target
+        loads[target] += count
+        placed[target][author_id] = count
+    while len(shards) > 1:
+        busiest = max(shards, key=loads.get)
+        idlest = min(shards, key=loads.get)
+        gap = loads[busiest] - loads[idlest]
+        candidates = [(count, author_id)
+                      for author_id, count in placed[busiest].items()
+                      if 0 < count < gap]
+        if not candidates:
+            break
+        count, author_id = min(
+            candidates, key=lambda candidate: abs(gap - 2 * candidate[0])
+        )
+        del placed[busiest][author_id]
+        placed[idlest][author_id] = count
+        loads[busiest] -= count
+        loads[idlest] += count
+        moves[author_id] = idlest
+    return moves
@@ -0,0 +1,133 @@
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import (m2m_changed, post_delete, post_init,
+                                      post_save, pre_save)
+from django.dispatch import receiver
+
+from core.page_cache import purge
+
+from .cache_keys import (FEED_KEY, author_key, follow_feed_key, follow_key,
+                         group_key, mentions_key, post_key, tag_key)
+from .feeds import drop_group_windows, update_group_window
+from . import shards
+from .models import Comment, Follow, Group, Post, Tag, User
+
+
+@receiver(post_init, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    instance._initial_group_id = instance.group_id
+
+
+def post_keys(post, created=False):
+    keys = [post_key(post.pk), author_key(post.author_id)]
+    group_ids = {post.group_id, getattr(post, '_initial_group_id', None)}
+    keys.extend(group_key(pk) for pk in group_ids if pk)
+    if created:
+        keys.append(FEED_KEY)
+    return keys
+
+
+def update_group_windows(post, created):
+    old_group_id = None if created else post._initial_group_id
+    if old_group_id == post.group_id:
+        return
+    if old_group_id:
+        update_group_window(old_group_id, post, add=False)
+    if post.group_id:
+        update_group_window(post.group_id, post, add=True)
+
+
+@receiver(pre_save, sender=Post)
+def allocate_post_id(sender, instance, raw, **kwargs):
+    if instance.pk is None and not raw and shards.is_enabled():
+        instance.pk = shards.allocate_post_id(instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def purge_saved_post(sender, instance, created, **kwargs):
+    purge(*post_keys(instance, created=created))
+    update_group_windows(instance, created)
+    instance._initial_group_id = instance.group_id
+
+
+@receiver(post_delete, sender=Post)
+def purge_deleted_post(sender, instance, **kwargs):
+    purge(*post_keys(instance, created=True))
+    if instance.group_id:
+        update_group_window(instance.group_id, instance, add=False)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def purge_comment(sender, instance, **kwargs):
+    purge(post_key(instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def purge_follow(sender, instance, **kwargs):
+    purge(follow_key(instance.user_id), follow_feed_key(instance.user_id))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def purge_group(sender, instance, **kwargs):
+    purge(group_key(instance.pk))
+
+
+@receiver(post_save, sender=User)
+def purge_author(sender, instance, created, update_fields=None, **kwargs):
+    # У нового пользователя ещё нет страниц, а вход сохраняет только
+    # last_login, которого на страницах нет.
+    if created or update_fields and set(update_fields) <= {'last_login'}:
+        return
+    purge(author_key(instance.pk))
+
+
+@receiver(post_delete, sender=Group)
+def drop_deleted_group_window(sender, instance, **kwargs):
+    drop_group_windows([instance.pk])
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def purge_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        names = [instance.name]
+    elif action == 'pre_clear':
+        names = instance.tags.values_list('name', flat=True)
+    else:
+        names = Tag.objects.filter(pk__in=pk_set).values_list(
+            'name', flat=True
+        )
+    purge(*map(tag_key, names))
+
+
+@receiver(m2m_changed, sender=Post.mentions.through)
+def purge_mentions(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        pk_set = [instance.pk]
+    elif action == 'pre_clear':
+        pk_set = instance.mentions.values_list('pk', flat=True)
+    purge(*map(mentions_key, pk_set))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Group)
+@receiver(post_save, sender=Tag)
+def replicate_reference(sender, instance, created, using, **kwargs):
+    if using != DEFAULT_DB_ALIAS or not shards.is_enabled():
+        return
+    shards.replicate(instance)
+    if created and sender is User:
+        shards.assign(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Tag)
+def replicate_reference_delete(sender, instance, using, **kwargs):
+    if using == DEFAULT_DB_ALIAS and shards.is_enabled():
+        shards.replicate(instance, delete=True)
@@ -0,0 +1,44 @@
+from django import template
+from django.urls import reverse
+from django.utils.html import conditional_escape
+from django.utils.safestring import mark_safe
+
+from core.page_cache import get_versions
+
+from ..cache_keys import author_key
+from ..utils import MENTION_RE, TAG_RE
+
+register = template.Library()
+
+
+def tag_link(match):
+    name = match.group(1)
+    url = reverse('posts:tag_list', args=[name.lower()])
+    return f'<a href="{url}">#{name}</a>'
+
+
+def mention_link(match):
+    username = match.group(1).rstrip('.')
+    tail = match.group(1)[len(username):]
+    url = reverse('posts:profile', args=[username])
+    return f'<a href="{url}">@{username}</a>{tail}'
+
+
+@register.filter(needs_autoescape=True)
+def linkify(text, autoescape=True):
+    """Превращает #теги и @упоминания в тексте поста в ссылки."""
+    if autoescape:
+        text = conditional_escape(text)
+    text = TAG_RE.sub(tag_link, text)
+    return mark_safe(MENTION_RE.sub(mention_link, text))
+
+
+@register.filter
+def author_version(post):
+    """Токен версии автора поста для ключа кэша карточки.
+
+    В карточке выводится имя автора, и после его изменения ключ должен
+    смениться так же, как меняются валидаторы страниц с author_key.
+    """
+    key = author_key(post.author_id)
+    return get_versions([key], create=True)[key]
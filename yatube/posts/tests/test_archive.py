@@ -0,0 +1,134 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models.query import QuerySet
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from core.tests.mixins import CacheClearMixin
+from posts import archive
+from posts.models import ArchivedPost, Comment, Post, User
+
+OLD_POSTS = 5
+NEW_POSTS = 8
+
+
+class ArchiveTest(CacheClearMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        posts = [
+            Post.objects.create(author=cls.author, text=f'Пост {number}')
+            for number in range(OLD_POSTS + NEW_POSTS)
+        ]
+        now = timezone.now()
+        for number, post in enumerate(posts):
+            age = 1000 - number if number < OLD_POSTS else 10 - number / 10
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=now - timedelta(days=age)
+            )
+        cls.old = posts[0]
+        Comment.objects.create(post=cls.old, author=cls.reader,
+                               text='Старый комментарий')
+        cls.cutoff = now - timedelta(days=365)
+
+    def test_moves_old_posts_with_comments(self):
+        """Старые посты переносятся в архив с комментариями."""
+        total = archive.archive_posts(self.cutoff, batch_size=2)
+        self.assertEqual(total['posts'], OLD_POSTS)
+        self.assertEqual(total['comments'], 1)
+        self.assertEqual(Post.objects.count(), NEW_POSTS)
+        self.assertFalse(Comment.objects.exists())
+        archived = ArchivedPost.objects.get(pk=self.old.pk)
+        self.assertEqual(archive.decompress(archived.text), 'Пост 0')
+        self.assertEqual(
+            [(comment.author, comment.text)
+             for comment in archive.get_comments(archived)],
+            [(self.reader, 'Старый комментарий')]
+        )
+
+    def test_runs_incrementally(self):
+        """Архивация идёт пачками и продолжается с места."""
+        first = archive.archive_posts(self.cutoff, batch_size=2,
+                                      max_batches=1)
+        self.assertEqual(first['posts'], 2)
+        self.assertTrue(ArchivedPost.objects.filter(pk=self.old.pk).exists())
+        out = StringIO()
+        call_command('archive_posts', '--days', '365', stdout=out)
+        self.assertIn('постов: 3', out.getvalue())
+        self.assertEqual(ArchivedPost.objects.count(), OLD_POSTS)
+
+    def test_post_detail_reads_archive(self):
+        """Страница поста показывает архив без формы ответа."""
+        archive.archive_posts(self.cutoff, batch_size=10)
+        self.client.force_login(self.author)
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.old.pk])
+        )
+        self.assertContains(response, 'Пост 0')
+        self.assertContains(response, 'Старый комментарий')
+        self.assertNotContains(response, 'Добавить комментарий')
+        self.assertEqual(response.context['author_posts'],
+                         OLD_POSTS + NEW_POSTS)
+        response = self.client.post(
+            reverse('posts:add_comment', args=[self.old.pk]), {'text': 'Ещё'}
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_missing_post(self):
+        """Поста нет ни в ленте, ни в архиве — ответ 404."""
+        response = self.client.get(reverse('posts:post_detail', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_profile_continues_into_archive(self):
+        """Профиль листается из живых постов в архив."""
+        expected = [post.pk for post in Post.objects.filter(
+            author=self.author
+        ).order_by('-pub_date', '-pk')]
+        archive.archive_posts(self.cutoff, batch_size=10)
+        url = reverse('posts:profile', args=['author'])
+        pages = [self.client.get(url, {'page': page}).context['page_obj']
+                 for page in (1, 2)]
+        self.assertEqual(pages[0].paginator.count, OLD_POSTS + NEW_POSTS)
+        self.assertEqual([post.pk for page in pages for post in page],
+                         expected)
+
+    def test_archived_post_has_own_etag(self):
+        """У поста в архиве свой ETag, и он работает."""
+        url = reverse('posts:post_detail', args=[self.old.pk])
+        live_etag = self.client.get(url)['ETag']
+        archive.archive_posts(self.cutoff, batch_size=10)
+        etag = self.client.get(url)['ETag']
+        self.assertNotEqual(etag, live_etag)
+        self.assertFalse(etag.startswith('"0-'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def feed(self):
+        return archive.with_archived(
+            Post.objects.filter(author=self.author),
+            ArchivedPost.objects.filter(author=self.author),
+        )
+
+    def test_profile_feed_without_archive_is_queryset(self):
+        """Без архива лента профиля — обычный QuerySet."""
+        self.assertIsInstance(self.feed(), QuerySet)
+
+    def test_profile_feed_chains_older_archive(self):
+        """Архив старше ленты пристраивается следом за ней."""
+        expected = [post.pk for post in Post.objects.filter(
+            author=self.author
+        ).order_by('-pub_date', '-pk')]
+        archive.archive_posts(self.cutoff, batch_size=10)
+        feed = self.feed()
+        self.assertIsInstance(feed, archive.ChainedFeed)
+        self.assertEqual(feed.count(), OLD_POSTS + NEW_POSTS)
+        with self.assertNumQueries(1):
+            self.assertEqual([post.pk for post in feed[2:5]], expected[2:5])
+        self.assertEqual([post.pk for post in feed[NEW_POSTS - 2:]],
+                         expected[NEW_POSTS - 2:])
+        self.assertEqual(feed[NEW_POSTS].pk, expected[NEW_POSTS])
@@ -0,0 +1,85 @@
+import json
+import os
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from core.tests.mixins import TempDirMixin
+from posts import benchmarks
+from posts.models import Comment
+
+VIEWS = {'index', 'group_posts', 'profile', 'post_detail', 'follow_index',
+         'add_comment'}
+
+
+class BenchmarkViewsTest(TempDirMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'generate_dataset', '--users', '20', '--groups', '3',
+            '--posts', '100', '--comments', '100', '--max-follows', '5',
+            stdout=StringIO()
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.baseline = os.path.join(self.directory, 'baseline.json')
+
+    def test_scenarios(self):
+        """Сценарии покрывают все замеряемые view."""
+        scenarios = benchmarks.scenarios()
+        self.assertEqual({scenario.name for scenario in scenarios}, VIEWS)
+
+    def test_measure(self):
+        """Замер выполняет прогрев и запросы и считает метрики."""
+        scenario = next(scenario for scenario in benchmarks.scenarios()
+                        if scenario.name == 'add_comment')
+        comments = Comment.objects.count()
+        result = benchmarks.measure(scenario, requests=3, warmup=1)
+        self.assertEqual(Comment.objects.count(), comments + 5)
+        self.assertEqual(result['requests'], 3)
+        self.assertGreater(result['queries'], 0)
+        self.assertGreater(result['peak_kib'], 0)
+        self.assertLessEqual(result['p50'], result['max'])
+
+    def test_compare(self):
+        """Сравнение находит регрессии сверх допуска."""
+        old = {'p50': 10, 'p90': 20, 'peak_kib': 100, 'queries': 5}
+        baseline = {'100': {'index': old}}
+        same = {'100': {'index': dict(old, p50=11)}}
+        self.assertEqual(benchmarks.compare(baseline, same, 0.2), [])
+        worse = {'100': {'index': dict(old, p90=30, queries=6)},
+                 '1000': {'index': dict(old, p50=1000)}}
+        self.assertEqual(benchmarks.compare(baseline, worse, 0.2), [
+            '100 index p90: 20 -> 30',
+            '100 index queries: 5 -> 6',
+        ])
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command('benchmark_views', '--in-place', '--sizes', '100',
+                     '--requests', '2', '--warmup', '1',
+                     '--baseline', self.baseline, *args, stdout=out)
+        return out.getvalue()
+
+    def test_command_saves_and_checks_baseline(self):
+        """Команда сохраняет базовую линию и ловит регрессию."""
+        self.run_command('--save')
+        with open(self.baseline) as file:
+            saved = json.load(file)
+        self.assertEqual(set(saved['sizes']['100']), VIEWS)
+        saved['sizes']['100']['index']['queries'] = 0
+        with open(self.baseline, 'w') as file:
+            json.dump(saved, file)
+        with self.assertRaisesMessage(CommandError, '100 index queries'):
+            self.run_command()
+
+    def test_in_place_run_keeps_site_cache(self):
+        """Прогон на месте не трогает кэш сайта."""
+        cache.set('site-key', 'value')
+        self.run_command('--save')
+        self.assertEqual(cache.get('site-key'), 'value')
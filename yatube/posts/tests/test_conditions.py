@@ -0,0 +1,102 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='test_group',
+            slug='test-slug',
+            description='test_description'
+        )
+        cls.post = Post.objects.create(
+            text='test_post',
+            author=cls.author,
+            group=cls.group
+        )
+        cls.urls = (
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.pk}),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_matching_etag_returns_304(self):
+        """При совпадении ETag страница не отрисовывается заново."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertTrue(response.has_header('Last-Modified'))
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED
+                )
+                self.assertEqual(response.templates, [])
+
+    def test_changes_invalidate_etag(self):
+        """Новый комментарий и правка поста меняют ETag."""
+        etags = {url: self.guest_client.get(url)['ETag'] for url in self.urls}
+        Comment.objects.create(
+            post=self.post, author=self.author, text='comment'
+        )
+        self.post.text = 'edited'
+        self.post.save()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_group_and_author_changes_invalidate_etag(self):
+        """Правка группы и имени автора меняет ETag страниц с ними."""
+        changes = (
+            (lambda: Group.objects.filter(pk=self.group.pk).get().save(),
+             self.urls[:2]),
+            (lambda: User.objects.filter(pk=self.author.pk).get().save(),
+             (self.urls[0], self.urls[2])),
+        )
+        for change, urls in changes:
+            responses = {url: self.guest_client.get(url) for url in urls}
+            change()
+            for url, old in responses.items():
+                with self.subTest(url=url):
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=old['ETag'],
+                    )
+                    self.assertEqual(response.status_code, HTTPStatus.OK)
+                    self.assertNotEqual(response['ETag'], old['ETag'])
+
+    def test_author_rename_refreshes_post_cards(self):
+        """Карточки постов на странице автора показывают его новое имя."""
+        url = self.urls[2]
+        self.guest_client.get(url)
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name = 'Новое'
+        author.last_name = 'Имя'
+        author.save()
+        self.assertContains(self.guest_client.get(url), 'Автор: Новое Имя')
+
+    def test_etag_depends_on_user(self):
+        """Авторизованный пользователь получает собственный ETag."""
+        url = self.urls[0]
+        etag = self.guest_client.get(url)['ETag']
+        author_client = Client()
+        author_client.force_login(self.author)
+        response = author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertFalse(response.has_header('Last-Modified'))
@@ -0,0 +1,97 @@
+import random
+from collections import Counter
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import Count, F
+from django.test import TestCase
+from django.utils import timezone
+
+from posts import dataset
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class GenerateDatasetTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.existing = User.objects.create_user(username='existing')
+        call_command(
+            'generate_dataset', '--users', '50', '--groups', '5',
+            '--posts', '1000', '--comments', '500', '--max-follows', '10',
+            '--days', '30', '--batch-size', '300', stdout=StringIO()
+        )
+
+    def test_counts(self):
+        """Создано столько строк, сколько запрошено."""
+        self.assertEqual(User.objects.count(), 51)
+        self.assertEqual(Group.objects.count(), 5)
+        self.assertEqual(Post.objects.count(), 1000)
+        self.assertEqual(Comment.objects.count(), 500)
+        self.assertTrue(Follow.objects.exists())
+
+    def test_existing_rows_are_kept(self):
+        """Существующие пользователи не меняются и без постов."""
+        self.assertTrue(User.objects.filter(pk=self.existing.pk,
+                                            username='existing').exists())
+        self.assertFalse(Post.objects.filter(author=self.existing).exists())
+
+    def test_authors_are_skewed(self):
+        """Посты распределены по авторам неравномерно."""
+        counts = sorted(
+            User.objects.annotate(total=Count('posts'))
+            .values_list('total', flat=True),
+            reverse=True
+        )
+        self.assertGreater(counts[0], 10 * counts[len(counts) // 2])
+
+    def test_dates_grow_with_id(self):
+        """Даты постов растут с id и не уходят в будущее."""
+        dates = list(Post.objects.order_by('pk')
+                     .values_list('pub_date', flat=True))
+        self.assertEqual(dates, sorted(dates))
+        self.assertLess(timezone.now() - dates[0], timedelta(days=31))
+        self.assertFalse(Post.objects.filter(
+            pub_date__gt=timezone.now()
+        ).exists())
+
+    def test_comments_follow_posts(self):
+        """Комментарий не старше своего поста."""
+        self.assertFalse(Comment.objects.filter(
+            created__lt=F('post__pub_date')
+        ).exists())
+
+    def test_follows(self):
+        """Подписки без повторов и без подписки на себя."""
+        pairs = list(Follow.objects.values_list('user_id', 'author_id'))
+        self.assertEqual(len(pairs), len(set(pairs)))
+        self.assertFalse(any(user == author for user, author in pairs))
+
+    def test_new_rows_get_next_ids(self):
+        """Новые строки после генерации получают свежие id."""
+        post = Post.objects.create(author=self.existing, text='Новый пост')
+        self.assertGreater(post.pk, 1000)
+        self.assertAlmostEqual(post.pub_date, timezone.now(),
+                               delta=timedelta(minutes=1))
+
+
+class TimelineTest(TestCase):
+
+    def test_bursts(self):
+        """Публикации идут всплесками, а не равномерно."""
+        timeline = dataset.Timeline(timezone.now(), 100, seed=1)
+        hours = Counter(
+            int((timeline.at(index, 10000) - timeline.start)
+                / timedelta(hours=1))
+            for index in range(10000)
+        )
+        busiest = hours.most_common(1)[0][1]
+        self.assertGreater(busiest, 5 * 10000 / (100 * 24))
+
+    def test_skewed(self):
+        """skewed чаще выдаёт первые номера."""
+        rng = random.Random(0)
+        ranks = Counter(dataset.skewed(rng, 1000) for _ in range(10000))
+        self.assertTrue(all(0 <= rank < 1000 for rank in ranks))
+        self.assertGreater(ranks[0], 20 * ranks[500])
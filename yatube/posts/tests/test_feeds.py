@@ -0,0 +1,219 @@
+import time
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core import stale_cache
+from core.tests.mixins import CacheClearMixin
+from posts import shards
+from posts.feeds import get_group_window, group_window_key
+from posts.models import Follow, Group, Post
+
+User = get_user_model()
+
+FIRST_PAGE_RECORDS = 10
+SECOND_PAGE_RECORDS = 3
+
+
+class FollowFeedCacheTest(CacheClearMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.stranger = User.objects.create_user(username='stranger')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Post.objects.bulk_create(
+            Post(author=cls.author, text=f'Пост {number}')
+            for number in range(FIRST_PAGE_RECORDS + SECOND_PAGE_RECORDS)
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def get_feed(self, page=1):
+        return self.client.get(
+            reverse('posts:follow_index'), {'page': page}
+        ).context['page_obj']
+
+    def test_cached_pages(self):
+        """Повторный показ страницы не пересчитывает ленту."""
+        for page, records in ((1, FIRST_PAGE_RECORDS),
+                              (2, SECOND_PAGE_RECORDS)):
+            with self.subTest(page=page):
+                first = self.get_feed(page)
+                with mock.patch('posts.feeds.paginate') as paginate:
+                    second = self.get_feed(page)
+                paginate.assert_not_called()
+                self.assertEqual(len(second), records)
+                self.assertEqual(list(second), list(first))
+                self.assertEqual(second.paginator.count, 13)
+
+    def test_new_post_by_followed_author(self):
+        """Новый пост автора из подписок сразу в ленте."""
+        self.get_feed()
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(self.get_feed()[0], post)
+
+    def test_post_by_stranger_keeps_cache(self):
+        """Пост чужого автора не сбрасывает ленту."""
+        self.get_feed()
+        Post.objects.create(author=self.stranger, text='Чужой пост')
+        with mock.patch('posts.feeds.paginate') as paginate:
+            self.get_feed()
+        paginate.assert_not_called()
+
+    def test_follow_and_unfollow_reset_feed(self):
+        """Подписка и отписка меняют ленту."""
+        self.get_feed()
+        Post.objects.create(author=self.stranger, text='Чужой пост')
+        Follow.objects.create(user=self.reader, author=self.stranger)
+        self.assertEqual(self.get_feed().paginator.count, 14)
+        Follow.objects.filter(user=self.reader).delete()
+        self.assertEqual(self.get_feed().paginator.count, 0)
+
+    def test_edited_post_is_fresh(self):
+        """Исправленный пост виден в ленте сразу."""
+        self.get_feed()
+        post = Post.objects.filter(author=self.author).first()
+        post.text = 'Исправленный текст'
+        post.save()
+        self.assertEqual(self.get_feed()[0].text, 'Исправленный текст')
+
+    def test_post_does_not_fan_out(self):
+        """Публикация не трогает ленты подписчиков по одной."""
+        User.objects.bulk_create(
+            User(username=f'follower-{number}') for number in range(25)
+        )
+        Follow.objects.bulk_create(
+            Follow(user=user, author=self.author)
+            for user in User.objects.filter(username__startswith='follower')
+        )
+        with mock.patch('core.page_cache.cache.set_many') as set_many:
+            Post.objects.create(author=self.author, text='Новый пост')
+        written = [key for call in set_many.call_args_list
+                   for key in call.args[0]]
+        self.assertFalse(any('follow-feed' in key for key in written))
+
+    def test_bench_command(self):
+        """Замер ленты подписок убирает за собой данные."""
+        out = StringIO()
+        call_command('bench_follow_feed', '--follows', '5',
+                     '--followers', '5', '--repeat', '1', stdout=out)
+        self.assertIn('Ключ ленты при 5 подписках', out.getvalue())
+        self.assertFalse(User.objects.filter(
+            username__startswith='bench-'
+        ).exists())
+
+
+class GroupWindowTest(CacheClearMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа', slug='other', description='Описание'
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.author, group=cls.group, text=f'Пост {number}')
+            for number in range(FIRST_PAGE_RECORDS + SECOND_PAGE_RECORDS)
+        )
+
+    def get_page(self, page=1, slug='group'):
+        return self.client.get(
+            reverse('posts:group_list', args=[slug]), {'page': page}
+        ).context['page_obj']
+
+    def window_ids(self, group):
+        window = cache.get(group_window_key(group.pk))
+        return window['count'], [pk for _, pk in window['posts']]
+
+    def expected_ids(self, group):
+        posts = Post.objects.filter(group=group).values_list('pk', flat=True)
+        return len(posts), list(posts)
+
+    def test_pages_match_database(self):
+        """Страницы группы совпадают с выборкой из базы."""
+        expected = list(Post.objects.filter(group=self.group))
+        first, second = self.get_page(1), self.get_page(2)
+        self.assertEqual(list(first) + list(second), expected)
+        self.assertEqual(second.paginator.count, len(expected))
+
+    def test_window_is_updated_on_write(self):
+        """Список правится на месте, а не строится заново."""
+        get_group_window(self.group.pk)
+        get_group_window(self.other_group.pk)
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Новый'
+        )
+        self.assertEqual(self.window_ids(self.group)[1][0], post.pk)
+        post.group = self.other_group
+        post.save()
+        Post.objects.filter(group=self.group).first().delete()
+        with self.assertNumQueries(0):
+            for group in (self.group, self.other_group):
+                get_group_window(group.pk)
+        for group in (self.group, self.other_group):
+            with self.subTest(group=group.slug):
+                self.assertEqual(
+                    self.window_ids(group), self.expected_ids(group)
+                )
+        self.assertEqual(self.get_page(slug='other')[0], post)
+
+    def test_posts_beyond_window_come_from_database(self):
+        """Посты за пределами окна берутся из базы."""
+        with mock.patch('posts.feeds.GROUP_WINDOW', 5):
+            get_group_window(self.group.pk)
+            Post.objects.filter(group=self.group).last().delete()
+            self.assertEqual(
+                list(self.get_page(2)),
+                list(Post.objects.filter(group=self.group)[10:])
+            )
+
+    def test_bulk_changes_drop_window(self):
+        """Массовые изменения сбрасывают окно группы."""
+        get_group_window(self.group.pk)
+        Post.objects.bulk_create([
+            Post(author=self.author, group=self.group, text='Пачкой')
+        ])
+        self.assertIsNone(cache.get(group_window_key(self.group.pk)))
+        get_group_window(self.group.pk)
+        Post.objects.filter(group=self.group).update(group=None)
+        self.assertIsNone(cache.get(group_window_key(self.group.pk)))
+
+    def test_busy_lock_does_not_block_write(self):
+        """Занятая блокировка окна не задерживает запись."""
+        get_group_window(self.group.pk)
+        stale_cache.acquire(group_window_key(self.group.pk))
+        started = time.monotonic()
+        Post.objects.create(author=self.author, group=self.group,
+                            text='Новый')
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertIsNone(cache.get(group_window_key(self.group.pk)))
+
+    def test_window_built_during_write_is_not_stored(self):
+        """Окно, собранное во время записи, не сохраняется."""
+        merge = shards.merge
+
+        def merge_during_write(*args, **kwargs):
+            if not written:
+                written.append(Post.objects.create(
+                    author=self.author, group=self.group, text='Новый'
+                ))
+            return merge(*args, **kwargs)
+
+        written = []
+        with mock.patch('posts.feeds.shards.merge', merge_during_write):
+            get_group_window(self.group.pk)
+        self.assertIsNone(cache.get(group_window_key(self.group.pk)))
+        get_group_window(self.group.pk)
+        self.assertEqual(self.window_ids(self.group),
+                         self.expected_ids(self.group))
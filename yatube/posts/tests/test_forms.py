@@ -1,22 +1,18 @@
-import shutil
-import tempfile
-
 from django.contrib.auth import get_user_model
-from django.conf import settings
 from django.test import Client, TestCase
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
 
+from core.tests.mixins import TempMediaMixin
 from posts.models import Comment, Group, Post
 
 User = get_user_model()
 
 
-class PostFormTests(TestCase):
+class PostFormTests(TempMediaMixin, TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
-        settings.MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
         cls.author = User.objects.create_user(username='testauthor')
         cls.author_client = Client()
         cls.author_client.force_login(cls.author)
@@ -43,11 +39,6 @@ class PostFormTests(TestCase):
             description='test_description'
         )
 
-    @classmethod
-    def tearDownClass(cls):
-        super().tearDownClass()
-        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
-
     def test_create_post(self):
         """Проверка формы создания нового поста."""
         posts_count = Post.objects.count()
@@ -62,7 +53,7 @@ class PostFormTests(TestCase):
             data=form_data,
             follow=True
         )
-        post = Post.objects.get(id=1)
+        post = Post.objects.get(text='test_new_post')
         self.assertRedirects(response, reverse('posts:profile',
                              args=[PostFormTests.author.username]))
         self.assertEqual(Post.objects.count(), posts_count + 1)
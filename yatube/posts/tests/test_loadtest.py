@@ -0,0 +1,77 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TransactionTestCase
+
+from core.tests.mixins import CacheClearMixin
+from posts import loadtest
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class LoadTestTest(CacheClearMixin, TransactionTestCase):
+    """Запросы идут из пула потоков со своими соединениями."""
+
+    def setUp(self):
+        super().setUp()
+        # TransactionTestCase чистит базу после теста, а не до него.
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(title='Группа', slug='group',
+                                     description='Описание')
+        Post.objects.bulk_create(
+            Post(author=self.author, group=group, text=f'Пост {number}')
+            for number in range(15)
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def test_parse_mix(self):
+        """Смесь разбирается, неизвестные роли и нули отвергаются."""
+        self.assertEqual(loadtest.parse_mix('reader=3, poster=1'),
+                         {'reader': 3, 'poster': 1})
+        for value in ('writer=1', 'reader=0'):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    loadtest.parse_mix(value)
+
+    def test_plan_follows_mix(self):
+        """План содержит только роли смеси, подписчики вошли."""
+        planner = loadtest.Planner(sessions=2)
+        plan = planner.plan(200, {'reader': 1, 'follower': 1})
+        labels = {request.label for request in plan}
+        self.assertIn('posts:follow_index', labels)
+        self.assertNotIn('posts:post_create', labels)
+        followers = [request for request in plan
+                     if request.label == 'posts:follow_index']
+        self.assertTrue(all(request.cookie for request in followers))
+
+    def test_mix_without_data(self):
+        """Смесь без данных в базе — ошибка команды, а не сбой."""
+        Follow.objects.all().delete()
+        with self.assertRaises(ValueError):
+            loadtest.Planner(sessions=2).plan(10, {'follower': 1})
+        with self.assertRaisesMessage(CommandError, '--mix'):
+            call_command('load_test', '--mix', 'follower=1',
+                         '--sessions', '2', stdout=StringIO())
+
+    def test_post_passes_csrf(self):
+        """POST ролей проходит проверку CSRF и пишет в базу."""
+        planner = loadtest.Planner(sessions=2)
+        for role, model in (('poster', Post), ('commenter', Comment)):
+            with self.subTest(role=role):
+                count = model.objects.count()
+                result = loadtest.execute(getattr(planner, role)())
+                self.assertEqual(result.status, 302)
+                self.assertEqual(model.objects.count(), count + 1)
+
+    def test_command(self):
+        """Команда печатает пропускную способность без ошибок."""
+        out = StringIO()
+        call_command('load_test', '--requests', '30', '--concurrency', '3',
+                     '--warmup', '2', '--sessions', '2', stdout=out)
+        report = out.getvalue()
+        self.assertIn('30 запросов', report)
+        self.assertIn('GET posts:index', report)
+        self.assertNotIn('Статусы: 500', report)
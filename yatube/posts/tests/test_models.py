@@ -1,4 +1,7 @@
+from unittest import skipUnless
+
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
 
 from ..models import Group, Post
@@ -53,3 +56,20 @@ class PostModelTest(TestCase):
         expected_object_group = group.title
         self.assertEqual(expected_object_post, str(post))
         self.assertEqual(expected_object_group, str(group))
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Только для PostgreSQL')
+class PostIndexesTest(TestCase):
+    def test_feed_indexes(self):
+        """Ленты идут по b-tree индексам, BRIN по pub_date удалён."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT indexname FROM pg_indexes WHERE tablename = %s",
+                [Post._meta.db_table]
+            )
+            indexes = {row[0] for row in cursor.fetchall()}
+        self.assertNotIn('post_pub_date_brin', indexes)
+        for name in ('post_pub_date_idx', 'post_group_pub_date_idx',
+                     'post_text_search_idx'):
+            with self.subTest(name=name):
+                self.assertIn(name, indexes)
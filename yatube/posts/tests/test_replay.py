@@ -0,0 +1,89 @@
+import json
+import os
+import time
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TransactionTestCase
+from django.urls import reverse
+
+from core import traffic
+from core.tests.mixins import TempDirMixin
+from posts import loadtest
+from posts.models import Follow, Post, User
+
+
+class ReplayTrafficTest(TempDirMixin, TransactionTestCase):
+    """Запросы идут из пула потоков со своими соединениями."""
+
+    def setUp(self):
+        super().setUp()
+        # TransactionTestCase чистит базу после теста, а не до него.
+        User.objects.all().delete()
+        author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=self.reader, author=author)
+        post = Post.objects.create(author=author, text='Тестовый пост')
+        self.log = os.path.join(self.directory, 'traffic.jsonl')
+        now = time.time()
+        # Пост записан в другой базе: id из записи здесь не существует.
+        records = [
+            ('GET', 'posts:index', {}, 'anonymous'),
+            ('GET', 'posts:post_detail',
+             {'post_id': traffic.token(post.pk + 100)}, 'anonymous'),
+            ('GET', 'posts:follow_index', {}, 'user'),
+            ('POST', 'posts:post_create', {}, 'user'),
+            ('GET', 'unresolved', {}, 'anonymous'),
+        ]
+        with open(self.log, 'w') as file:
+            for number, (method, view, kwargs, user) in enumerate(records):
+                file.write(json.dumps({
+                    'ts': now + number * 0.01, 'method': method,
+                    'route': None, 'kwargs': kwargs, 'query': '',
+                    'view': view, 'user': user,
+                    'status': 200, 'duration_ms': 10.0,
+                }) + '\n')
+        self.post = post
+
+    def replay(self, *args):
+        out = StringIO()
+        call_command('replay_traffic', '--log', self.log, '--speed', '0',
+                     '--concurrency', '2', *args, stdout=out)
+        return out.getvalue()
+
+    def test_anonymous_only_without_user(self):
+        """Без --user воспроизводятся только анонимные запросы."""
+        report = self.replay()
+        self.assertIn('Записей: 5, воспроизводится: 2', report)
+        self.assertIn('posts:index', report)
+        self.assertNotIn('posts:follow_index', report)
+
+    def test_logged_in_requests_with_user(self):
+        """С --user повторяются GET вошедших, но не POST."""
+        report = self.replay('--user', 'reader')
+        self.assertIn('воспроизводится: 3', report)
+        self.assertIn('posts:follow_index', report)
+        self.assertNotIn('5xx', report)
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_nothing_replayable(self):
+        """Журнал без подходящих записей — ошибка команды, а не сбой."""
+        with open(self.log) as file:
+            records = [line for line in file if '"anonymous"' not in line]
+        with open(self.log, 'w') as file:
+            file.writelines(records)
+        with self.assertRaisesMessage(CommandError, 'можно воспроизвести'):
+            self.replay()
+
+    def test_route_params_come_from_current_database(self):
+        """Параметры адреса берутся из текущей базы."""
+        substitutes = loadtest.Substitutes()
+        record = {'view': 'posts:post_detail',
+                  'kwargs': {'post_id': traffic.token(12345)}}
+        self.assertEqual(
+            substitutes.path(record),
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        record['kwargs'] = {'unknown': traffic.token(1)}
+        self.assertIsNone(substitutes.path(record))
@@ -0,0 +1,42 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from core.tests.mixins import CacheClearMixin
+from posts.models import Post, User
+from posts.search import search_posts
+from posts.utils import POSTS_COUNT
+
+
+class SearchTest(CacheClearMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.bulk_create(
+            Post(author=cls.author, text=f'Танцы в парке, встреча {number}')
+            for number in range(POSTS_COUNT + 1)
+        )
+        Post.objects.create(author=cls.author, text='Концерт в клубе')
+
+    def test_search_posts(self):
+        """Ищутся посты, содержащие все слова запроса."""
+        posts = Post.objects.all()
+        self.assertEqual(search_posts(posts, 'концерт').count(), 1)
+        self.assertEqual(search_posts(posts, 'танцы парке').count(),
+                         POSTS_COUNT + 1)
+        self.assertFalse(search_posts(posts, 'танцы клубе').exists())
+        self.assertFalse(search_posts(posts, '   ').exists())
+
+    def test_search_page(self):
+        """Страница поиска листается с сохранением запроса."""
+        response = self.client.get(reverse('posts:search'), {'q': 'танцы'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page_obj']), POSTS_COUNT)
+        self.assertContains(response, 'href="?q=%D1%82%D0%B0%D0%BD%D1%86'
+                                      '%D1%8B&amp;page=2"')
+
+    def test_empty_query(self):
+        """Пустой запрос ничего не ищет."""
+        response = self.client.get(reverse('posts:search'))
+        self.assertEqual(len(response.context['page_obj']), 0)
+        self.assertNotContains(response, 'Ничего не найдено')
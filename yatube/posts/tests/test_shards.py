@@ -0,0 +1,362 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core.paginator import Paginator
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.tests.mixins import CacheClearMixin
+from posts import archive, shards
+from posts.models import (ArchivedPost, AuthorShard, Comment, Follow, Group,
+                          Post, PostAuthor, User)
+from posts.utils import save_tags_and_mentions
+
+SHARDS = ['shard1', 'shard2']
+
+
+@override_settings(DATABASE_SHARDS=[])
+class MergedFeedTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.first = User.objects.create_user(username='first')
+        cls.second = User.objects.create_user(username='second')
+        for number in range(7):
+            author = cls.first if number % 3 else cls.second
+            Post.objects.create(author=author, text=f'Пост {number}')
+
+    def feed(self):
+        return shards.MergedFeed([
+            Post.objects.filter(author=author).order_by(*shards.MERGE_ORDER)
+            for author in (self.first, self.second)
+        ])
+
+    def test_pages_follow_publication_order(self):
+        """Слитая лента листается в порядке публикации."""
+        expected = list(Post.objects.order_by(*shards.MERGE_ORDER))
+        paginator = Paginator(self.feed(), 3)
+        self.assertEqual(paginator.count, len(expected))
+        pages = [list(paginator.page(number))
+                 for number in paginator.page_range]
+        self.assertEqual(sum(pages, []), expected)
+
+    def test_in_bulk_reads_every_part(self):
+        """in_bulk находит посты во всех частях ленты."""
+        ids = list(Post.objects.values_list('pk', flat=True))
+        self.assertEqual(set(self.feed().in_bulk(ids)), set(ids))
+
+    def test_disabled(self):
+        """Без шардов помощники возвращают исходный запрос."""
+        posts = Post.objects.all()
+        self.assertIs(shards.merge(posts), posts)
+        self.assertIs(shards.for_post(posts, 1), posts)
+        self.assertEqual(shards.each(posts), [posts])
+
+
+class PlanTest(TestCase):
+
+    def test_legacy_authors_spread_over_shards(self):
+        """Авторы из основной базы расходятся по шардам."""
+        authors = {1: ('default', 10), 2: ('default', 6), 3: ('default', 5)}
+        self.assertEqual(shards.plan(authors, SHARDS),
+                         {1: 'shard1', 2: 'shard2', 3: 'shard2'})
+
+    def test_balances_loaded_shard(self):
+        """С перегруженного шарда переносится автор."""
+        authors = {1: ('shard1', 10), 2: ('shard1', 4), 3: ('shard2', 1)}
+        self.assertEqual(shards.plan(authors, SHARDS), {2: 'shard2'})
+
+    def test_balanced_shards_stay(self):
+        """Ровные шарды ничего не переносят."""
+        authors = {1: ('shard1', 5), 2: ('shard2', 4)}
+        self.assertEqual(shards.plan(authors, SHARDS), {})
+
+
+@override_settings(DATABASE_SHARDS=SHARDS)
+class ShardRouterTest(CacheClearMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        with override_settings(DATABASE_SHARDS=[]):
+            cls.author = User.objects.create_user(username='author')
+            cls.legacy = User.objects.create_user(username='legacy')
+        AuthorShard.objects.create(author=cls.author, shard='shard2')
+
+    def setUp(self):
+        super().setUp()
+        self.router = shards.ShardRouter()
+
+    def test_routes_by_author(self):
+        """Пост, комментарий и подписка идут в шард автора."""
+        post = Post(author=self.author)
+        self.assertEqual(self.router.db_for_read(Post, instance=post),
+                         'shard2')
+        self.assertEqual(
+            self.router.db_for_write(Comment, instance=Comment(post=post)),
+            'shard2'
+        )
+        self.assertEqual(
+            self.router.db_for_write(Follow, instance=Follow(
+                user=self.legacy, author=self.author
+            )),
+            'shard2'
+        )
+
+    def test_leaves_other_queries_to_next_router(self):
+        """Прочие запросы решает следующий роутер."""
+        self.assertIsNone(self.router.db_for_read(Post))
+        self.assertIsNone(
+            self.router.db_for_read(Post, instance=Post(author=self.legacy))
+        )
+        self.assertIsNone(self.router.db_for_write(Group, instance=Post(
+            author=self.author
+        )))
+        self.assertIsNone(self.router.db_for_read(Group, instance=self.author))
+
+    def test_writes_rejected_while_moving(self):
+        """Во время переноса автор читается, но не пишется."""
+        AuthorShard.objects.filter(author=self.author).update(moving=True)
+        post = Post(author=self.author)
+        self.assertEqual(self.router.db_for_read(Post, instance=post),
+                         'shard2')
+        with self.assertRaises(shards.ShardMoving):
+            self.router.db_for_write(Post, instance=post)
+
+
+@override_settings(DATABASE_SHARDS=SHARDS)
+class MovingAuthorViewsTest(CacheClearMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        with override_settings(DATABASE_SHARDS=[]):
+            cls.author = User.objects.create_user(username='author')
+            cls.reader = User.objects.create_user(username='reader')
+        AuthorShard.objects.create(author=cls.author, shard='shard2',
+                                   moving=True)
+
+    def login(self, user):
+        # Вход сохраняет пользователя, а копировать его в шарды здесь
+        # некуда.
+        with override_settings(DATABASE_SHARDS=[]):
+            self.client.force_login(user)
+
+    def assertRetryLater(self, response):
+        self.assertEqual(response.status_code, 503)
+        self.assertTemplateUsed(response, 'core/503.html')
+        self.assertEqual(response['Retry-After'],
+                         str(2 * settings.SHARD_MOVE_GRACE))
+
+    def test_post_create(self):
+        """Новый пост переносимого автора — 503 с Retry-After."""
+        self.login(self.author)
+        response = self.client.post(reverse('posts:post_create'),
+                                    {'text': 'Во время переноса'})
+        self.assertRetryLater(response)
+        self.assertFalse(PostAuthor.objects.exists())
+
+    def test_follow(self):
+        """Подписка на переносимого автора — 503 с Retry-After."""
+        self.login(self.reader)
+        response = self.client.get(reverse('posts:profile_follow',
+                                           args=['author']))
+        self.assertRetryLater(response)
+        response = self.client.get(reverse('posts:profile_unfollow',
+                                           args=['author']))
+        self.assertRetryLater(response)
+
+
+@override_settings(DATABASE_SHARDS=SHARDS)
+class PostDirectoryTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        with override_settings(DATABASE_SHARDS=[]):
+            cls.author = User.objects.create_user(username='author')
+            cls.other = User.objects.create_user(username='other')
+        PostAuthor.objects.create(pk=1, author=cls.author)
+
+    def test_registers_new_ids(self):
+        """Новые id постов заносятся в справочник с их авторами."""
+        shards.register_posts([Post(pk=1, author=self.author),
+                               Post(pk=2, author=self.other)])
+        self.assertEqual(
+            dict(PostAuthor.objects.values_list('pk', 'author_id')),
+            {1: self.author.pk, 2: self.other.pk}
+        )
+
+    def test_foreign_id_is_an_error(self):
+        """Id, занятый постом другого автора, не перезаписывается молча."""
+        with self.assertRaises(shards.PostIdConflict):
+            shards.register_posts([Post(pk=1, author=self.other),
+                                   Post(pk=2, author=self.other)])
+        self.assertEqual(
+            dict(PostAuthor.objects.values_list('pk', 'author_id')),
+            {1: self.author.pk}
+        )
+
+
+@skipUnless(settings.DATABASE_SHARDS, 'нужен DJANGO_DB_SHARDS')
+class ShardedSiteTest(CacheClearMixin, TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.reader)
+
+    def create_post(self, author, text):
+        return Post.objects.create(author=author, text=text,
+                                   group=self.group)
+
+    def test_reference_rows_copied_to_shards(self):
+        """Пользователи и группы копируются в каждый шард."""
+        for shard in settings.DATABASE_SHARDS:
+            self.assertTrue(
+                User.objects.using(shard).filter(username='author').exists()
+            )
+            self.assertTrue(
+                Group.objects.using(shard).filter(slug='group').exists()
+            )
+
+    def test_posts_live_in_author_shard(self):
+        """Пост, теги и комментарии живут в шарде автора."""
+        post = self.create_post(self.author, 'Пост #шард')
+        save_tags_and_mentions(post)
+        shard = shards.author_shard(self.author.pk)
+        self.assertIn(shard, settings.DATABASE_SHARDS)
+        self.assertEqual(post._state.db, shard)
+        self.assertTrue(Post.objects.using(shard).filter(pk=post.pk).exists())
+        self.assertEqual([tag.name for tag in post.tags.all()], ['шард'])
+        response = self.client.post(
+            reverse('posts:add_comment', args=[post.pk]), {'text': 'Привет'}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Comment.objects.using(shard).count(), 1)
+        response = self.client.get(reverse('posts:post_detail',
+                                           args=[post.pk]))
+        self.assertContains(response, 'Привет')
+
+    def test_feeds_merge_shards(self):
+        """Ленты собираются из всех шардов по порядку."""
+        authors = [self.author, self.reader] * 6
+        posts = [self.create_post(author, f'Пост {number}')
+                 for number, author in enumerate(authors)]
+        self.client.get(reverse('posts:profile_follow', args=['author']))
+        expected = sorted(posts, key=lambda post: (post.pub_date, post.pk),
+                          reverse=True)
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(list(response.context['page_obj']), expected[:10])
+        response = self.client.get(reverse('posts:group_list',
+                                           args=['group']))
+        self.assertEqual(response.context['page_obj'].paginator.count, 12)
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'].paginator.count, 6)
+
+    def test_move_author(self):
+        """Автор переезжает в другой шард вместе с подписками."""
+        post = self.create_post(self.author, 'Переезд')
+        Follow.objects.create(user=self.reader, author=self.author)
+        source = shards.author_shard(self.author.pk)
+        target = next(shard for shard in settings.DATABASE_SHARDS
+                      if shard != source)
+        copied = shards.move_authors({self.author.pk: target}, grace=0)
+        self.assertEqual(copied['post'], 1)
+        self.assertEqual(shards.author_shard(self.author.pk), target)
+        self.assertFalse(Post.objects.using(source).exists())
+        self.assertEqual(Follow.objects.using(target).count(), 1)
+        response = self.client.get(reverse('posts:post_detail',
+                                           args=[post.pk]))
+        self.assertContains(response, 'Переезд')
+
+    def test_archive_lives_in_author_shard(self):
+        """Архив автора хранится и переезжает с ним."""
+        post = self.create_post(self.author, 'Архив')
+        archive.archive_posts(timezone.now() + timedelta(days=1), 10)
+        source = shards.author_shard(self.author.pk)
+        self.assertTrue(
+            ArchivedPost.objects.using(source).filter(pk=post.pk).exists()
+        )
+        target = next(shard for shard in settings.DATABASE_SHARDS
+                      if shard != source)
+        shards.move_authors({self.author.pk: target}, grace=0)
+        response = self.client.get(reverse('posts:post_detail',
+                                           args=[post.pk]))
+        self.assertContains(response, 'Архив')
+
+    def test_rebalance_command(self):
+        """rebalance_shards переносит автора и видит равновесие."""
+        self.create_post(self.author, 'Переезд')
+        source = shards.author_shard(self.author.pk)
+        target = next(shard for shard in settings.DATABASE_SHARDS
+                      if shard != source)
+        call_command('rebalance_shards', 'author', to=target, grace=0,
+                     stdout=StringIO())
+        self.assertEqual(shards.author_shard(self.author.pk), target)
+        self.assertEqual(Post.objects.using(target).count(), 1)
+        out = StringIO()
+        call_command('rebalance_shards', dry_run=True, stdout=out)
+        self.assertIn('Авторов к переносу: 0', out.getvalue())
+
+    def test_generated_posts_get_unique_ids(self):
+        """Сгенерированные посты не занимают id постов из шардов."""
+        posts = [self.create_post(self.author, f'Пост {number}')
+                 for number in range(3)]
+        call_command('generate_dataset', users=2, groups=0, posts=5,
+                     comments=0, stdout=StringIO())
+        generated = list(Post.objects.using('default').values_list(
+            'pk', 'author_id'
+        ))
+        self.assertEqual(len(generated), 5)
+        self.assertFalse({pk for pk, _ in generated}
+                         & {post.pk for post in posts})
+        self.assertEqual(
+            dict(PostAuthor.objects.filter(
+                pk__in=[pk for pk, _ in generated]
+            ).values_list('pk', 'author_id')),
+            dict(generated)
+        )
+        call_command('rebalance_shards', grace=0, stdout=StringIO())
+        for post in posts:
+            response = self.client.get(reverse('posts:post_detail',
+                                               args=[post.pk]))
+            self.assertEqual(response.context['post'].author, self.author)
+
+    def test_move_refuses_foreign_post_ids(self):
+        """Перенос не копирует пост, чей id уже занят другим автором."""
+        post = self.create_post(self.author, 'Чужой id')
+        AuthorShard.objects.filter(author=self.reader).delete()
+        Post.objects.using('default').bulk_create(
+            [Post(pk=post.pk, author=self.reader, text='Дубликат')]
+        )
+        target = next(shard for shard in settings.DATABASE_SHARDS
+                      if shard != shards.author_shard(self.author.pk))
+        with self.assertRaises(CommandError):
+            call_command('rebalance_shards', 'reader', to=target, grace=0,
+                         stdout=StringIO())
+        self.assertEqual(shards.author_shard(self.reader.pk), 'default')
+        self.assertEqual(shards.post_author(post.pk), self.author.pk)
+
+    def test_comment_while_moving(self):
+        """Комментарий к посту переносимого автора — 503, а не 500."""
+        post = self.create_post(self.author, 'Переезд')
+        AuthorShard.objects.filter(author=self.author).update(moving=True)
+        cache.clear()
+        response = self.client.post(
+            reverse('posts:add_comment', args=[post.pk]), {'text': 'Привет'}
+        )
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+        self.assertFalse(Comment.objects.using(
+            shards.author_shard(self.author.pk)
+        ).exists())
@@ -0,0 +1,83 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Post, Tag
+from posts.utils import extract_mentions, extract_tags
+
+User = get_user_model()
+
+FIRST_PAGE_RECORDS = 10
+SECOND_PAGE_RECORDS = 3
+ALL_RECORDS_ON_PAGES = FIRST_PAGE_RECORDS + SECOND_PAGE_RECORDS
+
+
+class TagsAndMentionsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.guest_client = Client()
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+
+    def test_extract_tags_and_mentions(self):
+        """Теги и упоминания извлекаются из текста без повторов."""
+        text = 'Привет, @reader. #Django и #django, #котики! a@b.ru'
+        self.assertEqual(extract_tags(text), ['django', 'котики'])
+        self.assertEqual(extract_mentions(text), ['reader'])
+
+    def test_create_post_saves_tags_and_mentions(self):
+        """При создании поста теги и упоминания попадают в индекс."""
+        self.author_client.post(
+            reverse('posts:post_create'),
+            data={'text': '#news для @reader и @nobody'}
+        )
+        post = Post.objects.get(author=self.author)
+        self.assertEqual(
+            list(post.tags.values_list('name', flat=True)), ['news']
+        )
+        self.assertEqual(list(post.mentions.all()), [self.reader])
+
+    def test_edit_post_updates_tags(self):
+        """Редактирование поста перестраивает его теги."""
+        post = Post.objects.create(author=self.author, text='#old')
+        self.author_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            data={'text': '#new'}
+        )
+        self.assertEqual(
+            list(post.tags.values_list('name', flat=True)), ['new']
+        )
+
+    def test_tag_and_mentions_pages_paginate(self):
+        """Ленты тега и упоминаний разбиты на страницы."""
+        tag = Tag.objects.create(name='news')
+        for _ in range(ALL_RECORDS_ON_PAGES):
+            post = Post.objects.create(author=self.author, text='#news')
+            post.tags.add(tag)
+            post.mentions.add(self.reader)
+        urls = (
+            reverse('posts:tag_list', kwargs={'name': 'News'}),
+            reverse('posts:mentions', kwargs={'username': 'reader'}),
+        )
+        pages = (
+            (1, FIRST_PAGE_RECORDS),
+            (2, SECOND_PAGE_RECORDS),
+        )
+        for url in urls:
+            for page, count in pages:
+                with self.subTest(url=url, page=page):
+                    response = self.guest_client.get(url, {'page': page})
+                    self.assertEqual(
+                        len(response.context['page_obj'].object_list),
+                        count
+                    )
+
+    def test_unknown_tag_returns_404(self):
+        """Страница несуществующего тега возвращает 404."""
+        response = self.guest_client.get(
+            reverse('posts:tag_list', kwargs={'name': 'missing'})
+        )
+        self.assertEqual(response.status_code, 404)
@@ -1,6 +1,7 @@
 from http import HTTPStatus
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import Client, TestCase
 
 from posts.models import Group, Post
@@ -50,6 +51,9 @@ class PostURLTests(TestCase):
         )
         return super().setUpClass()
 
+    def setUp(self):
+        cache.clear()
+
     def test_public_urls_available_for_auth(self):
         """Публичный URL-адрес доступен авторизированному пользователю."""
         for url, _ in PostURLTests.public_urls:
@@ -1,14 +1,11 @@
-import shutil
-import tempfile
-
 from django import forms
 from django.contrib.auth import get_user_model
-from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
 from django.test import Client, TestCase
 from django.urls import reverse
 
+from core.tests.mixins import TempMediaMixin
 from posts.models import Follow, Group, Post
 
 User = get_user_model()
@@ -18,11 +15,10 @@ SECOND_PAGE_RECORDS = 3
 ALL_RECORDS_ON_PAGES = FIRST_PAGE_RECORDS + SECOND_PAGE_RECORDS
 
 
-class PostPagesTest(TestCase):
+class PostPagesTest(TempMediaMixin, TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
-        settings.MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
         cls.guest_client = Client()
         cls.author = User.objects.create_user(
             username='Bobby'
@@ -75,10 +71,8 @@ class PostPagesTest(TestCase):
             'image': forms.fields.ImageField,
         }
 
-    @classmethod
-    def tearDownClass(cls):
-        super().tearDownClass()
-        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+    def setUp(self):
+        cache.clear()
 
     def test_pages_uses_correct_template(self):
         """URL-адрес использует соответствующий шаблон."""
@@ -0,0 +1,62 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TransactionTestCase
+from django.urls import reverse
+
+from core.middleware import CACHE_STATUS_HEADER
+from core.tests.mixins import CacheClearMixin
+from posts.models import Comment, Group, Post
+from posts.warmup import REMOTE_ADDR, warm_urls
+
+User = get_user_model()
+
+
+class WarmCachesTest(CacheClearMixin, TransactionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # TransactionTestCase чистит базу после теста, а не до него.
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Post.objects.bulk_create(
+            Post(author=self.author, group=self.group, text=f'Пост {number}')
+            for number in range(15)
+        )
+        self.popular = Post.objects.last()
+        Comment.objects.create(
+            post=self.popular, author=self.author, text='Комментарий'
+        )
+
+    def test_warm_urls(self):
+        """Прогреваются первые страницы лент и свежие посты."""
+        urls = warm_urls(pages=3, posts=1)
+        index = reverse('posts:index')
+        group = reverse('posts:group_list', args=['group'])
+        profile = reverse('posts:profile', args=['author'])
+        self.assertEqual(urls, [
+            index, f'{index}?page=2',
+            group, f'{group}?page=2',
+            profile, f'{profile}?page=2',
+            reverse('posts:post_detail', args=[self.popular.pk]),
+        ])
+
+    def test_command_fills_page_cache(self):
+        """После warm_caches страницы отдаются из кэша."""
+        out = StringIO()
+        call_command(
+            'warm_caches', '--threads', '2', '--posts', '1', stdout=out
+        )
+        self.assertIn('Прогрето страниц: 7 из 7', out.getvalue())
+        response = self.client.get(
+            reverse('posts:group_list', args=['group']),
+            {'page': 2},
+            HTTP_HOST='localhost',
+            REMOTE_ADDR=REMOTE_ADDR,
+        )
+        self.assertEqual(response[CACHE_STATUS_HEADER], 'HIT')
@@ -0,0 +1,43 @@
+import re
+
+from django.core.paginator import Paginator
+
+from . import shards
+from .models import Tag, User
+
+POSTS_COUNT = 10
+
+TAG_RE = re.compile(r'(?<![\w&])#(\w{1,100})')
+MENTION_RE = re.compile(r'(?<![\w@])@([\w.+-]{1,150})')
+
+
+def paginate(request, queryset):
+    """Возвращает страницу из queryset по номеру из GET-параметра page."""
+    paginator = Paginator(queryset, POSTS_COUNT)
+    return paginator.get_page(request.GET.get('page'))
+
+
+def extract_tags(text):
+    """Находит в тексте #теги и возвращает их имена без повторов."""
+    return sorted({name.lower() for name in TAG_RE.findall(text)})
+
+
+def extract_mentions(text):
+    """Находит в тексте @упоминания и возвращает имена пользователей."""
+    return sorted({name.rstrip('.') for name in MENTION_RE.findall(text)})
+
+
+def save_tags_and_mentions(post):
+    """Записывает теги и упоминания поста в индексные таблицы."""
+    names = extract_tags(post.text)
+    Tag.objects.bulk_create(
+        [Tag(name=name) for name in names],
+        ignore_conflicts=True
+    )
+    tags = Tag.objects.filter(name__in=names)
+    if shards.is_enabled():
+        shards.copy_reference(tags)
+    post.tags.set(tags)
+    post.mentions.set(
+        User.objects.filter(username__in=extract_mentions(post.text))
+    )
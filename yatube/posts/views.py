@@ -1,65 +1,158 @@
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.http import HttpResponseRedirect
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.http import urlencode
+from django.views.decorators.http import condition
 
+from core.page_cache import add_surrogate_keys
+from core.querycache import cached
+
+from . import archive, conditions, shards
+from .cache_keys import (FEED_KEY, author_key, group_key, mentions_key,
+                         page_keys, post_key, tag_key)
+from .feeds import follow_page, group_page
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .models import ArchivedPost, Follow, Group, Post, Tag, User
+from .search import search_posts
+from .utils import paginate, save_tags_and_mentions
 
-POSTS_COUNT = 10
+INDEX_CACHE_TIMEOUT = 20
+# Поля автора для страниц; строки через cached() лежат в общем кэше,
+# и хэшу пароля там не место.
+AUTHOR_FIELDS = ('id', 'username', 'first_name', 'last_name')
 
 
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, POSTS_COUNT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = shards.merge(Post.objects.all())
+    page_obj = paginate(request, post_list)
     context = {
         'page_obj': page_obj
     }
-    return render(request, 'posts/index.html', context)
+    return add_surrogate_keys(
+        render(request, 'posts/index.html', context),
+        FEED_KEY, *page_keys(page_obj),
+        max_age=INDEX_CACHE_TIMEOUT
+    )
 
 
+@condition(
+    etag_func=conditions.group_etag,
+    last_modified_func=conditions.group_last_modified
+)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, POSTS_COUNT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    group = get_object_or_404(Group.objects.cached(), slug=slug)
+    page_obj = group_page(request, group)
     context = {
         'group': group,
         'page_obj': page_obj,
+        'feed_version': conditions.get_stamp(request).version,
+    }
+    return add_surrogate_keys(
+        render(request, 'posts/group_list.html', context),
+        group_key(group.pk)
+    )
+
+
+def tag_posts(request, name):
+    tag = get_object_or_404(Tag.objects.cached(), name=name.lower())
+    page_obj = paginate(request, shards.merge(tag.posts.all()))
+    context = {
+        'tag': tag,
+        'page_obj': page_obj,
+    }
+    return add_surrogate_keys(
+        render(request, 'posts/tag_list.html', context),
+        tag_key(tag.name), *page_keys(page_obj)
+    )
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = paginate(
+        request, shards.merge(search_posts(Post.objects.all(), query))
+    )
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&' if query else '',
     }
-    return render(request, 'posts/group_list.html', context)
+    return render(request, 'posts/search.html', context)
 
 
+@condition(
+    etag_func=conditions.profile_etag,
+    last_modified_func=conditions.profile_last_modified
+)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    paginator = Paginator(posts, POSTS_COUNT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    following = (request.user.is_authenticated
-                 and request.user.username != username
-                 and Follow.objects.filter(user=request.user, author=author))
+    author = get_object_or_404(
+        cached(User).only(*AUTHOR_FIELDS), username=username
+    )
+    posts = shards.for_author(author.posts.all(), author.pk)
+    archived = shards.for_author(
+        ArchivedPost.objects.filter(author=author), author.pk
+    )
+    page_obj = paginate(request, archive.with_archived(posts, archived))
     context = {
         'author': author,
         'page_obj': page_obj,
-        'following': following,
+        'feed_version': conditions.get_stamp(request).version,
     }
-    return render(request, 'posts/profile.html', context)
+    return add_surrogate_keys(
+        render(request, 'posts/profile.html', context),
+        author_key(author.pk)
+    )
 
 
+def mentions(request, username):
+    author = get_object_or_404(
+        cached(User).only(*AUTHOR_FIELDS), username=username
+    )
+    page_obj = paginate(request, shards.merge(author.mentioned_in.all()))
+    context = {
+        'author': author,
+        'page_obj': page_obj,
+    }
+    return add_surrogate_keys(
+        render(request, 'posts/mentions.html', context),
+        mentions_key(author.pk), *page_keys(page_obj)
+    )
+
+
+@condition(
+    etag_func=conditions.post_etag,
+    last_modified_func=conditions.post_last_modified
+)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = shards.for_post(Post.objects, post_id).filter(pk=post_id).first()
+    archived = None
+    if post is not None:
+        comments = post.comments.all()
+    else:
+        archived = get_object_or_404(
+            shards.for_post(ArchivedPost.objects, post_id), pk=post_id
+        )
+        post = archive.to_post(archived)
+        comments = archive.get_comments(archived)
     form = CommentForm()
-    comments = post.comments.all()
+    author_posts = sum(
+        shards.for_author(
+            model.objects.filter(author_id=post.author_id), post.author_id
+        ).count()
+        for model in (Post, ArchivedPost)
+    )
     context = {
         'post': post,
         'comments': comments,
-        'form': form
+        'form': form,
+        'author_posts': author_posts,
+        'archived': archived is not None,
     }
-    return render(request, 'posts/post_detail.html', context)
+    keys = [post_key(post.pk), author_key(post.author_id)]
+    if post.group_id:
+        keys.append(group_key(post.group_id))
+    return add_surrogate_keys(
+        render(request, 'posts/post_detail.html', context), *keys
+    )
 
 
 @login_required
@@ -70,6 +163,7 @@ def post_create(request):
             post = form.save(commit=False)
             post.author = request.user
             post.save()
+            save_tags_and_mentions(post)
             return redirect('posts:profile', username=request.user)
     form = PostForm()
     return render(request, 'posts/create_post.html', {'form': form})
@@ -77,14 +171,16 @@ def post_create(request):
 
 @login_required
 def post_edit(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(shards.for_post(Post.objects, post_id),
+                             pk=post_id)
     form = PostForm(
         request.POST or None,
         files=request.FILES or None,
         instance=post
     )
     if form.is_valid():
-        form.save()
+        post = form.save()
+        save_tags_and_mentions(post)
         return redirect(post)
     if request.user != post.author:
         return redirect(post)
@@ -99,7 +195,8 @@ def post_edit(request, post_id):
 
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(shards.for_post(Post.objects, post_id),
+                             pk=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
@@ -111,10 +208,7 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    posts_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts_list, POSTS_COUNT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = follow_page(request)
     context = {
         'page_obj': page_obj,
     }
@@ -130,7 +224,9 @@ def profile_follow(request, username):
     author = User.objects.get(username=username)
     user = request.user
     if author != user:
-        Follow.objects.get_or_create(user=user, author=author)
+        shards.for_author(
+            Follow.objects, author.pk, for_write=True
+        ).get_or_create(user=user, author=author)
         return redirect(
             'posts:profile',
             username=username
@@ -141,5 +237,10 @@ def profile_follow(request, username):
 @login_required
 def profile_unfollow(request, username):
     user = request.user
-    Follow.objects.filter(user=user, author__username=username).delete()
+    author_id = cached(User).filter(username=username).values_list(
+        'pk', flat=True
+    ).first()
+    shards.for_author(Follow.objects, author_id, for_write=True).filter(
+        user=user, author__username=username
+    ).delete()
     return HttpResponseRedirect(request.META.get('HTTP_REFERER'))
@@ -0,0 +1,104 @@
+"""Прогрев кэшей после деплоя или перезапуска.
+
+Самые посещаемые страницы запрашиваются внутри процесса через тестовый
+клиент Django, поэтому проходят весь стек middleware и заполняют
+кэш страниц, фрагментов, запросов и хранилище миниатюр sorl так же,
+как настоящий трафик. Адрес сайта нужно передавать тот же, что
+у посетителей: он входит в ключ кэша страниц. Кэш в памяти процесса
+(LocMemCache, L1 у TieredCache) команда из отдельного процесса прогреть
+не может — для него есть прогрев при запуске воркера (yatube/wsgi.py),
+WARM_CACHES_ON_STARTUP.
+"""
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from core.middleware import CACHE_STATUS_HEADER
+
+from .models import Group, Post, User
+from .shards import merge
+from .utils import POSTS_COUNT
+
+Warmed = namedtuple('Warmed', ('url', 'status', 'cache', 'duration'))
+
+# Адрес обычного посетителя: для INTERNAL_IPS включается отладочная
+# панель, и такие ответы в кэш страниц не попадают.
+REMOTE_ADDR = '192.0.2.1'
+
+_local = threading.local()
+
+
+def page_urls(url, count):
+    pages = max(1, -(-count // POSTS_COUNT))
+    return [url if page == 1 else f'{url}?page={page}'
+            for page in range(1, pages + 1)]
+
+
+def warm_urls(pages=3, groups=10, profiles=10, posts=20):
+    """Адреса первых страниц лент и самых популярных постов."""
+    urls = []
+    urls += page_urls(
+        reverse('posts:index'),
+        min(merge(Post.objects.all()).count(), pages * POSTS_COUNT)
+    )
+    top_groups = Group.objects.annotate(
+        post_count=Count('posts')
+    ).order_by('-post_count')[:groups]
+    for group in top_groups:
+        urls += page_urls(
+            reverse('posts:group_list', args=[group.slug]),
+            min(group.post_count, pages * POSTS_COUNT)
+        )
+    top_authors = User.objects.annotate(
+        post_count=Count('posts')
+    ).filter(post_count__gt=0).order_by('-post_count')[:profiles]
+    for author in top_authors:
+        urls += page_urls(
+            reverse('posts:profile', args=[author.username]),
+            min(author.post_count, pages * POSTS_COUNT)
+        )
+    top_posts = Post.objects.annotate(
+        comment_count=Count('comments')
+    ).order_by('-comment_count', '-pub_date').values_list('pk', flat=True)
+    urls += [reverse('posts:post_detail', args=[pk])
+             for pk in top_posts[:posts]]
+    return urls
+
+
+def fetch(url, host, secure):
+    if not hasattr(_local, 'client'):
+        _local.client = Client(HTTP_HOST=host, REMOTE_ADDR=REMOTE_ADDR)
+    started = time.perf_counter()
+    try:
+        response = _local.client.get(url, secure=secure)
+    finally:
+        connections.close_all()
+    return Warmed(
+        url,
+        response.status_code,
+        response.get(CACHE_STATUS_HEADER, '-'),
+        time.perf_counter() - started,
+    )
+
+
+def warm(urls, host='localhost', secure=False, threads=4):
+    """Запрашивает адреса в пуле потоков и возвращает список Warmed."""
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(
+            lambda url: fetch(url, host, secure), urls
+        ))
+
+
+def warm_in_background(**options):
+    """Прогревает кэши в фоновом потоке, не задерживая запуск."""
+    def run():
+        warm(warm_urls(), **options)
+    thread = threading.Thread(target=run, name='warm-caches', daemon=True)
+    thread.start()
+    return thread
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -29,10 +30,147 @@ ALLOWED_HOSTS = ['*']
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# default читает сначала из памяти процесса, затем из общего кэша shared.
+# В production shared — memcached или redis, общий для всех процессов.
 CACHES = {
     'default': {
+        'BACKEND': 'core.cache_backends.TieredCache',
+        'OPTIONS': {
+            'SHARED_CACHE': 'shared',
+            'L1_TIMEOUT': 5,
+            'L1_MAX_ENTRIES': 1000,
+            'INVALIDATION_CHECK_INTERVAL': 1,
+        },
+    },
+    'shared': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+# Время жизни страниц в кэше, секунды.
+PAGE_CACHE_TIMEOUT = 60 * 5
+# Время жизни результатов запросов, закэшированных через .cached().
+QUERY_CACHE_TIMEOUT = 60 * 10
+# Прогревать кэши в фоне при запуске процесса веб-сервера. Адрес сайта
+# входит в ключи кэша страниц, поэтому должен совпадать с настоящим.
+WARM_CACHES_ON_STARTUP = False
+WARM_CACHES_HOST = 'localhost'
+# Прогревать резолвер, шаблоны, sorl и валидаторы паролей при запуске.
+# Оба прогрева выполняет только yatube/wsgi.py, и там же STARTUP_WARMUP
+# включён по умолчанию: manage.py, тесты и миграции не прогреваются.
+STARTUP_WARMUP = os.getenv('DJANGO_STARTUP_WARMUP', '0') == '1'
+
+# Профилирование запросов: доля запросов под cProfile, порог медленного
+# запроса в секундах и каталог для профилей (manage.py profile_report).
+PROFILING_SAMPLE_RATE = 0
+PROFILING_SLOW_THRESHOLD = 1.0
+PROFILING_DUMP_DIR = os.getenv(
+    'PROFILING_DUMP_DIR',
+    os.path.join(tempfile.gettempdir(), 'yatube-profiles')
+)
+
+# Метрики Prometheus: каталог снимков воркеров, как часто их сохранять
+# (секунды) и с каких адресов можно читать /metrics/.
+METRICS_DIR = os.getenv(
+    'METRICS_DIR', os.path.join(tempfile.gettempdir(), 'yatube-metrics')
+)
+METRICS_FLUSH_INTERVAL = 5
+METRICS_ALLOWED_IPS = ['127.0.0.1']
+
+# Трассировка: доля запросов, адреса, которым разрешено включать её
+# флагом sampled в traceparent, и файл OTLP/JSON (manage.py trace_report).
+TRACING_SAMPLE_RATE = 0
+TRACING_TRUSTED_IPS = []
+TRACING_FILE = os.getenv(
+    'TRACING_FILE', os.path.join(tempfile.gettempdir(), 'yatube-traces.jsonl')
+)
+
+# Запросы к базе дольше порога (секунды) пишутся в SLOW_QUERY_LOG вместе
+# с планом выполнения (manage.py slow_query_report). None выключает журнал.
+# План одной формы запроса снимается не чаще раза в столько секунд.
+SLOW_QUERY_THRESHOLD = 0.1
+SLOW_QUERY_EXPLAIN_INTERVAL = 60
+SLOW_QUERY_LOG = os.getenv(
+    'SLOW_QUERY_LOG',
+    os.path.join(tempfile.gettempdir(), 'yatube-slow-queries.log')
+)
+
+# Профиль памяти tracemalloc (/memory/ для персонала и manage.py
+# memory_profile): приложения для группировки, глубина стека и предел
+# числа запросов за один замер.
+MEMORY_PROFILE_APPS = ('posts', 'core')
+MEMORY_PROFILE_FRAMES = 25
+MEMORY_PROFILE_MAX_REQUESTS = 500
+
+# Бенчмарк view (manage.py benchmark_views): базовый файл и допустимое
+# ухудшение времени и памяти, доля.
+BENCHMARK_BASELINE = os.path.join(BASE_DIR, 'benchmarks', 'baseline.json')
+BENCHMARK_TOLERANCE = 0.25
+
+# Запись трафика для manage.py replay_traffic: доля запросов, файл
+# журнала, пропускаемые адреса и параметры строки запроса, которые
+# сохраняются (остальные отбрасываются).
+TRAFFIC_CAPTURE_SAMPLE_RATE = 0
+TRAFFIC_CAPTURE_LOG = os.getenv(
+    'TRAFFIC_CAPTURE_LOG',
+    os.path.join(tempfile.gettempdir(), 'yatube-traffic.jsonl')
+)
+TRAFFIC_CAPTURE_EXCLUDE = ('/static/', '/media/', '/admin/', '/metrics/',
+                           '/memory/', '/__debug__/')
+TRAFFIC_CAPTURE_QUERY_PARAMS = ('page',)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'slow_queries': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': SLOW_QUERY_LOG,
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 3,
+            'formatter': 'message',
+            'delay': True,
+        },
+        'traces': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': TRACING_FILE,
+            'maxBytes': 50 * 1024 * 1024,
+            'backupCount': 3,
+            'formatter': 'message',
+            'delay': True,
+        },
+        'traffic': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': TRAFFIC_CAPTURE_LOG,
+            'maxBytes': 50 * 1024 * 1024,
+            'backupCount': 5,
+            'formatter': 'message',
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'core.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        'core.tracing': {
+            'handlers': ['traces'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'core.traffic': {
+            'handlers': ['traffic'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
 }
 
 INTERNAL_IPS = [
@@ -43,7 +181,6 @@ INTERNAL_IPS = [
 
 INSTALLED_APPS = [
     'about.apps.AboutConfig',
-    'core.apps.CoreConfig',
     'users.apps.UsersConfig',
     'posts.apps.PostsConfig',
     'django.contrib.admin',
@@ -54,6 +191,9 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'sorl.thumbnail',
     'debug_toolbar',
+    # core прогревает URL-резолвер в ready(), поэтому идёт последним:
+    # к этому моменту admin уже зарегистрировал свои модели.
+    'core.apps.CoreConfig',
 ]
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
@@ -61,6 +201,11 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
 MIDDLEWARE = [
+    'core.middleware.ProfilingMiddleware',
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.TrafficCaptureMiddleware',
+    'core.middleware.TracingMiddleware',
+    'core.middleware.ReplicaStickinessMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -68,7 +213,10 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'posts.middleware.ShardMovingMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'core.middleware.FragmentMiddleware',
+    'core.middleware.PageCacheMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -79,8 +227,15 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Скомпилированные шаблоны кэшируются и при DEBUG: после
+            # правки шаблона сервер нужно перезапустить.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -102,7 +257,80 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': int(os.getenv('DJANGO_CONN_MAX_AGE', 60)),
+    }
+}
+# PostgreSQL включается переменной POSTGRES_DB (нужен psycopg2).
+# Пула соединений в Django нет: каждый поток держит своё соединение
+# CONN_MAX_AGE секунд, а общий пул даёт pgbouncer. В режиме transaction
+# pooling серверные курсоры между транзакциями не живут, поэтому при
+# PGBOUNCER=1 они выключены.
+if os.getenv('POSTGRES_DB'):
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.getenv('POSTGRES_DB'),
+        'USER': os.getenv('POSTGRES_USER', 'postgres'),
+        'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+        'HOST': os.getenv('POSTGRES_HOST', 'localhost'),
+        'PORT': os.getenv('POSTGRES_PORT', '5432'),
+        'CONN_MAX_AGE': int(os.getenv('DJANGO_CONN_MAX_AGE', 60)),
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv('PGBOUNCER') == '1',
+        'OPTIONS': {'connect_timeout': 5},
     }
+
+# Реплики только для чтения через запятую в DJANGO_DB_REPLICAS: пути
+# к копиям файла SQLite (их обновляет manage.py sync_replicas) или
+# адреса серверов-реплик PostgreSQL.
+DATABASE_REPLICAS = []
+for number, location in enumerate(
+    filter(None, os.getenv('DJANGO_DB_REPLICAS', '').split(',')), start=1
+):
+    alias = f'replica{number}'
+    DATABASES[alias] = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+    if DATABASES[alias]['ENGINE'] == 'django.db.backends.sqlite3':
+        DATABASES[alias]['NAME'] = location
+    else:
+        DATABASES[alias]['HOST'] = location
+    DATABASE_REPLICAS.append(alias)
+# Шарды постов через запятую в DJANGO_DB_SHARDS: пути к файлам SQLite
+# или адреса серверов PostgreSQL (posts.shards). Схему в них создаёт
+# migrate --database=shardN, авторов переносит manage.py rebalance_shards.
+DATABASE_SHARDS = []
+for number, location in enumerate(
+    filter(None, os.getenv('DJANGO_DB_SHARDS', '').split(',')), start=1
+):
+    alias = f'shard{number}'
+    DATABASES[alias] = dict(DATABASES['default'])
+    if DATABASES[alias]['ENGINE'] == 'django.db.backends.sqlite3':
+        DATABASES[alias]['NAME'] = location
+    else:
+        DATABASES[alias]['HOST'] = location
+    DATABASE_SHARDS.append(alias)
+DATABASE_ROUTERS = [
+    'posts.shards.ShardRouter',
+    'core.db_router.ReplicaRouter',
+]
+# Сколько секунд ждать, пока изменение карты шардов увидят все процессы:
+# не меньше L1_TIMEOUT кэша и самой долгой транзакции записи.
+SHARD_MOVE_GRACE = 5
+# После записи браузер читает из основной базы столько секунд.
+REPLICA_STICKY_COOKIE = 'use_primary'
+REPLICA_STICKY_SECONDS = 5
+
+# Архив постов (manage.py archive_posts): посты старше стольких дней
+# переносятся в сжатую таблицу ArchivedPost пачками по столько постов.
+POST_ARCHIVE_AFTER_DAYS = 365 * 2
+POST_ARCHIVE_BATCH_SIZE = 500
+
+# PRAGMA для каждого нового соединения SQLite (core.sqlite).
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение — размер в КиБ, а не в страницах.
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'memory',
 }
 
 
@@ -9,8 +9,19 @@ https://docs.djangoproject.com/en/2.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+os.environ.setdefault('DJANGO_STARTUP_WARMUP', '1')
 
 application = get_wsgi_application()
+
+# Прогрев нужен только процессу веб-сервера, поэтому он здесь, а не
+# в AppConfig.ready: manage.py, тесты и миграции его не ждут.
+if settings.STARTUP_WARMUP:
+    from core.startup import warm_up
+    warm_up()
+if settings.WARM_CACHES_ON_STARTUP:
+    from posts.warmup import warm_in_background
+    warm_in_background(host=settings.WARM_CACHES_HOST)